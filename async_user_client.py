@@ -0,0 +1,395 @@
+import asyncio
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+from cache_declaracoes import CacheDeclaracoes
+import envelope
+from compressao import Compressor
+from deduplicacao import CacheDeduplicacao
+from perfis_filas import argumentos_fila
+
+
+class AsyncUsuario:
+    """
+    Variante asyncio do Usuario, sobre o adaptador AsyncioConnection do pika.
+    Cada identidade usa uma única conexão no event loop, sem threads, então um mesmo
+    processo pode hospedar milhares de identidades. O consumo usa um canal e as publicações e
+    declarações outro, em modo de confirmação: um erro de publicação (ex.: exchange apagado)
+    fecha só o canal de publicação e não interrompe o consumo.
+
+    Uso:
+        usuario = AsyncUsuario("ana")
+        await usuario.conectar()
+        await usuario.assinar_topico("geral")
+        await usuario.publicar_em_topico("geral", "oi")
+        async for mensagem in usuario.mensagens():
+            ...
+    """
+
+    def __init__(self, nome, host='localhost', prefetch=100, compressor=None, deduplicacao=None,
+                 perfil_filas="padrao", sobrescritas_filas=None):
+        self.nome = nome
+        self.perfil_filas = perfil_filas
+        self.sobrescritas_filas = sobrescritas_filas
+        self.parametros = pika.ConnectionParameters(host, heartbeat=60)
+        self.prefetch = prefetch
+        self.connection = None
+        self.channel = None # Canal de consumo
+        self.canal_publicacao = None # Canal de publicação e declarações, em modo de confirmação
+        self.declaracoes = CacheDeclaracoes()
+        self.compressor = compressor if compressor is not None else Compressor(limite_bytes=None)
+        self.deduplicacao = deduplicacao if deduplicacao is not None else CacheDeduplicacao()
+        self.topicos_assinados = set()
+        self._loop = None
+        self._pendentes = {} # Future de RPC aguardando resposta do broker -> canal da RPC
+        self._confirmacoes = {} # delivery_tag -> Future da confirmação da publicação
+        self._proxima_tag = 1
+        self._abrindo_publicacao = None
+        self._entregas = None
+        self._consumindo = False
+        self._conexao_propria = True
+
+    async def conectar(self, conexao=None):
+        """
+        Abre a conexão e o canal e declara as filas do usuário.
+        Se 'conexao' (uma AsyncioConnection já aberta) for informada, apenas os canais são abertos
+        nela, permitindo que várias identidades compartilhem a mesma conexão (ver HostUsuarios).
+        """
+        self._loop = asyncio.get_running_loop()
+        self._abrindo_publicacao = asyncio.Lock()
+        if conexao is not None:
+            self.connection = conexao
+            self._conexao_propria = False
+            await self._abrir_canal()
+            await self._declarar_filas()
+            return
+
+        aberta = self._loop.create_future()
+
+        def on_open(connection):
+            if not aberta.done():
+                aberta.set_result(connection)
+
+        def on_open_error(connection, erro):
+            if not aberta.done():
+                aberta.set_exception(pika.exceptions.AMQPConnectionError(erro))
+
+        print(f"[{self.nome}] Conectando (asyncio) ao RabbitMQ...")
+        self.connection = AsyncioConnection(
+            self.parametros,
+            on_open_callback=on_open,
+            on_open_error_callback=on_open_error,
+            on_close_callback=self._on_conexao_fechada,
+            custom_ioloop=self._loop
+        )
+        await aberta
+        await self._abrir_canal()
+        await self._declarar_filas()
+        print(f"[{self.nome}] Conectado (asyncio).")
+
+    async def _declarar_filas(self):
+        # Filas duráveis, iguais às declaradas pelo Usuario bloqueante
+        for fila in (self.nome, f"{self.nome}_topicos"):
+            argumentos = argumentos_fila(fila, self.perfil_filas, self.sobrescritas_filas)
+            try:
+                await self._rpc(self.channel.queue_declare, queue=fila, durable=True, arguments=argumentos)
+            except pika.exceptions.ChannelClosedByBroker as e:
+                if e.reply_code != 406:
+                    raise
+                # A fila já existe com outros argumentos (ex.: criada pelo BrokerManager com outro
+                # perfil). Ainda dá para consumir dela: apenas confirma que existe, num canal novo.
+                print(f"[{self.nome}][AVISO] Fila '{fila}' existe com argumentos diferentes do perfil "
+                      f"'{self.perfil_filas}'. Usando a fila existente.")
+                await self._abrir_canal()
+                await self._rpc(self.channel.queue_declare, queue=fila, passive=True)
+            self.declaracoes.adicionar(CacheDeclaracoes.chave_fila(fila))
+
+    async def _abrir_canal(self):
+        aberto = self._loop.create_future()
+        self.connection.channel(on_open_callback=aberto.set_result)
+        self.channel = await aberto
+        self.channel.add_on_close_callback(self._on_canal_fechado)
+        await self._rpc(self.channel.basic_qos, prefetch_count=self.prefetch)
+
+    async def _abrir_canal_publicacao(self):
+        aberto = self._loop.create_future()
+        self.connection.channel(on_open_callback=aberto.set_result)
+        canal = await aberto
+        canal.add_on_close_callback(self._on_canal_fechado)
+        # O delivery_tag das confirmações recomeça em 1 a cada canal
+        self._confirmacoes = {}
+        self._proxima_tag = 1
+        await self._rpc(canal.confirm_delivery, ack_nack_callback=self._on_confirmacao)
+        self.canal_publicacao = canal
+
+    #Executa um método RPC assíncrono do canal e aguarda a resposta do broker
+    def _rpc(self, metodo, **kwargs):
+        futuro = self._loop.create_future()
+        self._pendentes[futuro] = metodo.__self__
+        futuro.add_done_callback(lambda f: self._pendentes.pop(f, None))
+
+        def on_ok(frame):
+            if not futuro.done():
+                futuro.set_result(frame)
+
+        metodo(callback=on_ok, **kwargs)
+        return futuro
+
+    #Falha as RPCs pendentes do canal (todas, se canal for None), que nunca receberiam resposta
+    def _falhar_pendentes(self, erro, canal=None):
+        for futuro, canal_rpc in list(self._pendentes.items()):
+            if (canal is None or canal_rpc is canal) and not futuro.done():
+                futuro.set_exception(erro)
+
+    #Falha as publicações ainda sem confirmação: o canal caiu antes do Basic.Ack
+    def _falhar_confirmacoes(self, erro):
+        confirmacoes, self._confirmacoes = self._confirmacoes, {}
+        for futuro in confirmacoes.values():
+            if not futuro.done():
+                futuro.set_exception(erro)
+
+    def _on_confirmacao(self, frame):
+        metodo = frame.method
+        if metodo.multiple:
+            # Com multiple=True o broker confirma todas as tags até delivery_tag de uma vez
+            tags = [tag for tag in self._confirmacoes if tag <= metodo.delivery_tag]
+        else:
+            tags = [metodo.delivery_tag]
+        confirmada = isinstance(metodo, pika.spec.Basic.Ack)
+        for tag in tags:
+            futuro = self._confirmacoes.pop(tag, None)
+            if futuro is not None and not futuro.done():
+                futuro.set_result(confirmada)
+
+    def _on_canal_fechado(self, channel, motivo):
+        if channel is self.canal_publicacao:
+            print(f"[{self.nome}] Canal de publicação fechado: {motivo}")
+            self.canal_publicacao = None
+            self._falhar_confirmacoes(motivo)
+        elif channel is self.channel:
+            print(f"[{self.nome}] Canal fechado: {motivo}")
+            self.channel = None
+            # mensagens() decide se reabre o canal (conexão viva) ou termina
+            if self._entregas is not None:
+                self._entregas.put_nowait(motivo)
+        else:
+            return
+        # Um 404/406 significa que o estado conhecido do broker mudou
+        self.declaracoes.invalidar_por_erro(motivo)
+        self._falhar_pendentes(motivo, channel)
+
+    def _on_conexao_fechada(self, connection, motivo):
+        if self._conexao_propria:
+            print(f"[{self.nome}] Conexão (asyncio) fechada: {motivo}")
+        self.channel = None
+        self.canal_publicacao = None
+        self._falhar_pendentes(motivo)
+        self._falhar_confirmacoes(motivo)
+        if self._entregas is not None:
+            self._entregas.put_nowait(motivo)
+
+    def _verificar_conexao(self):
+        if self.connection is None or not self.connection.is_open:
+            raise pika.exceptions.AMQPConnectionError("Conexão com o RabbitMQ não está aberta.")
+
+    async def _canal(self):
+        # Reabre o canal de consumo sob demanda se o broker o fechou
+        if self.channel is None or not self.channel.is_open:
+            self._verificar_conexao()
+            await self._abrir_canal()
+        return self.channel
+
+    async def _canal_de_publicacao(self):
+        # Reabre o canal de publicação sob demanda (ex.: fechado por uma publicação em exchange apagado)
+        async with self._abrindo_publicacao:
+            if self.canal_publicacao is None or not self.canal_publicacao.is_open:
+                self._verificar_conexao()
+                await self._abrir_canal_publicacao()
+            return self.canal_publicacao
+
+    #Publica no canal de publicação e aguarda a confirmação do broker. Retorna False em um nack
+    async def _publicar(self, exchange, routing_key, corpo, propriedades):
+        canal = await self._canal_de_publicacao()
+        tag = self._proxima_tag
+        self._proxima_tag += 1
+        confirmacao = self._confirmacoes[tag] = self._loop.create_future()
+        canal.basic_publish(exchange=exchange, routing_key=routing_key, body=corpo, properties=propriedades)
+        return await confirmacao
+
+    async def _garantir_exchange(self, nome_topico):
+        chave = CacheDeclaracoes.chave_exchange(nome_topico)
+        if self.declaracoes.contem(chave):
+            return
+        canal = await self._canal_de_publicacao()
+        await self._rpc(canal.exchange_declare, exchange=nome_topico, exchange_type='fanout', durable=True)
+        self.declaracoes.adicionar(chave)
+
+    def _codificar(self, tipo, mensagem, topico=""):
+        corpo, propriedades = envelope.codificar(tipo, self.nome, mensagem, topico=topico)
+        corpo, propriedades.content_encoding = self.compressor.comprimir(corpo)
+        return corpo, propriedades
+
+    async def enviar_para_usuario(self, destino, mensagem):
+        try:
+            corpo, propriedades = self._codificar(envelope.TIPO_PRIVADO, mensagem)
+            if await self._publicar('', destino, corpo, propriedades):
+                return True
+            print(f"[{self.nome}] Mensagem privada para '{destino}' rejeitada pelo broker (nack).")
+            return False
+        except Exception as e:
+            print(f"[{self.nome}] Erro ao enviar mensagem privada: {e}")
+            return False
+
+    async def assinar_topico(self, nome_topico):
+        try:
+            await self._garantir_exchange(nome_topico)
+            chave_binding = CacheDeclaracoes.chave_binding(nome_topico, f"{self.nome}_topicos")
+            if not self.declaracoes.contem(chave_binding):
+                canal = await self._canal_de_publicacao()
+                await self._rpc(canal.queue_bind, queue=f"{self.nome}_topicos", exchange=nome_topico)
+                self.declaracoes.adicionar(chave_binding)
+            self.topicos_assinados.add(nome_topico)
+            return True
+        except Exception as e:
+            print(f"[{self.nome}] Erro ao assinar tópico: {e}")
+            return False
+
+    async def publicar_em_topico(self, nome_topico, mensagem):
+        corpo, propriedades = self._codificar(envelope.TIPO_TOPICO, mensagem, topico=nome_topico)
+        for tentativa in range(2):
+            try:
+                await self._garantir_exchange(nome_topico)
+                if await self._publicar(nome_topico, '', corpo, propriedades):
+                    return True
+                print(f"[{self.nome}] Mensagem no tópico '{nome_topico}' rejeitada pelo broker (nack).")
+                return False
+            except pika.exceptions.ChannelClosedByBroker as e:
+                if e.reply_code != 404 or tentativa:
+                    print(f"[{self.nome}] Erro ao publicar no tópico: {e}")
+                    return False
+                # O exchange em cache foi apagado (ex.: BrokerManager.remover_topico): declara de novo
+                self.declaracoes.remover_entidade("exchange", nome_topico)
+            except Exception as e:
+                print(f"[{self.nome}] Erro ao publicar no tópico: {e}")
+                return False
+
+    #Registra os dois consumidores da identidade no canal e retorna as consumer tags
+    def _registrar_consumo(self, canal, on_message):
+        # Consumer tags identificam a identidade mesmo quando várias dividem a conexão
+        return [
+            canal.basic_consume(queue=self.nome, on_message_callback=on_message,
+                                consumer_tag=f"{self.nome}.privado"),
+            canal.basic_consume(queue=f"{self.nome}_topicos", on_message_callback=on_message,
+                                consumer_tag=f"{self.nome}.topicos"),
+        ]
+
+    #Cancela os consumidores e aguarda o CancelOk, para que as mesmas tags possam ser reusadas
+    async def _cancelar_consumo(self, canal, tags):
+        try:
+            await asyncio.gather(*(self._rpc(canal.basic_cancel, consumer_tag=tag) for tag in tags))
+        except Exception as e:
+            # Canal ou conexão caíram no meio: os consumidores já deixaram de existir no broker
+            print(f"[{self.nome}] Consumo encerrado sem CancelOk: {e}")
+
+    async def mensagens(self):
+        """
+        Iterador assíncrono das mensagens recebidas (privadas e de tópicos), como envelope.Envelope.
+        Cada mensagem é confirmada (ack) quando o consumidor pede a próxima, ou seja,
+        depois de processada. Se o consumidor sair do 'async for' (break ou exceção) a mensagem
+        atual e as já recebidas e ainda não entregues voltam para a fila (nack com requeue).
+        Se o broker fechar o canal de consumo com a conexão aberta, o consumo é refeito em um
+        canal novo (as entregas sem ack voltam para a fila). Termina com exceção se a conexão cair
+        ou se o canal novo também cair antes de qualquer entrega.
+        """
+        if self._consumindo:
+            raise RuntimeError(f"[{self.nome}] O consumo de mensagens já está ativo.")
+        self._consumindo = True
+        self._entregas = asyncio.Queue()
+
+        def on_message(ch, method, properties, body):
+            if self.deduplicacao.ja_visto(properties.message_id):
+                # Reentrega já processada: confirma e descarta sem passar ao consumidor
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+                return
+            try:
+                corpo = self.compressor.descomprimir(body, properties.content_encoding)
+            except Exception as e:
+                # Corpo grande demais ou corrompido: descarta em vez de repassar os bytes comprimidos
+                print(f"[{self.nome}] Mensagem descartada, erro ao descomprimir ({properties.content_encoding}): {e}")
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+                return
+            if self._entregas is not None:
+                self._entregas.put_nowait((ch, method.delivery_tag, corpo, properties.message_id))
+
+        canal = None
+        tags = []
+        reaberto = False
+        try:
+            while True:
+                if canal is None:
+                    canal = await self._canal()
+                    tags = self._registrar_consumo(canal, on_message)
+                item = await self._entregas.get()
+                if isinstance(item, BaseException):
+                    if reaberto or self.connection is None or not self.connection.is_open:
+                        raise item
+                    # Só o canal caiu: as entregas sem ack voltam para a fila e são consumidas no canal novo
+                    print(f"[{self.nome}] Canal de consumo perdido ({item}). Consumindo em um canal novo...")
+                    canal = None
+                    reaberto = True
+                    continue
+                reaberto = False
+                ch, delivery_tag, body, message_id = item
+                try:
+                    mensagem = envelope.decodificar(body)
+                except Exception:
+                    # Corpo inválido: devolver à fila só faria a mensagem voltar para sempre
+                    if ch.is_open:
+                        ch.basic_ack(delivery_tag=delivery_tag)
+                    raise
+                try:
+                    yield mensagem
+                except BaseException:
+                    # GeneratorExit (break/aclose) ou erro: a mensagem não foi processada
+                    self._devolver(item)
+                    raise
+                if ch.is_open:
+                    ch.basic_ack(delivery_tag=delivery_tag)
+        finally:
+            try:
+                if canal is not None and canal.is_open:
+                    await self._cancelar_consumo(canal, tags)
+            finally:
+                # Entregas que chegaram até o CancelOk também voltam para a fila
+                entregas, self._entregas = self._entregas, None
+                while not entregas.empty():
+                    item = entregas.get_nowait()
+                    if isinstance(item, tuple):
+                        self._devolver(item)
+                self._consumindo = False
+
+    #Devolve à fila uma entrega não processada e esquece o id dela na deduplicação
+    def _devolver(self, item):
+        ch, delivery_tag, _body, message_id = item
+        self.deduplicacao.esquecer(message_id)
+        if ch.is_open:
+            ch.basic_nack(delivery_tag=delivery_tag, requeue=True)
+
+    async def fechar(self):
+        if not self._conexao_propria:
+            # Conexão compartilhada: fecha só os canais desta identidade
+            canais = (self.channel, self.canal_publicacao)
+            self.channel = self.canal_publicacao = None
+            for canal in canais:
+                if canal is not None and canal.is_open:
+                    fechado = self._loop.create_future()
+                    canal.add_on_close_callback(lambda _c, _m, f=fechado: f.done() or f.set_result(None))
+                    canal.close()
+                    await fechado
+            return
+        if self.connection is None or self.connection.is_closed:
+            return
+        fechada = self._loop.create_future()
+        self.connection.add_on_close_callback(lambda _c, _m: fechada.done() or fechada.set_result(None))
+        if not self.connection.is_closing:
+            self.connection.close()
+        await fechada
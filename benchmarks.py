@@ -0,0 +1,397 @@
+"""
+Micro-benchmarks dos caminhos críticos do cliente (Usuario e client_ui.App).
+
+    python benchmarks.py                              # broker falso em memória (padrão, sem serviços)
+    python benchmarks.py --broker real                # RabbitMQ local com o plugin de gerenciamento
+    python benchmarks.py --saida resultados.json      # grava os resultados em JSON
+    python benchmarks.py --comparar antes.json depois.json
+
+Mede: vazão de envio privado e de publicação em tópico (uma a uma e em lote com confirmação),
+latência ponta a ponta de receber_mensagens (p50/p95/p99), custo do fanout por número de
+assinantes, custo de entrega na interface (fila e quadros do Tk) e tempo de abertura do mural
+(visualizar_mural) por tamanho de histórico. Os benchmarks de interface precisam de um display
+(Tk); sem display eles são registrados como pulados.
+
+Os prints dos clientes são descartados durante as medições (no terminal eles dominariam o tempo).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import envelope
+from broker_falso import BrokerFalso
+
+
+def _percentis(amostras):
+    ordenadas = sorted(amostras)
+    if not ordenadas:
+        return {}
+
+    def percentil(p):
+        return ordenadas[min(len(ordenadas) - 1, int(round(p / 100.0 * (len(ordenadas) - 1))))]
+
+    return {
+        "amostras": len(ordenadas),
+        "media_ms": statistics.fmean(ordenadas) * 1000,
+        "p50_ms": percentil(50) * 1000,
+        "p95_ms": percentil(95) * 1000,
+        "p99_ms": percentil(99) * 1000,
+        "max_ms": ordenadas[-1] * 1000,
+    }
+
+
+@contextlib.contextmanager
+def _silencioso():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+#Roda func() 'repeticoes' vezes e devolve a mediana do tempo (s)
+def _mediana_tempo(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+class _Consumidor:
+    # Usuario consumindo numa thread; 'ao_receber' é chamado com cada envelope
+    def __init__(self, usuario, ao_receber):
+        self.usuario = usuario
+        self.ao_receber = ao_receber
+        self.pronto = threading.Event()
+        self.thread = threading.Thread(
+            target=usuario.receber_mensagens,
+            args=(ao_receber,),
+            kwargs={"on_estado": self._on_estado, "max_tentativas": 0},
+            daemon=True,
+        )
+        self.thread.start()
+        if not self.pronto.wait(10):
+            raise RuntimeError(f"Consumidor de '{usuario.nome}' não iniciou.")
+
+    def _on_estado(self, estado, detalhes):
+        if estado == "conectado":
+            self.pronto.set()
+
+    def parar(self):
+        conexao = self.usuario.consume_connection
+        if conexao is not None and conexao.is_open:
+            conexao.add_callback_threadsafe(self.usuario.consume_channel.stop_consuming)
+        self.thread.join(5)
+
+
+class Benchmarks:
+    def __init__(self, mensagens=2000, repeticoes=3, assinantes=(1, 10, 50), historicos=(1000, 10000, 100000)):
+        self.mensagens = mensagens
+        self.repeticoes = repeticoes
+        self.assinantes = assinantes
+        self.historicos = historicos
+        self.prefixo = f"bench_{uuid.uuid4().hex[:8]}"
+        self.usuarios_criados = []
+
+    def _usuario(self, sufixo):
+        from user_client import Usuario
+        nome = f"{self.prefixo}_{sufixo}"
+        with _silencioso():
+            usuario = Usuario(nome)
+        self.usuarios_criados.append(nome)
+        return usuario
+
+    def envio_privado(self):
+        remetente, destino = self._usuario("remetente"), self._usuario("destino")
+        textos = [f"mensagem {i}" for i in range(self.mensagens)]
+
+        def um_a_um():
+            for texto in textos:
+                remetente.enviar_para_usuario(destino.nome, texto)
+
+        with _silencioso():
+            tempo_individual = _mediana_tempo(um_a_um, self.repeticoes)
+            tempo_lote = _mediana_tempo(lambda: remetente.enviar_lote(destino.nome, textos), self.repeticoes)
+        return {
+            "mensagens": self.mensagens,
+            "individual_msg_s": self.mensagens / tempo_individual,
+            "lote_confirmado_msg_s": self.mensagens / tempo_lote,
+        }
+
+    def publicacao_topico(self):
+        publicador = self._usuario("publicador")
+        topico = f"{self.prefixo}_topico"
+        textos = [f"mensagem {i}" for i in range(self.mensagens)]
+
+        def um_a_um():
+            for texto in textos:
+                publicador.publicar_em_topico(topico, texto)
+
+        with _silencioso():
+            tempo_individual = _mediana_tempo(um_a_um, self.repeticoes)
+            tempo_lote = _mediana_tempo(lambda: publicador.publicar_lote(topico, textos), self.repeticoes)
+        return {
+            "mensagens": self.mensagens,
+            "individual_msg_s": self.mensagens / tempo_individual,
+            "lote_confirmado_msg_s": self.mensagens / tempo_lote,
+        }
+
+    def latencia_entrega(self):
+        """Ping-pong: cada mensagem só é enviada depois que a anterior chegou ao callback."""
+        remetente, destino = self._usuario("lat_remetente"), self._usuario("lat_destino")
+        chegou = threading.Event()
+        chegadas = {}
+
+        def ao_receber(mensagem):
+            chegadas[mensagem.texto] = time.perf_counter()
+            chegou.set()
+
+        with _silencioso():
+            consumidor = _Consumidor(destino, ao_receber)
+            amostras = []
+            for i in range(min(self.mensagens, 1000)):
+                chegou.clear()
+                inicio = time.perf_counter()
+                remetente.enviar_para_usuario(destino.nome, str(i))
+                if not chegou.wait(5):
+                    raise RuntimeError(f"Mensagem {i} não foi entregue em 5s.")
+                amostras.append(chegadas[str(i)] - inicio)
+            consumidor.parar()
+        return _percentis(amostras)
+
+    def fanout(self):
+        """Tempo até todas as cópias de um lote de publicações chegarem a N assinantes."""
+        resultados = {}
+        publicador = self._usuario("fanout_publicador")
+        quantidade = max(1, self.mensagens // 10)
+        for total in self.assinantes:
+            topico = f"{self.prefixo}_fanout_{total}"
+            recebidas = [0]
+            lock = threading.Lock()
+            todas = threading.Event()
+
+            def ao_receber(_mensagem, recebidas=recebidas, lock=lock, todas=todas, esperado=total * quantidade):
+                with lock:
+                    recebidas[0] += 1
+                    if recebidas[0] >= esperado:
+                        todas.set()
+
+            with _silencioso():
+                consumidores = []
+                for i in range(total):
+                    assinante = self._usuario(f"fanout_{total}_{i}")
+                    assinante.assinar_topico(topico)
+                    consumidores.append(_Consumidor(assinante, ao_receber))
+                inicio = time.perf_counter()
+                for i in range(quantidade):
+                    publicador.publicar_em_topico(topico, f"fanout {i}")
+                tempo_publicacao = time.perf_counter() - inicio
+                entregue = todas.wait(60)
+                tempo_total = time.perf_counter() - inicio
+                for consumidor in consumidores:
+                    consumidor.parar()
+            resultados[str(total)] = {
+                "publicacoes": quantidade,
+                "entregas": recebidas[0],
+                "completo": entregue,
+                "publicacao_ms_por_msg": tempo_publicacao / quantidade * 1000,
+                "entregas_s": recebidas[0] / tempo_total,
+            }
+        return resultados
+
+    def _app(self):
+        import tkinter as tk
+        from client_ui import App
+        root = tk.Tk()
+        root.withdraw()
+        with _silencioso():
+            app = App(root)
+        return root, app
+
+    def processamento_ui(self):
+        """Custo de enfileirar (mostrar_mensagem) e de drenar em quadros as mensagens de tópico e privadas."""
+        from conversas import ConversasPrivadas
+        root, app = self._app()
+        app.conversas = ConversasPrivadas(f"{self.prefixo}_conversas.db")
+        topico = f"{self.prefixo}_mural"
+        app.topicos_assinados.add(topico)
+        app.topico_selecionado = topico
+        app.conversa_privada_atual = "remetente"
+        mensagens = {
+            "topico": [envelope.decodificar(envelope.codificar(envelope.TIPO_TOPICO, "remetente", f"texto {i}",
+                                                               topico=topico)[0]) for i in range(self.mensagens)],
+            "privado": [envelope.decodificar(envelope.codificar(envelope.TIPO_PRIVADO, "remetente",
+                                                                f"texto {i}")[0]) for i in range(self.mensagens)],
+        }
+        resultados = {}
+        for tipo, lista in mensagens.items():
+            amostras = []
+            for mensagem in lista:
+                inicio = time.perf_counter()
+                app.mostrar_mensagem(mensagem)
+                amostras.append(time.perf_counter() - inicio)
+            # Os quadros que o Tk executaria: processamento, log e um insert por caixa
+            quadros = 0
+            inicio = time.perf_counter()
+            while not app.fila_ui.empty():
+                app._processar_fila_ui()
+                quadros += 1
+            root.update_idletasks()
+            drenagem = time.perf_counter() - inicio
+            resultados[tipo] = dict(_percentis(amostras), quadros=quadros, drenagem_tk_ms=drenagem * 1000,
+                                    drenagem_us_por_msg=drenagem / len(lista) * 1e6)
+        app.conversas.fechar()
+        root.destroy()
+        return resultados
+
+    def abertura_mural(self):
+        """Tempo de visualizar_mural para históricos de tamanhos diferentes."""
+        root, app = self._app()
+        resultados = {}
+        for linhas in self.historicos:
+            topico = f"{self.prefixo}_hist_{linhas}"
+            for i in range(linhas):
+                app.historico.anexar(topico, f"[{topico}] remetente: mensagem de histórico número {i}")
+            app.historico.flush()
+            app.topicos_assinados.add(topico)
+            tempo = _mediana_tempo(lambda: app.visualizar_mural(topico), self.repeticoes)
+            resultados[str(linhas)] = {"abertura_ms": tempo * 1000}
+        root.destroy()
+        return resultados
+
+    def limpar(self):
+        """Remove as filas criadas (útil com o broker real)."""
+        from broker_manager import BrokerManager
+        with _silencioso():
+            gerenciador = BrokerManager()
+            gerenciador.users.update(self.usuarios_criados)
+            gerenciador.remover_usuarios_em_paralelo(self.usuarios_criados)
+            gerenciador.close()
+
+    def executar(self, selecionados=None):
+        casos = {
+            "envio_privado": self.envio_privado,
+            "publicacao_topico": self.publicacao_topico,
+            "latencia_entrega": self.latencia_entrega,
+            "fanout": self.fanout,
+            "processamento_ui": self.processamento_ui,
+            "abertura_mural": self.abertura_mural,
+        }
+        resultados = {}
+        for nome, caso in casos.items():
+            if selecionados and nome not in selecionados:
+                continue
+            print(f"[Benchmarks] {nome}...")
+            try:
+                resultados[nome] = caso()
+            except Exception as e:
+                # Ex.: sem display para o Tk; o caso fica registrado como pulado
+                print(f"[Benchmarks] {nome} pulado: {e}")
+                resultados[nome] = {"pulado": str(e)}
+        return resultados
+
+
+def _metadados(broker):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "broker": broker,
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+    }
+
+
+def _achatar(dados, prefixo=""):
+    # {"a": {"b": 1}} -> {"a.b": 1}, só valores numéricos
+    planos = {}
+    for chave, valor in dados.items():
+        caminho = f"{prefixo}.{chave}" if prefixo else chave
+        if isinstance(valor, dict):
+            planos.update(_achatar(valor, caminho))
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            planos[caminho] = valor
+    return planos
+
+
+def comparar(caminho_antes, caminho_depois):
+    """Imprime, para cada métrica presente nos dois arquivos, o valor antes, depois e a variação."""
+    with open(caminho_antes, encoding="utf-8") as f:
+        antes = json.load(f)
+    with open(caminho_depois, encoding="utf-8") as f:
+        depois = json.load(f)
+    print(f"Antes:  {antes['meta'].get('commit')} ({antes['meta'].get('broker')})")
+    print(f"Depois: {depois['meta'].get('commit')} ({depois['meta'].get('broker')})")
+    valores_antes = _achatar(antes["resultados"])
+    valores_depois = _achatar(depois["resultados"])
+    for metrica in sorted(set(valores_antes) & set(valores_depois)):
+        a, d = valores_antes[metrica], valores_depois[metrica]
+        variacao = f"{(d - a) / a * 100:+.1f}%" if a else "n/a"
+        print(f"{metrica:60s} {a:14.3f} {d:14.3f} {variacao:>9s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks do cliente MOM.")
+    parser.add_argument("--broker", choices=("falso", "real"), default="falso")
+    parser.add_argument("--mensagens", type=int, default=2000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--assinantes", default="1,10,50", help="Números de assinantes do fanout")
+    parser.add_argument("--historicos", default="1000,10000,100000", help="Linhas de histórico do mural")
+    parser.add_argument("--casos", default="", help="Lista separada por vírgula (padrão: todos)")
+    parser.add_argument("--saida", help="Arquivo JSON de resultados")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"))
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    benchmarks = Benchmarks(
+        mensagens=args.mensagens,
+        repeticoes=args.repeticoes,
+        assinantes=tuple(int(n) for n in args.assinantes.split(",") if n),
+        historicos=tuple(int(n) for n in args.historicos.split(",") if n),
+    )
+    selecionados = {c for c in args.casos.split(",") if c}
+    diretorio_original = os.getcwd()
+    saida = os.path.abspath(args.saida) if args.saida else None
+
+    # Arquivos de histórico e de tópicos assinados ficam num diretório temporário
+    with tempfile.TemporaryDirectory() as diretorio:
+        os.chdir(diretorio)
+        try:
+            if args.broker == "falso":
+                with BrokerFalso().instalar():
+                    resultados = benchmarks.executar(selecionados)
+            else:
+                resultados = benchmarks.executar(selecionados)
+                benchmarks.limpar()
+        finally:
+            os.chdir(diretorio_original)
+
+    relatorio = {"meta": _metadados(args.broker), "resultados": resultados}
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=1)
+    if saida:
+        with open(saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+        print(f"[Benchmarks] Resultados gravados em '{saida}'.")
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
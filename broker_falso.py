@@ -0,0 +1,865 @@
+"""
+Broker RabbitMQ falso, em memória, para rodar clientes, testes de carga e benchmarks sem serviços.
+
+Cobre a parte do pika usada pelo projeto (BlockingConnection/BlockingChannel): queue_declare
+(inclusive passive e argumentos x-*), exchange_declare, queue_bind/unbind, queue_delete,
+exchange_delete, basic_publish, basic_consume, basic_qos, basic_ack, start/stop_consuming,
+call_later e publisher confirms (confirm_delivery e canal._impl.basic_publish). Roteia pelo
+exchange padrão e por exchanges fanout/direct, aplica x-max-length (drop-head e reject-publish)
+e reproduz os fechamentos de canal do broker: 404 NOT_FOUND, 406 PRECONDITION_FAILED e
+403 ACCESS_REFUSED, com as mensagens não confirmadas devolvidas à fila.
+
+Também serve, em 127.0.0.1, os endpoints da API de gerenciamento usados pelo projeto:
+/api/queues, /api/exchanges, /api/overview e /api/definitions (GET e POST), com 'columns',
+paginação e disable_stats. As taxas (*_details.rate) são sempre 0.0; os contadores são reais.
+
+Uso:
+    with BrokerFalso().instalar() as broker:
+        usuario = Usuario("ana")  # pika.BlockingConnection e RABBITMQ_API_URL apontam para o falso
+"""
+
+import heapq
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pika
+
+# Exchanges que o RabbitMQ cria em todo vhost
+EXCHANGES_PADRAO = {
+    "": "direct",
+    "amq.direct": "direct",
+    "amq.fanout": "fanout",
+    "amq.topic": "topic",
+    "amq.headers": "headers",
+    "amq.match": "headers",
+}
+
+
+class _Quadro:
+    # Equivalente mínimo de pika.frame.Method: só o atributo 'method' é usado pelos clientes
+    __slots__ = ("method",)
+
+    def __init__(self, method):
+        self.method = method
+
+
+class _Mensagem:
+    __slots__ = ("exchange", "routing_key", "properties", "body", "redelivered")
+
+    def __init__(self, exchange, routing_key, properties, body):
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.properties = properties
+        self.body = body
+        self.redelivered = False
+
+
+class _Fila:
+    def __init__(self, nome, durable, arguments, exclusive, auto_delete):
+        self.nome = nome
+        self.durable = durable
+        self.arguments = dict(arguments or {})
+        self.exclusive = exclusive
+        self.auto_delete = auto_delete
+        self.mensagens = deque()
+        self.consumidores = []
+        self.proximo_consumidor = 0
+        self.nao_confirmadas = 0
+        self.publicadas = 0
+        self.entregues = 0
+
+
+class _Consumidor:
+    __slots__ = ("canal", "fila", "tag", "callback", "auto_ack", "pendentes")
+
+    def __init__(self, canal, fila, tag, callback, auto_ack):
+        self.canal = canal
+        self.fila = fila
+        self.tag = tag
+        self.callback = callback
+        self.auto_ack = auto_ack
+        self.pendentes = 0
+
+    def tem_espaco(self):
+        return self.auto_ack or not self.canal.prefetch or self.pendentes < self.canal.prefetch
+
+
+class BrokerFalso:
+    """Estado do broker (filas, exchanges, bindings), compartilhado por todas as conexões falsas."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.filas = {}
+        self.exchanges = {nome: {"type": tipo, "durable": True} for nome, tipo in EXCHANGES_PADRAO.items()}
+        self.bindings = {}  # exchange -> {(fila, routing_key)}
+        self.conexoes = set()
+        self.publicadas = 0
+        self.entregues = 0
+        self._servidor = None
+        self.api_url = None
+
+    # --- Conexões ---
+
+    def conectar(self, parametros=None):
+        """Substituto de pika.BlockingConnection(parametros)."""
+        return ConexaoFalsa(self)
+
+    def derrubar_conexoes(self):
+        """Simula a queda do broker: todas as conexões abertas passam a falhar com StreamLostError."""
+        with self._lock:
+            conexoes = list(self.conexoes)
+        for conexao in conexoes:
+            conexao._derrubar(pika.exceptions.StreamLostError("Conexão derrubada pelo broker falso."))
+
+    # --- Operações AMQP (chamadas pelos canais, sempre com o lock) ---
+
+    def _declarar_fila(self, canal, nome, passive, durable, exclusive, auto_delete, arguments):
+        with self._lock:
+            if not nome:
+                nome = f"amq.gen-{uuid.uuid4().hex[:22]}"
+            fila = self.filas.get(nome)
+            if passive:
+                if fila is None:
+                    canal._falhar(404, f"NOT_FOUND - no queue '{nome}' in vhost '/'")
+                return fila
+            if fila is None:
+                if nome.startswith("amq."):
+                    canal._falhar(403, f"ACCESS_REFUSED - queue name '{nome}' contains reserved prefix 'amq.*'")
+                fila = self.filas[nome] = _Fila(nome, durable, arguments, exclusive, auto_delete)
+                return fila
+            if fila.durable != durable:
+                canal._falhar(406, f"PRECONDITION_FAILED - inequivalent arg 'durable' for queue '{nome}' in "
+                                   f"vhost '/': received '{str(durable).lower()}' but current is "
+                                   f"'{str(fila.durable).lower()}'")
+            recebidos = dict(arguments or {})
+            for chave in set(recebidos) | set(fila.arguments):
+                if recebidos.get(chave) != fila.arguments.get(chave):
+                    canal._falhar(406, f"PRECONDITION_FAILED - inequivalent arg '{chave}' for queue '{nome}' in "
+                                       f"vhost '/': received {recebidos.get(chave)!r} but current is "
+                                       f"{fila.arguments.get(chave)!r}")
+            return fila
+
+    def _declarar_exchange(self, canal, nome, tipo, passive, durable):
+        with self._lock:
+            existente = self.exchanges.get(nome)
+            if passive:
+                if existente is None:
+                    canal._falhar(404, f"NOT_FOUND - no exchange '{nome}' in vhost '/'")
+                return
+            if nome.startswith("amq.") or nome == "":
+                canal._falhar(403, f"ACCESS_REFUSED - exchange name '{nome}' contains reserved prefix 'amq.*'")
+            if existente is None:
+                self.exchanges[nome] = {"type": tipo, "durable": durable}
+            elif existente["type"] != tipo or existente["durable"] != durable:
+                canal._falhar(406, f"PRECONDITION_FAILED - inequivalent arg 'type' or 'durable' for exchange "
+                                   f"'{nome}' in vhost '/'")
+
+    def _ligar(self, canal, exchange, nome_fila, routing_key, ligar=True):
+        with self._lock:
+            if exchange not in self.exchanges or exchange == "":
+                canal._falhar(404 if exchange else 403, f"NOT_FOUND - no exchange '{exchange}' in vhost '/'")
+            if nome_fila not in self.filas:
+                canal._falhar(404, f"NOT_FOUND - no queue '{nome_fila}' in vhost '/'")
+            ligacoes = self.bindings.setdefault(exchange, set())
+            if ligar:
+                ligacoes.add((nome_fila, routing_key or ""))
+            else:
+                ligacoes.discard((nome_fila, routing_key or ""))
+
+    def _remover_fila(self, nome):
+        with self._lock:
+            fila = self.filas.pop(nome, None)
+            if fila is None:
+                return 0
+            for ligacoes in self.bindings.values():
+                for ligacao in [l for l in ligacoes if l[0] == nome]:
+                    ligacoes.discard(ligacao)
+            for consumidor in list(fila.consumidores):
+                consumidor.canal._consumidores.pop(consumidor.tag, None)
+            return len(fila.mensagens)
+
+    def _remover_exchange(self, canal, nome):
+        with self._lock:
+            if nome.startswith("amq.") or nome == "":
+                canal._falhar(403, "ACCESS_REFUSED - operation not permitted on the default exchange")
+            self.exchanges.pop(nome, None)
+            self.bindings.pop(nome, None)
+
+    #Resolve as filas de destino de uma publicação. Retorna None se o exchange não existe
+    def _rotear(self, exchange, routing_key):
+        if exchange == "":
+            return [self.filas[routing_key]] if routing_key in self.filas else []
+        dados = self.exchanges.get(exchange)
+        if dados is None:
+            return None
+        ligacoes = self.bindings.get(exchange, ())
+        if dados["type"] == "fanout":
+            nomes = {fila for fila, _ in ligacoes}
+        else:
+            # direct (topic/headers são tratados como direct: o projeto não os usa)
+            nomes = {fila for fila, chave in ligacoes if chave == routing_key}
+        return [self.filas[nome] for nome in sorted(nomes) if nome in self.filas]
+
+    def _publicar(self, canal, exchange, routing_key, body, properties):
+        """Enfileira a mensagem. Retorna False se alguma fila a recusou (reject-publish), None se o exchange não existe."""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        properties = properties or pika.BasicProperties()
+        with self._lock:
+            destinos = self._rotear(exchange, routing_key)
+            if destinos is None:
+                return None
+            aceita = True
+            self.publicadas += 1
+            for fila in destinos:
+                limite = fila.arguments.get("x-max-length")
+                if limite is not None and len(fila.mensagens) >= limite:
+                    if fila.arguments.get("x-overflow") == "reject-publish":
+                        aceita = False
+                        continue
+                    fila.mensagens.popleft()  # drop-head (padrão)
+                fila.mensagens.append(_Mensagem(exchange, routing_key, properties, body))
+                fila.publicadas += 1
+                self._despachar(fila)
+            return aceita
+
+    #Entrega mensagens prontas aos consumidores com espaço no prefetch, em round robin
+    def _despachar(self, fila):
+        while fila.mensagens and fila.consumidores:
+            total = len(fila.consumidores)
+            for deslocamento in range(total):
+                consumidor = fila.consumidores[(fila.proximo_consumidor + deslocamento) % total]
+                if consumidor.tem_espaco():
+                    fila.proximo_consumidor = (fila.proximo_consumidor + deslocamento + 1) % total
+                    break
+            else:
+                return
+            mensagem = fila.mensagens.popleft()
+            fila.entregues += 1
+            self.entregues += 1
+            consumidor.canal._entregar(consumidor, mensagem)
+
+    #Devolve à frente da fila mensagens entregues e não confirmadas (canal fechado ou nack com requeue)
+    def _devolver(self, fila, mensagens):
+        with self._lock:
+            if fila.nome not in self.filas:
+                return
+            for mensagem in reversed(mensagens):
+                mensagem.redelivered = True
+                fila.mensagens.appendleft(mensagem)
+            self._despachar(fila)
+
+    # --- API de gerenciamento ---
+
+    def _representar_fila(self, fila, com_estatisticas):
+        item = {
+            "name": fila.nome,
+            "vhost": "/",
+            "durable": fila.durable,
+            "auto_delete": fila.auto_delete,
+            "exclusive": fila.exclusive,
+            "arguments": dict(fila.arguments),
+            "messages": len(fila.mensagens) + fila.nao_confirmadas,
+            "messages_ready": len(fila.mensagens),
+            "messages_unacknowledged": fila.nao_confirmadas,
+            "consumers": len(fila.consumidores),
+        }
+        if com_estatisticas:
+            item["messages_details"] = {"rate": 0.0}
+            item["message_stats"] = {
+                "publish": fila.publicadas, "publish_details": {"rate": 0.0},
+                "deliver_get": fila.entregues, "deliver_get_details": {"rate": 0.0},
+            }
+        return item
+
+    def listar_filas_api(self, com_estatisticas=True):
+        with self._lock:
+            return [self._representar_fila(self.filas[nome], com_estatisticas) for nome in sorted(self.filas)]
+
+    def listar_exchanges_api(self):
+        with self._lock:
+            return [
+                {"name": nome, "vhost": "/", "type": dados["type"], "durable": dados["durable"],
+                 "auto_delete": False, "internal": False, "arguments": {}}
+                for nome, dados in sorted(self.exchanges.items())
+            ]
+
+    def visao_geral_api(self):
+        with self._lock:
+            canais = sum(len(conexao._canais) for conexao in self.conexoes)
+            return {
+                "object_totals": {
+                    "connections": len(self.conexoes), "channels": canais, "queues": len(self.filas),
+                    "exchanges": len(self.exchanges),
+                    "consumers": sum(len(fila.consumidores) for fila in self.filas.values()),
+                },
+                "queue_totals": {
+                    "messages": sum(len(f.mensagens) + f.nao_confirmadas for f in self.filas.values()),
+                    "messages_ready": sum(len(f.mensagens) for f in self.filas.values()),
+                    "messages_unacknowledged": sum(f.nao_confirmadas for f in self.filas.values()),
+                },
+                "message_stats": {
+                    "publish": self.publicadas, "publish_details": {"rate": 0.0},
+                    "deliver_get": self.entregues, "deliver_get_details": {"rate": 0.0},
+                },
+            }
+
+    def exportar_definicoes(self):
+        with self._lock:
+            return {
+                "queues": [
+                    {"name": f.nome, "vhost": "/", "durable": f.durable, "auto_delete": f.auto_delete,
+                     "arguments": dict(f.arguments)}
+                    for f in self.filas.values()
+                ],
+                "exchanges": [
+                    {"name": nome, "vhost": "/", "type": dados["type"], "durable": dados["durable"],
+                     "auto_delete": False, "internal": False, "arguments": {}}
+                    for nome, dados in self.exchanges.items() if nome not in EXCHANGES_PADRAO
+                ],
+                "bindings": [
+                    {"source": exchange, "vhost": "/", "destination": fila, "destination_type": "queue",
+                     "routing_key": chave, "arguments": {}}
+                    for exchange, ligacoes in self.bindings.items() for fila, chave in sorted(ligacoes)
+                ],
+            }
+
+    def importar_definicoes(self, definicoes):
+        """Como POST /api/definitions: cria o que falta; lança ValueError se algo existe com outros parâmetros."""
+        with self._lock:
+            for q in definicoes.get("queues", []):
+                fila = self.filas.get(q["name"])
+                argumentos = q.get("arguments") or {}
+                if fila is None:
+                    self.filas[q["name"]] = _Fila(q["name"], q.get("durable", True), argumentos,
+                                                  False, q.get("auto_delete", False))
+                elif fila.arguments != argumentos or fila.durable != q.get("durable", True):
+                    raise ValueError(f"inequivalent arg for queue '{q['name']}' in vhost '/'")
+            for ex in definicoes.get("exchanges", []):
+                existente = self.exchanges.get(ex["name"])
+                if existente is None:
+                    self.exchanges[ex["name"]] = {"type": ex.get("type", "direct"), "durable": ex.get("durable", True)}
+                elif existente["type"] != ex.get("type", "direct"):
+                    raise ValueError(f"inequivalent arg 'type' for exchange '{ex['name']}' in vhost '/'")
+            for b in definicoes.get("bindings", []):
+                if b["source"] not in self.exchanges or b["destination"] not in self.filas:
+                    raise ValueError(f"binding '{b['source']}' -> '{b['destination']}' refers to missing objects")
+                self.bindings.setdefault(b["source"], set()).add((b["destination"], b.get("routing_key", "")))
+
+    def iniciar_api(self, porta=0, endereco="127.0.0.1"):
+        """Serve a API de gerenciamento falsa numa thread daemon. Retorna a URL base (.../api)."""
+        if self._servidor is None:
+            self._servidor = ThreadingHTTPServer((endereco, porta), _criar_handler(self))
+            self._servidor.daemon_threads = True
+            threading.Thread(target=self._servidor.serve_forever, name="api-broker-falso", daemon=True).start()
+            self.api_url = f"http://{endereco}:{self._servidor.server_address[1]}/api"
+        return self.api_url
+
+    @contextmanager
+    def instalar(self, api=True):
+        """
+        Faz pika.BlockingConnection abrir conexões neste broker e, com api=True, aponta
+        RABBITMQ_API_URL para a API falsa. Tudo é restaurado ao sair do bloco 'with'.
+        """
+        original = pika.BlockingConnection
+        url_anterior = os.environ.get("RABBITMQ_API_URL")
+        pika.BlockingConnection = self.conectar
+        if api:
+            os.environ["RABBITMQ_API_URL"] = self.iniciar_api()
+        try:
+            yield self
+        finally:
+            pika.BlockingConnection = original
+            if api:
+                if url_anterior is None:
+                    os.environ.pop("RABBITMQ_API_URL", None)
+                else:
+                    os.environ["RABBITMQ_API_URL"] = url_anterior
+            self.fechar()
+
+    def fechar(self):
+        with self._lock:
+            conexoes = list(self.conexoes)
+        for conexao in conexoes:
+            conexao.close()
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+
+def _projetar(item, colunas):
+    # Reproduz o parâmetro 'columns' da API: caminhos com ponto viram dicionários aninhados
+    if not colunas:
+        return item
+    resultado = {}
+    for coluna in colunas:
+        origem, destino = item, resultado
+        partes = coluna.split(".")
+        for parte in partes[:-1]:
+            origem = origem.get(parte) if isinstance(origem, dict) else None
+            destino = destino.setdefault(parte, {})
+        if isinstance(origem, dict) and partes[-1] in origem:
+            destino[partes[-1]] = origem[partes[-1]]
+    return resultado
+
+
+def _listar(itens, parametros):
+    colunas = parametros.get("columns", [""])[0].split(",") if "columns" in parametros else None
+    itens = [_projetar(item, colunas) for item in itens]
+    if parametros.get("pagination", ["false"])[0] != "true" and "page" not in parametros:
+        return itens
+    tamanho = int(parametros.get("page_size", ["100"])[0])
+    pagina = int(parametros.get("page", ["1"])[0])
+    total_paginas = max(1, -(-len(itens) // tamanho))
+    fatia = itens[(pagina - 1) * tamanho:pagina * tamanho]
+    return {
+        "items": fatia, "page": pagina, "page_count": total_paginas, "page_size": tamanho,
+        "item_count": len(fatia), "total_count": len(itens), "filtered_count": len(itens),
+    }
+
+
+def _criar_handler(broker):
+
+    class Handler(BaseHTTPRequestHandler):
+        def _responder(self, status, dados=None):
+            corpo = json.dumps(dados).encode("utf-8") if dados is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def _rota(self):
+            url = urlsplit(self.path)
+            partes = [unquote(p) for p in url.path.split("/") if p]
+            if partes[:1] == ["api"]:
+                partes = partes[1:]
+            # O vhost ("/", %2F) é opcional nas listagens; só existe o vhost padrão
+            if len(partes) > 1 and partes[1] == "/":
+                partes = [partes[0]] + partes[2:]
+            return partes, parse_qs(url.query)
+
+        def do_GET(self):
+            partes, parametros = self._rota()
+            recurso = partes[0] if partes else ""
+            if recurso == "queues":
+                com_estatisticas = parametros.get("disable_stats", ["false"])[0] != "true"
+                self._responder(200, _listar(broker.listar_filas_api(com_estatisticas), parametros))
+            elif recurso == "exchanges":
+                self._responder(200, _listar(broker.listar_exchanges_api(), parametros))
+            elif recurso == "overview":
+                colunas = parametros["columns"][0].split(",") if "columns" in parametros else None
+                self._responder(200, _projetar(broker.visao_geral_api(), colunas))
+            elif recurso == "definitions":
+                self._responder(200, broker.exportar_definicoes())
+            else:
+                self._responder(404, {"error": "Object Not Found", "reason": "Not Found"})
+
+        def do_POST(self):
+            partes, _ = self._rota()
+            if partes[:1] != ["definitions"]:
+                self._responder(405, {"error": "Method Not Allowed"})
+                return
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            try:
+                broker.importar_definicoes(json.loads(self.rfile.read(tamanho) or b"{}"))
+            except (ValueError, KeyError) as e:
+                self._responder(400, {"error": "bad_request", "reason": str(e)})
+                return
+            self._responder(204)
+
+        def log_message(self, formato, *args):
+            pass # Não polui o console a cada requisição
+
+    return Handler
+
+
+class ConexaoFalsa:
+    """
+    Substituto de pika.BlockingConnection. Como no pika, entregas, confirmações e timers só
+    rodam na thread dona da conexão, dentro de process_data_events/start_consuming; outras
+    threads devem usar add_callback_threadsafe.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._eventos = queue.Queue()
+        self._timers = []  # heap de (instante, id, callback)
+        self._timers_cancelados = set()
+        self._ids_timer = itertools.count(1)
+        self._numeros_canal = itertools.count(1)
+        self._canais = {}
+        self._erro = None
+        self.is_open = True
+        with broker._lock:
+            broker.conexoes.add(self)
+
+    @property
+    def is_closed(self):
+        return not self.is_open
+
+    def _verificar(self):
+        if self._erro is not None:
+            raise self._erro
+        if not self.is_open:
+            raise pika.exceptions.ConnectionWrongStateError("BlockingConnection.channel() called on closed connection")
+
+    def channel(self, channel_number=None):
+        self._verificar()
+        canal = CanalFalso(self, channel_number or next(self._numeros_canal))
+        self._canais[canal.channel_number] = canal
+        return canal
+
+    def call_later(self, atraso, callback):
+        identificador = next(self._ids_timer)
+        heapq.heappush(self._timers, (time.monotonic() + atraso, identificador, callback))
+        return identificador
+
+    def remove_timeout(self, identificador):
+        self._timers_cancelados.add(identificador)
+
+    def add_callback_threadsafe(self, callback):
+        self._eventos.put(callback)
+
+    def sleep(self, duracao):
+        prazo = time.monotonic() + duracao
+        while time.monotonic() < prazo:
+            self.process_data_events(time_limit=prazo - time.monotonic())
+
+    #Executa os timers vencidos e retorna quanto falta para o próximo (None se não há timers)
+    def _rodar_timers(self):
+        while self._timers:
+            instante, identificador, callback = self._timers[0]
+            if identificador in self._timers_cancelados:
+                heapq.heappop(self._timers)
+                self._timers_cancelados.discard(identificador)
+                continue
+            falta = instante - time.monotonic()
+            if falta > 0:
+                return falta
+            heapq.heappop(self._timers)
+            callback()
+        return None
+
+    def process_data_events(self, time_limit=0):
+        """Processa eventos pendentes; espera até time_limit segundos (None = até o primeiro evento)."""
+        self._verificar()
+        prazo = None if time_limit is None else time.monotonic() + time_limit
+        while True:
+            proximo_timer = self._rodar_timers()
+            for canal in list(self._canais.values()):
+                canal._aplicar_fechamento_pendente()
+            espera = None if prazo is None else max(0.0, prazo - time.monotonic())
+            if proximo_timer is not None:
+                espera = proximo_timer if espera is None else min(espera, proximo_timer)
+            try:
+                evento = self._eventos.get(timeout=espera) if espera != 0 else self._eventos.get_nowait()
+            except queue.Empty:
+                if prazo is not None and time.monotonic() >= prazo:
+                    return
+                continue
+            # Despacha o evento e tudo que já estiver na fila, como o pika faz a cada leitura do socket
+            while True:
+                evento()
+                self._verificar()
+                try:
+                    evento = self._eventos.get_nowait()
+                except queue.Empty:
+                    break
+            self._rodar_timers()
+            return
+
+    def _derrubar(self, erro):
+        self._erro = erro
+        self._encerrar()
+        self._eventos.put(lambda: None)  # Acorda quem está bloqueado em process_data_events
+
+    def _encerrar(self):
+        self.is_open = False
+        for canal in list(self._canais.values()):
+            canal._encerrar()
+        with self.broker._lock:
+            self.broker.conexoes.discard(self)
+
+    def close(self, reply_code=200, reply_text="Normal shutdown"):
+        if self.is_open:
+            self._encerrar()
+            self._eventos.put(lambda: None)
+
+
+class _ImplCanalFalso:
+    # Equivalente do canal assíncrono (BlockingChannel._impl) usado na publicação em lote com confirms
+    def __init__(self, canal):
+        self.canal = canal
+
+    def confirm_delivery(self, ack_nack_callback, callback=None):
+        self.canal._verificar()
+        self.canal._callback_confirmacao = ack_nack_callback
+        self.canal._proxima_confirmacao = 1
+        if callback is not None:
+            self.canal.conexao.add_callback_threadsafe(lambda: callback(_Quadro(pika.spec.Confirm.SelectOk())))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        self.canal._publicar(exchange, routing_key, body, properties)
+
+    def add_on_close_callback(self, callback):
+        self.canal._callbacks_fechamento.append(callback)
+
+
+class CanalFalso:
+    """Substituto de pika.adapters.blocking_connection.BlockingChannel."""
+
+    def __init__(self, conexao, numero):
+        self.conexao = conexao
+        self.connection = conexao  # Mesmo atributo do BlockingChannel
+        self.broker = conexao.broker
+        self.channel_number = numero
+        self._impl = _ImplCanalFalso(self)
+        self._aberto = True
+        self._erro_pendente = None
+        self._consumidores = {}
+        self._nao_confirmadas = OrderedDict()  # delivery_tag -> (consumidor, mensagem)
+        self._proxima_tag = 1
+        self._consumindo = False
+        self._callback_confirmacao = None
+        self._proxima_confirmacao = 1
+        self._confirmacao_bloqueante = False
+        self._callbacks_fechamento = []
+        self.prefetch = 0
+
+    @property
+    def is_open(self):
+        return self._aberto and self.conexao.is_open
+
+    @property
+    def is_closed(self):
+        return not self.is_open
+
+    @property
+    def consumer_tags(self):
+        return list(self._consumidores)
+
+    # --- Fechamento ---
+
+    def _verificar(self):
+        self.conexao._verificar()
+        if self._erro_pendente is not None:
+            erro, self._erro_pendente = self._erro_pendente, None
+            self._encerrar(erro)
+            raise erro
+        if not self._aberto:
+            raise pika.exceptions.ChannelWrongStateError("Channel is closed.")
+
+    #O broker fecha o canal na hora (operações síncronas como declare e bind)
+    def _falhar(self, codigo, texto):
+        erro = pika.exceptions.ChannelClosedByBroker(codigo, texto)
+        self._encerrar(erro)
+        raise erro
+
+    #Fechamentos assíncronos (ex.: publicação em exchange inexistente) só aparecem na próxima operação
+    def _aplicar_fechamento_pendente(self):
+        if self._erro_pendente is not None and self._aberto:
+            self._encerrar(self._erro_pendente)
+            if self._consumindo:
+                erro, self._erro_pendente = self._erro_pendente, None
+                raise erro
+
+    def _encerrar(self, motivo=None):
+        if not self._aberto:
+            return
+        self._aberto = False
+        devolver = {}
+        with self.broker._lock:
+            for consumidor in self._consumidores.values():
+                if consumidor in consumidor.fila.consumidores:
+                    consumidor.fila.consumidores.remove(consumidor)
+            self._consumidores.clear()
+            for consumidor, mensagem in self._nao_confirmadas.values():
+                consumidor.fila.nao_confirmadas -= 1
+                devolver.setdefault(consumidor.fila, []).append(mensagem)
+            self._nao_confirmadas.clear()
+        for fila, mensagens in devolver.items():
+            self.broker._devolver(fila, mensagens)
+        self.conexao._canais.pop(self.channel_number, None)
+        if motivo is None:
+            motivo = pika.exceptions.ChannelClosedByClient(200, "Normal shutdown")
+        for callback in self._callbacks_fechamento:
+            callback(self._impl, motivo)
+
+    def close(self, reply_code=0, reply_text="Normal shutdown"):
+        self._encerrar()
+
+    # --- Declarações ---
+
+    def queue_declare(self, queue, passive=False, durable=False, exclusive=False, auto_delete=False, arguments=None):
+        self._verificar()
+        fila = self.broker._declarar_fila(self, queue, passive, durable, exclusive, auto_delete, arguments)
+        with self.broker._lock:
+            return _Quadro(pika.spec.Queue.DeclareOk(fila.nome, len(fila.mensagens), len(fila.consumidores)))
+
+    def queue_delete(self, queue, if_unused=False, if_empty=False):
+        self._verificar()
+        return _Quadro(pika.spec.Queue.DeleteOk(self.broker._remover_fila(queue)))
+
+    def queue_purge(self, queue):
+        self._verificar()
+        with self.broker._lock:
+            fila = self.broker.filas.get(queue)
+            if fila is None:
+                self._falhar(404, f"NOT_FOUND - no queue '{queue}' in vhost '/'")
+            quantidade = len(fila.mensagens)
+            fila.mensagens.clear()
+        return _Quadro(pika.spec.Queue.PurgeOk(quantidade))
+
+    def exchange_declare(self, exchange, exchange_type="direct", passive=False, durable=False,
+                         auto_delete=False, internal=False, arguments=None):
+        self._verificar()
+        tipo = getattr(exchange_type, "value", exchange_type)
+        self.broker._declarar_exchange(self, exchange, tipo, passive, durable)
+        return _Quadro(pika.spec.Exchange.DeclareOk())
+
+    def exchange_delete(self, exchange=None, if_unused=False):
+        self._verificar()
+        self.broker._remover_exchange(self, exchange)
+        return _Quadro(pika.spec.Exchange.DeleteOk())
+
+    def queue_bind(self, queue, exchange, routing_key=None, arguments=None):
+        self._verificar()
+        self.broker._ligar(self, exchange, queue, routing_key if routing_key is not None else queue)
+        return _Quadro(pika.spec.Queue.BindOk())
+
+    def queue_unbind(self, queue, exchange=None, routing_key=None, arguments=None):
+        self._verificar()
+        self.broker._ligar(self, exchange, queue, routing_key if routing_key is not None else queue, ligar=False)
+        return _Quadro(pika.spec.Queue.UnbindOk())
+
+    # --- Publicação ---
+
+    def _publicar(self, exchange, routing_key, body, properties):
+        self._verificar()
+        aceita = self.broker._publicar(self, exchange, routing_key, body, properties)
+        if aceita is None:
+            # O RabbitMQ fecha o canal de forma assíncrona; a publicação em si não falha
+            self._erro_pendente = pika.exceptions.ChannelClosedByBroker(
+                404, f"NOT_FOUND - no exchange '{exchange}' in vhost '/'")
+            return None
+        if self._callback_confirmacao is not None:
+            tag = self._proxima_confirmacao
+            self._proxima_confirmacao += 1
+            metodo = pika.spec.Basic.Ack(tag, False) if aceita else pika.spec.Basic.Nack(tag, False, False)
+            callback = self._callback_confirmacao
+            self.conexao.add_callback_threadsafe(lambda: callback(_Quadro(metodo)))
+        return aceita
+
+    def confirm_delivery(self):
+        self._verificar()
+        self._confirmacao_bloqueante = True
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        aceita = self._publicar(exchange, routing_key, body, properties)
+        if self._confirmacao_bloqueante:
+            # Com confirmação o pika espera a resposta: o fechamento do canal (404) aparece já aqui
+            if aceita is None:
+                self._verificar()
+            if aceita is False:
+                raise pika.exceptions.NackError([])
+
+    # --- Consumo ---
+
+    def basic_qos(self, prefetch_size=0, prefetch_count=0, global_qos=False):
+        self._verificar()
+        self.prefetch = prefetch_count
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False, exclusive=False,
+                      consumer_tag=None, arguments=None):
+        self._verificar()
+        tag = consumer_tag or f"ctag{self.channel_number}.{uuid.uuid4().hex}"
+        with self.broker._lock:
+            fila = self.broker.filas.get(queue)
+            if fila is None:
+                self._falhar(404, f"NOT_FOUND - no queue '{queue}' in vhost '/'")
+            consumidor = _Consumidor(self, fila, tag, on_message_callback, auto_ack)
+            self._consumidores[tag] = consumidor
+            fila.consumidores.append(consumidor)
+            self.broker._despachar(fila)
+        return tag
+
+    def basic_cancel(self, consumer_tag=""):
+        with self.broker._lock:
+            consumidor = self._consumidores.pop(consumer_tag, None)
+            if consumidor is not None and consumidor in consumidor.fila.consumidores:
+                consumidor.fila.consumidores.remove(consumidor)
+        return []
+
+    #Chamado pelo broker (com o lock): registra a entrega e agenda o callback na thread da conexão
+    def _entregar(self, consumidor, mensagem):
+        tag = self._proxima_tag
+        self._proxima_tag += 1
+        if not consumidor.auto_ack:
+            self._nao_confirmadas[tag] = (consumidor, mensagem)
+            consumidor.pendentes += 1
+            consumidor.fila.nao_confirmadas += 1
+        metodo = pika.spec.Basic.Deliver(consumidor.tag, tag, mensagem.redelivered, mensagem.exchange,
+                                         mensagem.routing_key)
+
+        def executar():
+            if self._aberto:
+                consumidor.callback(self, metodo, mensagem.properties, mensagem.body)
+
+        self.conexao.add_callback_threadsafe(executar)
+
+    def _confirmar(self, delivery_tag, multiple, requeue=None):
+        self._verificar()
+        if multiple:
+            tags = [tag for tag in self._nao_confirmadas if tag <= delivery_tag] if delivery_tag else list(self._nao_confirmadas)
+        else:
+            if delivery_tag not in self._nao_confirmadas:
+                self._falhar(406, f"PRECONDITION_FAILED - unknown delivery tag {delivery_tag}")
+            tags = [delivery_tag]
+        devolver = {}
+        with self.broker._lock:
+            filas = set()
+            for tag in tags:
+                consumidor, mensagem = self._nao_confirmadas.pop(tag)
+                consumidor.pendentes -= 1
+                consumidor.fila.nao_confirmadas -= 1
+                filas.add(consumidor.fila)
+                if requeue:
+                    devolver.setdefault(consumidor.fila, []).append(mensagem)
+            for fila in filas:
+                if fila not in devolver:
+                    self.broker._despachar(fila)
+        for fila, mensagens in devolver.items():
+            self.broker._devolver(fila, mensagens)
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        self._confirmar(delivery_tag, multiple)
+
+    def basic_nack(self, delivery_tag=0, multiple=False, requeue=True):
+        self._confirmar(delivery_tag, multiple, requeue)
+
+    def basic_reject(self, delivery_tag=0, requeue=True):
+        self._confirmar(delivery_tag, False, requeue)
+
+    def start_consuming(self):
+        self._verificar()
+        self._consumindo = True
+        try:
+            while self._consumidores and self.is_open:
+                self.conexao.process_data_events(time_limit=None)
+        finally:
+            self._consumindo = False
+
+    def stop_consuming(self, consumer_tag=None):
+        for tag in ([consumer_tag] if consumer_tag else list(self._consumidores)):
+            self.basic_cancel(tag)
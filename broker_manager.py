@@ -1,15 +1,65 @@
 import pika
 import requests
-from requests.auth import HTTPBasicAuth
 import time
+import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from cache_declaracoes import CacheDeclaracoes
+from perfis_filas import argumentos_fila
+from diretorio import DiretorioBroker
+from cliente_gerenciamento import ClienteGerenciamento
+from metricas import MetricasBroker
+from pool_canais import PoolCanais, ERROS_DE_CONEXAO
+from ganchos import Ganchos
+
+# Colunas de cada item de snapshot_filas (todas servem para ordenar)
+COLUNAS_SNAPSHOT = (
+    "fila", "usuario", "tipo", "mensagens", "prontas", "nao_confirmadas", "consumidores",
+    "taxa_entrada", "taxa_saida", "crescimento",
+)
+
+class ConflitoFilas(Exception):
+    """
+    Uma fila de usuário já existe com outros argumentos ou outra durabilidade (406
+    PRECONDITION_FAILED). Nada foi apagado; criar_usuario(..., recriar_em_conflito=True) apaga e
+    recria a fila, perdendo as mensagens pendentes.
+    """
+
+    def __init__(self, fila, detalhes):
+        self.fila = fila
+        self.detalhes = detalhes
+        super().__init__(f"Fila '{fila}' já existe com outros argumentos (perfil ou durabilidade). "
+                         f"Use recriar_em_conflito=True para apagá-la e recriá-la. Detalhes: {detalhes}")
+
 
 class BrokerManager:
     #Inicializa a conexão com RabbitMQ
-    def __init__(self):
-        self.connection = None
-        self.channel = None
-        self.api_url = 'http://localhost:15672/api'
-        self.auth = HTTPBasicAuth('guest', 'guest')
+    def __init__(self, perfil_filas="padrao", cliente_gerenciamento=None, trabalhadores=4):
+        # Cada operação empresta um canal exclusivo do pool, então o BrokerManager pode ser usado
+        # por várias threads; um canal fechado pelo broker (404/406) é reaberto no próximo empréstimo
+        self._pool = PoolCanais(
+            pika.ConnectionParameters('localhost', heartbeat=60),
+            tamanho=trabalhadores,
+            nome="BrokerManager"
+        )
+        self.trabalhadores = trabalhadores
+        # Observadores das declarações, remoções e contagens (ver ganchos e adicionar_gancho)
+        self.ganchos = Ganchos("BrokerManager")
+        # Pool de threads de executar_em_paralelo (criado sob demanda)
+        self._executor = None
+        self._lock_executor = threading.Lock()
+        # Cliente HTTP keep-alive da API de gerenciamento (URL e credenciais configuráveis)
+        self.gerenciamento = cliente_gerenciamento or ClienteGerenciamento.compartilhado()
+        # Listagens projetadas e em cache da API de gerenciamento
+        self.diretorio = DiretorioBroker.compartilhado(self.gerenciamento)
+        # Filas e exchanges já declarados com sucesso nesta sessão
+        self.declaracoes = CacheDeclaracoes()
+        # Perfil padrão de declaração das filas de usuário (ver perfis_filas)
+        self.perfil_filas = perfil_filas
+        # Amostragem de métricas em segundo plano (desligada até iniciar_amostragem_metricas)
+        self.metricas = None
+        self._parar_amostragem = threading.Event()
         self._connect_to_rabbitmq()
 
         # Inicializa o conjunto de usuários com as filas já existentes
@@ -19,39 +69,30 @@ class BrokerManager:
     #Estabelece a conexão com o RabbitMQ
     def _connect_to_rabbitmq(self):
         
-        if self.connection and self.connection.is_open:
-            return
-
         try:
-            # heartbeat para manter a conexão viva
-            self.connection = pika.BlockingConnection(pika.ConnectionParameters('localhost', heartbeat=60))
-            self.channel = self.connection.channel()
+            # Abre a primeira conexão do pool; as demais são abertas sob demanda
+            self._pool.executar(lambda canal: None)
             print("[BrokerManager] Conectado ao RabbitMQ.")
-        except pika.exceptions.AMQPConnectionError as e:
+        except ERROS_DE_CONEXAO as e:
             print(f"[BrokerManager] ERRO CRÍTICO: Não foi possível conectar ao RabbitMQ: {e}")
             print("[BrokerManager] Certifique-se de que o RabbitMQ está rodando e acessível.")
-            self.connection = None
-            self.channel = None
             # Relevanta o erro para o chamador se a conexão inicial falhar
             raise ConnectionError(f"Falha ao conectar ao RabbitMQ: {e}") 
 
-    #Garante que a conexão e o canal estejam abertos. Tenta reconectar se necessário
+    #Garante que haja uma conexão utilizável no pool. O pool reconecta e reabre canais se necessário
     def _ensure_connected(self):
         
-        if not self.connection or self.connection.is_closed or not self.channel or self.channel.is_closed:
-            print("[BrokerManager] Conexão ou canal perdidos. Tentando reconectar...")
-            try:
-                self._connect_to_rabbitmq()
-            except ConnectionError: # Captura o erro relançado por _connect_to_rabbitmq
-                print("[BrokerManager] Não foi possível restabelecer a conexão com o RabbitMQ.")
-                return False
-            
-            if not self.connection or self.connection.is_closed:
-                return False
-        return True
+        try:
+            self._pool.executar(lambda canal: None)
+            return True
+        except ERROS_DE_CONEXAO:
+            print("[BrokerManager] Não foi possível restabelecer a conexão com o RabbitMQ.")
+            return False
+        except RuntimeError: # Pool já fechado por close()
+            return False
 
     #Trata o erro PRECONDITION_FAILED (conflito de parâmetros)
-    def _handle_precondition_failed(self, name, item_type="fila", durable_expected=True):
+    def _handle_precondition_failed(self, canal, name, item_type="fila", durable_expected=True, arguments=None):
         """
         Lida com o erro PRECONDITION_FAILED, tentando excluir e recriar a fila/exchange.
         AVISO: Esta função PODE apagar dados de filas/exchanges existentes.
@@ -60,59 +101,100 @@ class BrokerManager:
               f"Tentando excluir e recriar com durable={durable_expected}. Isso APAGARÁ dados existentes.")
         try:
             if item_type == "fila":
-                self.channel.queue_delete(queue=name)
+                canal.queue_delete(queue=name)
                 time.sleep(0.05) # Pequeno delay para garantir que o RabbitMQ processe a exclusão
-                self.channel.queue_declare(queue=name, durable=durable_expected)
+                canal.queue_declare(queue=name, durable=durable_expected, arguments=arguments)
             elif item_type == "exchange":
-                self.channel.exchange_delete(exchange=name)
+                canal.exchange_delete(exchange=name)
                 time.sleep(0.05) # Pequeno delay
-                self.channel.exchange_declare(exchange=name, exchange_type='fanout', durable=durable_expected)
+                canal.exchange_declare(exchange=name, exchange_type='fanout', durable=durable_expected)
             print(f"[BrokerManager] {item_type.capitalize()} '{name}' recriada com sucesso como durable={durable_expected}.")
             return True
         except Exception as delete_e:
             print(f"[BrokerManager][ERRO] Falha ao excluir ou recriar {item_type} '{name}': {delete_e}")
             return False
 
-    def criar_usuario(self, nome):
+    def criar_usuario(self, nome, perfil=None, sobrescritas=None, recriar_em_conflito=False):
+        """
+        Cria (ou verifica) as filas do usuário. Se uma fila já existir com outros argumentos ou
+        outra durabilidade (ex.: criada com outro perfil), levanta ConflitoFilas sem apagar nada;
+        com recriar_em_conflito=True a fila é apagada e recriada, PERDENDO as mensagens pendentes.
+        """
         if not self._ensure_connected():
             return "Erro: Conexão com RabbitMQ não estabelecida."
 
+        # Perfil ou ajustes explícitos pedem que o broker confira os argumentos, sem cache
+        usar_cache = perfil is None and sobrescritas is None
+        # Argumentos das filas (TTL, tamanho máximo, tipo) conforme o perfil e ajustes do usuário
+        perfil = perfil or self.perfil_filas
+        try:
+            args_main = argumentos_fila(nome, perfil, sobrescritas)
+            args_topic = argumentos_fila(f"{nome}_topicos", perfil, sobrescritas)
+        except ValueError as e:
+            return f"Erro ao criar usuário '{nome}': {e}"
+
         # Verifica se o usuário já existe no cache local
         if nome in self.users:
-            
-            result_main = self._declare_queue_robustly(nome, "fila")
-            result_topic = self._declare_queue_robustly(f"{nome}_topicos", "fila")
+            # Verificação/correção explícita: sempre consulta o broker (a fila pode ter sido
+            # apagada por fora ou ter outros argumentos), nunca o cache de declarações
+            result_main = self._declare_queue_robustly(nome, "fila", args_main, recriar_em_conflito, usar_cache=False)
+            result_topic = self._declare_queue_robustly(
+                f"{nome}_topicos", "fila", args_topic, recriar_em_conflito, usar_cache=False
+            )
             
             if "Conflito irrecuperável" in result_main or "Conflito irrecuperável" in result_topic:
                  return f"Usuário '{nome}' já existe, mas houve um erro ao verificar/corrigir suas filas: {result_main} | {result_topic}"
             return f"Usuário '{nome}' já existe (filas verificadas/corrigidas)."
 
         # Se o usuário não está no cache local, tenta criá-lo
-        result_main = self._declare_queue_robustly(nome, "fila")
+        result_main = self._declare_queue_robustly(nome, "fila", args_main, recriar_em_conflito, usar_cache)
         if "Conflito irrecuperável" in result_main:
             return f"Erro ao criar usuário '{nome}': {result_main}"
 
-        result_topic = self._declare_queue_robustly(f"{nome}_topicos", "fila")
+        result_topic = self._declare_queue_robustly(f"{nome}_topicos", "fila", args_topic, recriar_em_conflito, usar_cache)
         if "Conflito irrecuperável" in result_topic:
             # Se a fila principal foi criada mas a de tópico falhou, tente reverter 
             # ou apenas retorne o erro para que o usuário saiba que algo deu errado
             return f"Erro ao criar filas de tópico para '{nome}': {result_topic}"
 
         self.users.add(nome)
+        self.diretorio.invalidar("queues")
         return f"Usuário '{nome}' e suas filas criados/verificados com sucesso."
         
-    #Tenta declarar uma fila/exchange e lida com PRECONDITION_FAILED.
-    def _declare_queue_robustly(self, queue_name, item_type):
+    #Chave do cache de declarações: inclui os argumentos, pois a mesma fila com outro perfil é outra declaração
+    @staticmethod
+    def _chave_declaracao(item_type, nome, arguments=None):
+        return (item_type, nome, tuple(sorted((arguments or {}).items())))
+
+    #Tenta declarar uma fila/exchange e lida com PRECONDITION_FAILED. Filas só são recriadas (apagando as mensagens) com recriar_em_conflito
+    def _declare_queue_robustly(self, queue_name, item_type, arguments=None, recriar_em_conflito=False, usar_cache=True):
      
-        try:
+        chave = self._chave_declaracao(item_type, queue_name, arguments)
+        if usar_cache and self.declaracoes.contem(chave):
+            return "Sucesso na declaração (em cache)."
+
+        def declarar(canal):
             if item_type == "fila":
-                self.channel.queue_declare(queue=queue_name, durable=True)
+                canal.queue_declare(queue=queue_name, durable=True, arguments=arguments)
             elif item_type == "exchange":
-                self.channel.exchange_declare(exchange=queue_name, exchange_type='fanout', durable=True)
+                canal.exchange_declare(exchange=queue_name, exchange_type='fanout', durable=True)
+
+        try:
+            self.ganchos.observar("declarar", lambda: self._pool.executar(declarar), tipo=item_type, nome=queue_name)
+            self.declaracoes.adicionar(chave)
             return "Sucesso na declaração."
         except pika.exceptions.ChannelClosedByBroker as e:
+            self.declaracoes.invalidar_por_erro(e)
+            # O broker fechou o canal; o pool entrega um canal novo para a correção
+            if e.reply_code == 406 and item_type == "fila" and not recriar_em_conflito:
+                print(f"[BrokerManager][AVISO] Fila '{queue_name}' existe com argumentos diferentes. Nada foi apagado.")
+                raise ConflitoFilas(queue_name, e)
             if "PRECONDITION_FAILED" in str(e):
-                if self._handle_precondition_failed(queue_name, item_type, True):
+                corrigido = self._pool.executar(
+                    lambda canal: self._handle_precondition_failed(canal, queue_name, item_type, True, arguments)
+                )
+                if corrigido:
+                    self.declaracoes.adicionar(chave)
                     return "Sucesso na declaração (após correção)."
                 else:
                     return f"Conflito irrecuperável para {item_type} '{queue_name}'. Detalhes: {e}"
@@ -130,7 +212,10 @@ class BrokerManager:
 
         # Tenta remover a fila principal
         try:
-            self.channel.queue_delete(queue=nome)
+            self.ganchos.observar(
+                "remover", lambda: self._pool.executar(lambda canal: canal.queue_delete(queue=nome)),
+                tipo="fila", nome=nome
+            )
             print(f"[BrokerManager] Fila principal '{nome}' removida.")
         except pika.exceptions.ChannelClosedByBroker as e:
              print(f"[BrokerManager][AVISO] Fila principal '{nome}' não pôde ser removida, talvez não exista: {e}")
@@ -140,27 +225,26 @@ class BrokerManager:
 
         # Tenta remover a fila de tópicos associada
         try:
-            self.channel.queue_delete(queue=f"{nome}_topicos")
+            self.ganchos.observar(
+                "remover", lambda: self._pool.executar(lambda canal: canal.queue_delete(queue=f"{nome}_topicos")),
+                tipo="fila", nome=f"{nome}_topicos"
+            )
             print(f"[BrokerManager] Fila de tópicos '{nome}_topicos' removida.")
         except pika.exceptions.ChannelClosedByBroker as e:
             print(f"[BrokerManager][AVISO] Fila de tópicos '{nome}_topicos' não pôde ser removida, talvez não exista: {e}")
         except Exception as e:
             print(f"[BrokerManager][ERRO] Erro ao remover fila de tópicos '{nome}_topicos': {e}")
             
-        self.users.remove(nome) # Remove do conjunto local
+        self.declaracoes.remover_entidade("fila", nome)
+        self.declaracoes.remover_entidade("fila", f"{nome}_topicos")
+        self.users.discard(nome) # Remove do conjunto local (discard: outra thread pode ter removido antes)
+        self.diretorio.invalidar("queues")
         return f"Usuário '{nome}' e suas filas associadas removidos."
 
     def listar_usuarios(self):
         
         try:
-            resp = requests.get(f"{self.api_url}/queues", auth=self.auth)
-            resp.raise_for_status() 
-            filas = resp.json()
-            nomes_filas = [
-                fila['name'] for fila in filas
-                if not fila['name'].startswith('amq.') and not fila['name'].endswith('_topicos')
-            ]
-            return nomes_filas
+            return self.diretorio.listar_usuarios()
         except requests.exceptions.ConnectionError:
             print("[BrokerManager] Erro de conexão ao listar usuários (API). O plugin RabbitMQ Management pode não estar rodando ou acessível.")
             return []
@@ -175,7 +259,9 @@ class BrokerManager:
         if not self._ensure_connected():
             return "Erro: Conexão com RabbitMQ não estabelecida."
 
-        return self._declare_queue_robustly(nome, "exchange")
+        resultado = self._declare_queue_robustly(nome, "exchange")
+        self.diretorio.invalidar("exchanges")
+        return resultado
 
     def remover_topico(self, nome):
         if not self._ensure_connected():
@@ -183,8 +269,13 @@ class BrokerManager:
 
         if nome.startswith("amq.") or nome == "":
             return f"Remoção do tópico '{nome}' não permitida (exchange do sistema)."
+        self.declaracoes.remover_entidade("exchange", nome)
+        self.diretorio.invalidar("exchanges")
         try:
-            self.channel.exchange_delete(exchange=nome)
+            self.ganchos.observar(
+                "remover", lambda: self._pool.executar(lambda canal: canal.exchange_delete(exchange=nome)),
+                tipo="exchange", nome=nome
+            )
             return f"Tópico '{nome}' removido com sucesso."
         except pika.exceptions.ChannelClosedByBroker as e:
             print(f"[BrokerManager][AVISO] Tópico '{nome}' não pôde ser removido, talvez não exista: {e}")
@@ -195,11 +286,7 @@ class BrokerManager:
     def listar_topicos(self):
         
         try:
-            resp = requests.get(f"{self.api_url}/exchanges", auth=self.auth)
-            resp.raise_for_status() 
-            exchanges = resp.json()
-            topicos = [ex['name'] for ex in exchanges if ex['type'] == 'fanout' and not ex['name'].startswith('amq.') and ex['name'] != '']
-            return topicos
+            return self.diretorio.listar_topicos()
         except requests.exceptions.ConnectionError:
             print("[BrokerManager] Erro de conexão ao listar tópicos (API). O plugin RabbitMQ Management pode não estar rodando ou acessível.")
             return []
@@ -210,12 +297,254 @@ class BrokerManager:
             print(f"[BrokerManager] Erro inesperado ao listar tópicos (API): {e}")
             return []
 
+    # --- Provisionamento em lote (API de definições) ---
+
+    #Importa um conjunto de definições (filas, exchanges, bindings) no vhost padrão em uma única requisição
+    def _importar_definicoes(self, definicoes):
+        
+        self.gerenciamento.requisitar("POST", "definitions/%2F", json=definicoes)
+
+    #Importa as definições em blocos, marcando em 'resultados' o nome de cada item do bloco
+    def _importar_em_blocos(self, itens, chave_definicao, resultados, nome_do_item, tamanho_bloco):
+        """
+        Um bloco recusado pela API (4xx: definições inválidas) é dividido ao meio e importado de
+        novo até isolar os itens com erro (a importação é idempotente). API fora do ar, timeout ou
+        erro 5xx não dependem dos itens: o restante do lote é marcado como falho de uma vez.
+        """
+        pendentes = deque(itens[inicio:inicio + tamanho_bloco] for inicio in range(0, len(itens), tamanho_bloco))
+        while pendentes:
+            bloco = pendentes.popleft()
+            try:
+                self._importar_definicoes({chave_definicao: bloco})
+            except requests.exceptions.HTTPError as e:
+                resposta = e.response
+                if resposta is None or not 400 <= resposta.status_code < 500:
+                    self._falhar_restantes(bloco, pendentes, resultados, nome_do_item, e)
+                    return
+                if len(bloco) > 1:
+                    meio = len(bloco) // 2
+                    pendentes.appendleft(bloco[meio:])
+                    pendentes.appendleft(bloco[:meio])
+                else:
+                    resultados[nome_do_item(bloco[0])] = f"Erro na importação: {resposta.text}"
+                continue
+            except requests.exceptions.RequestException as e:
+                self._falhar_restantes(bloco, pendentes, resultados, nome_do_item, e)
+                return
+            for item in bloco:
+                resultados.setdefault(nome_do_item(item), "Criado.")
+
+    #Marca como falhos o bloco atual e todos os que ainda não foram importados
+    def _falhar_restantes(self, bloco, pendentes, resultados, nome_do_item, erro):
+        
+        print(f"[BrokerManager][ERRO] Importação de definições interrompida: {erro}")
+        for restante in (bloco, *pendentes):
+            for item in restante:
+                resultados[nome_do_item(item)] = f"Erro na importação (API indisponível): {erro}"
+
+    #Lê as filas existentes (nome e argumentos) para separar o que já existe do que precisa ser criado
+    def _filas_existentes(self):
+        
+        self.diretorio.invalidar("queues")
+        filas = self.diretorio.consultar("queues", ("name", "arguments"), disable_stats="true")
+        return {q['name']: q.get('arguments') or {} for q in filas}
+
+    def criar_usuarios_em_lote(self, nomes, perfil=None, tamanho_bloco=2000):
+        """
+        Cria as filas (principal e _topicos) de muitos usuários com poucas requisições à API de
+        definições, em vez de dois queue_declare síncronos por usuário.
+        Retorna {nome: resultado}. Filas que já existem com outros argumentos não são alteradas
+        (a importação não apaga dados) e aparecem como conflito.
+        """
+        perfil = perfil or self.perfil_filas
+        try:
+            existentes = self._filas_existentes()
+        except requests.exceptions.RequestException as e:
+            return {nome: f"Erro ao consultar filas existentes: {e}" for nome in nomes}
+
+        resultados = {}
+        filas = []
+        for nome in dict.fromkeys(nomes): # Remove duplicados mantendo a ordem
+            for fila in (nome, f"{nome}_topicos"):
+                try:
+                    argumentos = argumentos_fila(fila, perfil) or {}
+                except ValueError as e:
+                    resultados[nome] = f"Erro: {e}"
+                    break
+                if fila in existentes:
+                    if existentes[fila] != argumentos:
+                        resultados[nome] = f"Conflito: fila '{fila}' já existe com argumentos {existentes[fila]}."
+                    continue
+                filas.append({"name": fila, "durable": True, "auto_delete": False, "arguments": argumentos})
+
+        # Itens do mesmo usuário são marcados pelo nome do usuário (sem o sufixo _topicos)
+        self._importar_em_blocos(
+            filas, "queues", resultados,
+            lambda fila: fila["name"][:-len("_topicos")] if fila["name"].endswith("_topicos") else fila["name"],
+            tamanho_bloco
+        )
+
+        for nome in dict.fromkeys(nomes):
+            resultados.setdefault(nome, "Já existia.")
+            if resultados[nome] in ("Criado.", "Já existia."):
+                self.users.add(nome)
+                for fila in (nome, f"{nome}_topicos"):
+                    self.declaracoes.adicionar(self._chave_declaracao("fila", fila, argumentos_fila(fila, perfil)))
+        self.diretorio.invalidar("queues")
+        return resultados
+
+    def criar_topicos_em_lote(self, nomes, assinaturas=None, tamanho_bloco=2000):
+        """
+        Cria muitos exchanges de tópico (fanout, duráveis) e, opcionalmente, os bindings
+        'assinaturas' = {topico: [usuarios]} ligando cada tópico à fila _topicos dos usuários.
+        Só são ligados tópicos criados nesta chamada a filas _topicos que já existem; o resto é
+        reportado no resultado do tópico. Retorna {topico: resultado}.
+        """
+        resultados = {}
+        exchanges = [
+            {"name": nome, "type": "fanout", "durable": True, "auto_delete": False,
+             "internal": False, "arguments": {}}
+            for nome in dict.fromkeys(nomes)
+            if not nome.startswith("amq.") and nome != ""
+        ]
+        for nome in nomes:
+            if nome.startswith("amq.") or nome == "":
+                resultados[nome] = "Erro: nome reservado para exchanges do sistema."
+        self._importar_em_blocos(exchanges, "exchanges", resultados, lambda ex: ex["name"], tamanho_bloco)
+
+        filas = set()
+        if assinaturas:
+            try:
+                filas = set(self._filas_existentes())
+            except requests.exceptions.RequestException as e:
+                print(f"[BrokerManager][AVISO] Não foi possível consultar as filas existentes: {e}")
+        bindings = []
+        for topico, usuarios in (assinaturas or {}).items():
+            if topico not in resultados:
+                resultados[topico] = "Erro: tópico das assinaturas não está na lista de tópicos a criar."
+                continue
+            if resultados[topico] != "Criado.":
+                continue
+            sem_fila = [usuario for usuario in usuarios if f"{usuario}_topicos" not in filas]
+            for usuario in usuarios:
+                if f"{usuario}_topicos" in filas:
+                    bindings.append({"source": topico, "destination": f"{usuario}_topicos",
+                                     "destination_type": "queue", "routing_key": "", "arguments": {}})
+            if sem_fila:
+                resultados[topico] = f"Tópico criado, mas sem fila de tópicos para: {', '.join(sem_fila)}"
+        resultados_bindings = {}
+        self._importar_em_blocos(bindings, "bindings", resultados_bindings, lambda b: b["source"], tamanho_bloco)
+        for topico, resultado in resultados_bindings.items():
+            if resultado != "Criado.":
+                resultados[topico] = f"Tópico criado, mas falha nas assinaturas: {resultado}"
+
+        for ex in exchanges:
+            if resultados.get(ex["name"], "").startswith(("Criado.", "Tópico criado")):
+                self.declaracoes.adicionar(self._chave_declaracao("exchange", ex["name"]))
+        self.diretorio.invalidar("exchanges")
+        return resultados
+
+    def exportar_topologia(self, caminho):
+        """Salva em 'caminho' (JSON) as filas, exchanges e bindings de usuários e tópicos do vhost padrão."""
+        try:
+            definicoes = self.gerenciamento.get_json("definitions/%2F")
+        except requests.exceptions.RequestException as e:
+            return f"Erro ao exportar topologia: {e}"
+
+        def do_sistema(nome):
+            return nome == "" or nome.startswith("amq.")
+
+        topologia = {
+            "queues": [q for q in definicoes.get("queues", []) if not do_sistema(q["name"])],
+            "exchanges": [ex for ex in definicoes.get("exchanges", []) if not do_sistema(ex["name"])],
+            "bindings": [b for b in definicoes.get("bindings", []) if not do_sistema(b["source"])],
+        }
+        try:
+            with open(caminho, "w", encoding="utf-8") as f:
+                json.dump(topologia, f, ensure_ascii=False, indent=1)
+        except OSError as e:
+            return f"Erro ao salvar topologia em '{caminho}': {e}"
+        return (f"Topologia exportada para '{caminho}': {len(topologia['queues'])} filas, "
+                f"{len(topologia['exchanges'])} tópicos, {len(topologia['bindings'])} assinaturas.")
+
+    def restaurar_topologia(self, caminho):
+        """Recria, com uma única importação de definições, a topologia salva por exportar_topologia."""
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                topologia = json.load(f)
+        except (OSError, ValueError) as e:
+            return f"Erro ao ler topologia de '{caminho}': {e}"
+        try:
+            self._importar_definicoes(topologia)
+        except requests.exceptions.RequestException as e:
+            detalhe = e.response.text if getattr(e, "response", None) is not None else str(e)
+            return f"Erro ao restaurar topologia: {detalhe}"
+
+        self.users.update(q["name"] for q in topologia.get("queues", []) if not q["name"].endswith("_topicos"))
+        self.diretorio.invalidar()
+        return (f"Topologia restaurada de '{caminho}': {len(topologia.get('queues', []))} filas, "
+                f"{len(topologia.get('exchanges', []))} tópicos, {len(topologia.get('bindings', []))} assinaturas.")
+
+    def snapshot_filas(self, ordenar_por="mensagens", limite=None):
+        """
+        Retorna o estado de todas as filas de usuário e de tópicos a partir de uma única consulta
+        projetada à API de gerenciamento (sem queue_declare passivo por fila).
+        Cada item tem: fila, usuario, tipo ('principal'/'topicos'), mensagens, prontas,
+        nao_confirmadas, consumidores, taxa_entrada, taxa_saida e crescimento (msg/s).
+        A lista vem ordenada de forma decrescente por 'ordenar_por' e cortada em 'limite' itens.
+        Os números são lidos na hora (sem o cache do diretório), já que servem para métricas e
+        para o painel de filas atrasadas. Retorna None se a API de gerenciamento falhar, para não
+        confundir o erro com um broker sem filas.
+        """
+        if ordenar_por not in COLUNAS_SNAPSHOT:
+            raise ValueError(f"Coluna de ordenação desconhecida: '{ordenar_por}'. Use uma de {list(COLUNAS_SNAPSHOT)}.")
+        colunas = (
+            "name", "messages", "messages_ready", "messages_unacknowledged", "consumers",
+            "messages_details.rate",
+            "message_stats.publish_details.rate",
+            "message_stats.deliver_get_details.rate",
+        )
+        try:
+            filas = self.diretorio.consultar("queues", colunas, fresco=True)
+        except requests.exceptions.RequestException as e:
+            print(f"[BrokerManager] Erro ao obter snapshot das filas (API): {e}")
+            return None
+
+        def taxa(item, *caminho):
+            for chave in caminho:
+                item = item.get(chave) or {}
+            return item.get("rate", 0.0)
+
+        snapshot = []
+        for q in filas:
+            nome = q["name"]
+            if nome.startswith("amq."):
+                continue
+            topicos = nome.endswith("_topicos")
+            snapshot.append({
+                "fila": nome,
+                "usuario": nome[:-len("_topicos")] if topicos else nome,
+                "tipo": "topicos" if topicos else "principal",
+                "mensagens": q.get("messages") or 0,
+                "prontas": q.get("messages_ready") or 0,
+                "nao_confirmadas": q.get("messages_unacknowledged") or 0,
+                "consumidores": q.get("consumers") or 0,
+                "taxa_entrada": taxa(q, "message_stats", "publish_details"),
+                "taxa_saida": taxa(q, "message_stats", "deliver_get_details"),
+                "crescimento": taxa(q, "messages_details"),
+            })
+        snapshot.sort(key=lambda item: item[ordenar_por], reverse=True)
+        return snapshot[:limite] if limite else snapshot
+
     def contar_mensagens_fila(self, fila):
         if not self._ensure_connected():
             return None # Não pode contar se não está conectado
 
         try:
-            q = self.channel.queue_declare(queue=fila, passive=True)
+            q = self.ganchos.observar(
+                "contar", lambda: self._pool.executar(lambda canal: canal.queue_declare(queue=fila, passive=True)),
+                nome=fila
+            )
             return q.method.message_count
         except pika.exceptions.ChannelClosedByBroker as e:
             print(f"[BrokerManager][AVISO] Fila '{fila}' não encontrada ao tentar contar mensagens: {e}")
@@ -224,20 +553,113 @@ class BrokerManager:
             print(f"[BrokerManager][ERRO] Erro ao contar mensagens da fila '{fila}': {e}")
             return None
 
-    def close(self):
-        """Fecha a conexão do RabbitMQ."""
-        if self.channel and self.channel.is_open:
+    # --- Ganchos ---
+
+    def adicionar_gancho(self, observador, http=True):
+        """
+        Registra observador(evento) para declarar, remover e contar (ver ganchos.Evento) e,
+        com http=True, para as chamadas à API de gerenciamento (eventos 'http', com método,
+        caminho e status). O cliente HTTP é compartilhado pelo processo.
+        """
+        self.ganchos.adicionar(observador)
+        if http:
+            self.gerenciamento.ganchos.adicionar(observador)
+
+    def remover_gancho(self, observador):
+        self.ganchos.remover(observador)
+        self.gerenciamento.ganchos.remover(observador)
+
+    # --- Operações em paralelo ---
+
+    def _obter_executor(self):
+        with self._lock_executor:
+            if self._executor is None:
+                # Uma thread por canal do pool: mais threads só ficariam esperando por um canal livre
+                self._executor = ThreadPoolExecutor(max_workers=self.trabalhadores, thread_name_prefix="broker")
+            return self._executor
+
+    def executar_em_paralelo(self, operacao, itens):
+        """
+        Aplica 'operacao' (ex.: self.criar_usuario, self.remover_usuario, self.contar_mensagens_fila)
+        a cada item em um pool de 'trabalhadores' threads, cada uma com seu próprio canal.
+        Uma falha em um item (inclusive um canal fechado pelo broker) não afeta os demais.
+        Retorna {item: resultado} na ordem dos itens; exceções viram mensagens de erro.
+        """
+        executor = self._obter_executor()
+        futuros = {item: executor.submit(operacao, item) for item in dict.fromkeys(itens)}
+        resultados = {}
+        for item, futuro in futuros.items():
+            try:
+                resultados[item] = futuro.result()
+            except Exception as e:
+                resultados[item] = f"Erro ao processar '{item}': {e}"
+        return resultados
+
+    def criar_usuarios_em_paralelo(self, nomes):
+        return self.executar_em_paralelo(self.criar_usuario, nomes)
+
+    def remover_usuarios_em_paralelo(self, nomes):
+        return self.executar_em_paralelo(self.remover_usuario, nomes)
+
+    def contar_mensagens_filas(self, filas):
+        return self.executar_em_paralelo(self.contar_mensagens_fila, filas)
+
+    # --- Métricas ---
+
+    def iniciar_amostragem_metricas(self, registro, intervalo_s=15):
+        """
+        Inicia uma thread que, a cada 'intervalo_s' segundos, lê profundidade, consumidores e taxas
+        de todas as filas, taxas globais e número de conexões pela API de gerenciamento e
+        atualiza os gauges em 'registro' (metricas.RegistroMetricas).
+        """
+        if self.metricas is not None:
+            return
+        self.metricas = MetricasBroker(registro)
+        self._parar_amostragem.clear()
+        threading.Thread(target=self._laco_amostragem, args=(intervalo_s,), name="amostragem-broker", daemon=True).start()
+        print(f"[BrokerManager] Amostragem de métricas iniciada (a cada {intervalo_s}s).")
+
+    def _laco_amostragem(self, intervalo_s):
+        while not self._parar_amostragem.is_set():
             try:
-                self.channel.close()
-                print("[BrokerManager] Canal fechado.")
+                self._amostrar_metricas()
+                self.metricas.amostragens.inc(resultado="ok")
             except Exception as e:
-                print(f"[BrokerManager] Erro ao fechar canal: {e}")
-        if self.connection and self.connection.is_open:
+                self.metricas.amostragens.inc(resultado="erro")
+                print(f"[BrokerManager] Erro ao amostrar métricas: {e}")
+            self._parar_amostragem.wait(intervalo_s)
+
+    def _amostrar_metricas(self):
+        filas = self.snapshot_filas()
+        if filas is None:
+            # Sem resposta da API: conta a amostragem como erro e mantém os últimos valores
+            raise RuntimeError("snapshot das filas indisponível")
+        self.metricas.mensagens_fila.substituir([(f["mensagens"], {"fila": f["fila"]}) for f in filas])
+        self.metricas.consumidores_fila.substituir([(f["consumidores"], {"fila": f["fila"]}) for f in filas])
+        self.metricas.taxa_entrada_fila.substituir([(f["taxa_entrada"], {"fila": f["fila"]}) for f in filas])
+        self.metricas.taxa_saida_fila.substituir([(f["taxa_saida"], {"fila": f["fila"]}) for f in filas])
+
+        visao_geral = self.gerenciamento.get_json("overview", params={
+            "columns": "object_totals.connections,message_stats.publish_details.rate,message_stats.deliver_get_details.rate"
+        })
+        estatisticas = visao_geral.get("message_stats") or {}
+        self.metricas.taxa_publicacao.set((estatisticas.get("publish_details") or {}).get("rate", 0.0))
+        self.metricas.taxa_entrega.set((estatisticas.get("deliver_get_details") or {}).get("rate", 0.0))
+        self.metricas.conexoes.set((visao_geral.get("object_totals") or {}).get("connections", 0))
+
+    def close(self):
+        """Fecha a conexão do RabbitMQ."""
+        if hasattr(self, '_parar_amostragem'):
+            self._parar_amostragem.set()
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if hasattr(self, '_pool'):
             try:
-                self.connection.close()
-                print("[BrokerManager] Conexão RabbitMQ fechada.")
+                self._pool.fechar()
+                print("[BrokerManager] Conexões RabbitMQ fechadas.")
             except Exception as e:
-                print(f"[BrokerManager] Erro ao fechar conexão: {e}")
+                print(f"[BrokerManager] Erro ao fechar conexões: {e}")
 
     def __del__(self):
         self.close()
\ No newline at end of file
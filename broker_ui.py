@@ -1,6 +1,6 @@
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
-from broker_manager import BrokerManager 
+from broker_manager import BrokerManager, ConflitoFilas
 
 class BrokerInterface:
     def __init__(self, root):
@@ -36,6 +36,7 @@ class BrokerInterface:
         self.fila_contar_entry = tk.Entry(root, width=30)
         self.fila_contar_entry.grid(row=2, column=1, padx=5, pady=5)
         tk.Button(root, text="Contar Mensagens", command=self.contar_mensagens, bg="#FFC107").grid(row=2, column=2, padx=5, pady=5)
+        tk.Button(root, text="Filas Mais Atrasadas", command=self.mostrar_snapshot_filas, bg="#FFC107").grid(row=2, column=3, padx=5, pady=5)
 
         self.saida = scrolledtext.ScrolledText(root, width=80, height=20, wrap=tk.WORD) # wrap=tk.WORD para quebrar linhas
         self.saida.grid(row=3, column=0, columnspan=5, pady=10, padx=10, sticky="nsew")
@@ -55,7 +56,14 @@ class BrokerInterface:
         if not nome:
             messagebox.showerror("Erro", "Informe o nome do usuário.")
             return
-        resultado = self.broker.criar_usuario(nome)
+        try:
+            resultado = self.broker.criar_usuario(nome)
+        except ConflitoFilas as e:
+            # Filas existentes com outros argumentos: só apaga com confirmação explícita
+            resultado = f"Usuário '{nome}' não criado: {e}"
+            if messagebox.askyesno("Conflito de filas", f"A fila '{e.fila}' já existe com outros argumentos.\n"
+                                   "Apagar e recriar? As mensagens pendentes serão PERDIDAS."):
+                resultado = self.broker.criar_usuario(nome, recriar_em_conflito=True)
         self.saida.insert(tk.END, resultado + "\n")
         self.saida.see(tk.END) 
 
@@ -127,6 +135,31 @@ class BrokerInterface:
             self.saida.insert(tk.END, f"Fila '{fila}' tem {count} mensagens.\n")
         self.saida.see(tk.END)
 
+    def mostrar_snapshot_filas(self, limite=20):
+        self.saida.delete(1.0, tk.END)
+        snapshot = self.broker.snapshot_filas()
+        if snapshot is None:
+            self.saida.insert(tk.END, "Erro ao consultar a API de gerenciamento.\n")
+            return
+        if not snapshot:
+            self.saida.insert(tk.END, "Nenhuma fila encontrada.\n")
+            return
+
+        def imprimir(titulo, itens):
+            self.saida.insert(tk.END, f"--- {titulo} ---\n")
+            self.saida.insert(tk.END, f"{'Fila':<30} {'Msgs':>8} {'Cons.':>5} {'Entrada/s':>10} {'Saída/s':>9} {'Cresc./s':>9}\n")
+            for item in itens:
+                self.saida.insert(
+                    tk.END,
+                    f"{item['fila']:<30} {item['mensagens']:>8} {item['consumidores']:>5} "
+                    f"{item['taxa_entrada']:>10.1f} {item['taxa_saida']:>9.1f} {item['crescimento']:>9.1f}\n"
+                )
+            self.saida.insert(tk.END, "\n")
+
+        imprimir(f"Top {limite} por backlog", snapshot[:limite])
+        imprimir(f"Top {limite} por crescimento", sorted(snapshot, key=lambda item: item["crescimento"], reverse=True)[:limite])
+        self.saida.see(1.0)
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = BrokerInterface(root)
@@ -0,0 +1,63 @@
+import threading
+
+# Códigos AMQP que indicam que o estado conhecido do broker mudou:
+# 404 NOT_FOUND (exchange/fila apagada) e 406 PRECONDITION_FAILED (declarada com outros parâmetros)
+CODIGOS_INVALIDACAO = (404, 406)
+
+
+class CacheDeclaracoes:
+    """
+    Lembra quais exchanges, filas e bindings já foram declarados com sucesso,
+    para que operações repetidas não paguem um round trip síncrono ao broker.
+    O cache é invalidado quando o broker fecha um canal com 404 ou 406.
+    """
+
+    def __init__(self):
+        self._conhecidos = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def chave_exchange(nome):
+        return ("exchange", nome)
+
+    @staticmethod
+    def chave_fila(nome):
+        return ("fila", nome)
+
+    @staticmethod
+    def chave_binding(exchange, fila):
+        return ("binding", exchange, fila)
+
+    def contem(self, chave):
+        # Leitura de set é atômica no CPython; o lock protege apenas as escritas
+        return chave in self._conhecidos
+
+    def adicionar(self, chave):
+        with self._lock:
+            self._conhecidos.add(chave)
+
+    def remover(self, chave):
+        with self._lock:
+            self._conhecidos.discard(chave)
+
+    #Remove um exchange ou fila (com quaisquer argumentos na chave) e todos os bindings que o referenciam
+    def remover_entidade(self, tipo, nome):
+        with self._lock:
+            self._conhecidos = {
+                chave for chave in self._conhecidos
+                if chave[:2] != (tipo, nome) and not (chave[0] == "binding" and nome in chave[1:])
+            }
+
+    def invalidar(self):
+        with self._lock:
+            self._conhecidos.clear()
+
+    #Invalida o cache se o erro indicar que o estado do broker mudou. Retorna True se invalidou
+    def invalidar_por_erro(self, erro):
+        if getattr(erro, 'reply_code', None) in CODIGOS_INVALIDACAO:
+            self.invalidar()
+            return True
+        return False
+
+    def __len__(self):
+        return len(self._conhecidos)
@@ -1,10 +1,16 @@
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
 import threading
+import queue
+import bisect
+from collections import deque
 import os
 import time
 import pika
 from user_client import Usuario
+import envelope
+from historico import HistoricoTopicos
+from conversas import ConversasPrivadas
 
 class App:
     def __init__(self, root):
@@ -16,10 +22,36 @@ class App:
         self.topicos_assinados = set()
         self.topico_selecionado = None
         self.usuario_selecionado = None
-        self.mensagens_privadas = {}
         self.conversa_privada_atual = None
+        # Conversas privadas em SQLite (<nome>_conversas.db), abertas ao entrar
+        self.conversas = None
+        self.linhas_conversa = 200 # Mensagens por página ao rolar a conversa para cima
+        self.inicio_conversa = None # id da mensagem mais antiga exibida (None se não houver anteriores)
+        self._carregando_conversa = False
+        # Histórico dos murais em log segmentado com índice (historico/<topico>/)
+        self.historico = HistoricoTopicos()
+        self.linhas_mural = 500 # Mensagens carregadas ao abrir o mural e a cada página anterior
+        self.inicio_mural = None # Sequência da mensagem mais antiga exibida no mural
+        # Mensagens recebidas e linhas de log chegam por esta fila (de qualquer thread) e são
+        # aplicadas em lotes pela thread do Tk: um insert e um yview por caixa a cada quadro
+        self.fila_ui = queue.Queue()
+        self.intervalo_quadro_ms = 30
+        self.max_itens_por_quadro = 500
+        self._pendentes_ui = {"mural": [], "privadas": [], "log": []}
+        # Máximo de mensagens mantidas em cada caixa (None = sem limite). O excedente sai do topo,
+        # só enquanto a caixa está rolada até o fim; no mural e na conversa privada ele continua
+        # no histórico e volta pela paginação
+        self.limites_rolagem = {"mural": 2000, "privadas": 1000, "log": 1000}
+        # Linhas do widget ocupadas por cada mensagem exibida, em ordem. Uma mensagem pode ter
+        # várias linhas (ex.: logs colados), então cortes e paginação contam mensagens, não linhas
+        self._mensagens_exibidas = {"mural": deque(), "privadas": deque(), "log": deque()}
+        # Estado exibido nos painéis, para que as atualizações periódicas só mexam no que mudou
+        self._linhas_topicos = {} # topico -> (frame, entrada, botao, assinado)
+        self._ordem_topicos = [] # tópicos exibidos, em ordem
+        self._usuarios_exibidos = [] # conteúdo da lista de usuários, em ordem
 
         self.configurar_interface()
+        self.root.after(self.intervalo_quadro_ms, self._drenar_fila_ui)
 
     def configurar_interface(self):
         # === TOPO ===
@@ -54,6 +86,7 @@ class App:
 
         self.caixa_mensagens_privadas = scrolledtext.ScrolledText(privado_frame, height=8, state='disabled', bg="white")
         self.caixa_mensagens_privadas.pack(fill=tk.X, padx=5, pady=5)
+        self.caixa_mensagens_privadas.config(yscrollcommand=self._rolagem_mensagens_privadas)
 
         tk.Label(privado_frame, text="Para:").pack(anchor='w')
         self.entrada_destinatario = tk.Entry(privado_frame)
@@ -78,6 +111,8 @@ class App:
         mural_frame.pack(fill=tk.BOTH, expand=True, pady=5)
         self.botao_topico = tk.Button(mural_frame, text="Nenhum Tópico Selecionado", bg="#ADD8E6", command=self.alternar_topico)
         self.botao_topico.pack(anchor='e', padx=5, pady=2)
+        self.botao_anteriores = tk.Button(mural_frame, text="Carregar Mensagens Anteriores", command=self.carregar_mensagens_anteriores, state='disabled')
+        self.botao_anteriores.pack(anchor='w', padx=5, pady=2)
         self.caixa_mural = scrolledtext.ScrolledText(mural_frame, width=50, height=10, state='disabled')
         self.caixa_mural.pack(fill=tk.BOTH, expand=True)
 
@@ -138,9 +173,18 @@ class App:
             self.usuario = None
             return
 
+        try:
+            self.conversas = ConversasPrivadas(f"{nome}_conversas.db")
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível abrir o histórico de conversas privadas: {e}")
+            self.registrar(f"ERRO: Erro ao abrir o histórico de conversas privadas: {e}")
+            self.usuario = None
+            return
+
         threading.Thread(
             target=self.usuario.receber_mensagens,
             args=(self.mostrar_mensagem,),
+            kwargs={"on_estado": self._on_estado_conexao},
             daemon=True
         ).start()
 
@@ -161,12 +205,45 @@ class App:
             self.caixa_mural.config(state='disabled')
 
         self.root.after(5000, self.atualizacoes_periodicas)
+        self.root.after(1000, self._descarregar_historico)
+
+    def _descarregar_historico(self):
+        
+        # Grava no disco as mensagens de mural ainda no buffer do histórico e confirma as conversas privadas
+        try:
+            self.historico.flush()
+        except Exception as e:
+            self.registrar(f"ERRO: Erro ao gravar o histórico dos tópicos: {e}")
+        try:
+            self.conversas.flush()
+        except Exception as e:
+            self.registrar(f"ERRO: Erro ao gravar as conversas privadas: {e}")
+        self.root.after(1000, self._descarregar_historico)
+
+    def _on_estado_conexao(self, estado, detalhes):
+        
+        # Chamado pela thread de consumo; registrar() já repassa para a thread do Tk
+        if estado == "conectado":
+            self.registrar("INFO: Conectado ao RabbitMQ. Recebendo mensagens.")
+        elif estado == "reconectando":
+            self.registrar(f"AVISO: Conexão com o RabbitMQ perdida. Reconectando ({detalhes})...")
+        elif estado == "desistiu":
+            self.registrar(f"ERRO: Não foi possível reconectar ao RabbitMQ: {detalhes}")
 
     def _on_closing(self):
         
         if self.usuario:
             self.registrar("INFO: Fechando conexão do usuário ao sair.")
             del self.usuario
+        try:
+            self.historico.flush()
+        except Exception as e:
+            print(f"Erro ao gravar o histórico dos tópicos ao sair: {e}")
+        if self.conversas:
+            try:
+                self.conversas.fechar()
+            except Exception as e:
+                print(f"Erro ao gravar as conversas privadas ao sair: {e}")
         self.root.destroy()
 
     def carregar_topicos_assinados(self):
@@ -242,34 +319,57 @@ class App:
         if not self.usuario:
             return
 
-        for widget in self.container_topicos.winfo_children():
-            widget.destroy()
-
         try:
-            topicos = self.usuario.listar_topicos()
+            topicos = set(self.usuario.listar_topicos())
         except Exception as e:
             self.registrar(f"ERRO: Erro ao listar tópicos: {e}")
             return
 
-        for topico in topicos:
-            frame = tk.Frame(self.container_topicos)
+        # Compara com o que já está na tela: só cria, remove ou reestiliza as linhas que mudaram
+        exibidos = self._linhas_topicos.keys()
+        for topico in exibidos - topicos:
+            self._linhas_topicos.pop(topico)[0].destroy()
+            del self._ordem_topicos[bisect.bisect_left(self._ordem_topicos, topico)]
+
+        for topico in sorted(topicos - exibidos):
+            posicao = bisect.bisect_left(self._ordem_topicos, topico)
+            seguinte = self._ordem_topicos[posicao] if posicao < len(self._ordem_topicos) else None
+            self._ordem_topicos.insert(posicao, topico)
+            self._criar_linha_topico(topico, seguinte)
+
+        for topico, linha in self._linhas_topicos.items():
+            if linha[3] != (topico in self.topicos_assinados):
+                self._estilizar_linha_topico(topico)
+
+    def _criar_linha_topico(self, topico, antes_de=None):
+        
+        frame = tk.Frame(self.container_topicos)
+        if antes_de is None:
             frame.pack(fill=tk.X, pady=2)
+        else:
+            frame.pack(fill=tk.X, pady=2, before=self._linhas_topicos[antes_de][0])
 
-            entrada = tk.Entry(frame, width=25)
-            entrada.insert(0, topico)
-            entrada.config(state='readonly')
+        entrada = tk.Entry(frame, width=25)
+        entrada.insert(0, topico)
+        entrada.config(state='readonly')
+        entrada.pack(side=tk.LEFT)
+        botao = tk.Button(frame, bg="#4da6ff")
+        botao.pack(side=tk.LEFT, padx=5)
 
-            if topico in self.topicos_assinados:
-                entrada.config(bg="#b2f0c2") # Verde claro
-                texto_botao = "Visualizar"
-                comando = lambda t=topico: self.visualizar_mural(t)
-            else:
-                entrada.config(bg="white") # Cor padrão, corrigido do SystemButtonFace
-                texto_botao = "Assinar"
-                comando = lambda t=topico: self.assinar_topico(t)
+        self._linhas_topicos[topico] = (frame, entrada, botao, None)
+        self._estilizar_linha_topico(topico)
 
-            entrada.pack(side=tk.LEFT)
-            tk.Button(frame, text=texto_botao, bg="#4da6ff", command=comando).pack(side=tk.LEFT, padx=5)
+    def _estilizar_linha_topico(self, topico):
+        
+        frame, entrada, botao, _ = self._linhas_topicos[topico]
+        assinado = topico in self.topicos_assinados
+        if assinado:
+            entrada.config(bg="#b2f0c2") # Verde claro
+            botao.config(text="Visualizar", command=lambda t=topico: self.visualizar_mural(t))
+        else:
+            entrada.config(bg="white") # Cor padrão, corrigido do SystemButtonFace
+            botao.config(text="Assinar", command=lambda t=topico: self.assinar_topico(t))
+        self._linhas_topicos[topico] = (frame, entrada, botao, assinado)
 
     def assinar_topico(self, topico):
         
@@ -281,7 +381,10 @@ class App:
             if sucesso:
                 self.topicos_assinados.add(topico)
                 self.salvar_topicos_assinados()
-                self.listar_topicos()
+                if topico in self._linhas_topicos:
+                    self._estilizar_linha_topico(topico)
+                else:
+                    self.listar_topicos()
                 self.visualizar_mural(topico)
             else:
                 self.registrar(f"AVISO: Falha ao assinar o tópico {topico}.")
@@ -303,18 +406,53 @@ class App:
         self.botao_publicar_mural.config(state='normal')
 
         self.caixa_mural.delete(1.0, tk.END)
+        self._mensagens_exibidas["mural"].clear()
+        # As linhas ainda não aplicadas são do mural anterior; as deste já estão no histórico
+        self._pendentes_ui["mural"] = []
 
+        # Só as últimas mensagens, lidas pelo índice: o custo não depende do tamanho do histórico
         try:
-            with open(f"{topico}.txt", "r", encoding="utf-8") as f:
-                for msg in f.readlines():
-                    self.caixa_mural.insert(tk.END, msg)
-        except FileNotFoundError:
+            self.inicio_mural, linhas = self.historico.ultimas(topico, self.linhas_mural)
+        except Exception as e:
+            self.registrar(f"ERRO: Erro ao ler o histórico do tópico '{topico}': {e}")
+            self.inicio_mural, linhas = None, []
+        if linhas:
+            self.caixa_mural.insert(tk.END, "\n".join(linhas) + "\n")
+            self._mensagens_exibidas["mural"].extend(self._contar_linhas(linhas))
+        else:
             self.caixa_mural.insert(tk.END, f"[{topico}] Nenhuma mensagem anterior neste mural.\n")
+        self._atualizar_botao_anteriores()
 
         self.caixa_mural.config(state='disabled')
         self.caixa_mural.yview(tk.END)
         self.entrada_mural.focus_set()
 
+    def _atualizar_botao_anteriores(self):
+        
+        ha_anteriores = (
+            self.topico_selecionado is not None and self.inicio_mural is not None
+            and self.inicio_mural > self.historico.obter(self.topico_selecionado).primeira()
+        )
+        self.botao_anteriores.config(state='normal' if ha_anteriores else 'disabled')
+
+    def carregar_mensagens_anteriores(self):
+        
+        topico = self.topico_selecionado
+        if not topico or self.inicio_mural is None:
+            return
+        try:
+            self.inicio_mural, linhas = self.historico.anteriores(topico, self.inicio_mural, self.linhas_mural)
+        except Exception as e:
+            self.registrar(f"ERRO: Erro ao ler o histórico do tópico '{topico}': {e}")
+            return
+        if linhas:
+            self.caixa_mural.config(state='normal')
+            self.caixa_mural.insert("1.0", "\n".join(linhas) + "\n")
+            self._mensagens_exibidas["mural"].extendleft(reversed(self._contar_linhas(linhas)))
+            self.caixa_mural.config(state='disabled')
+            self.caixa_mural.yview("1.0")
+        self._atualizar_botao_anteriores()
+
     def alternar_topico(self):
         
         if self.topico_selecionado:
@@ -356,24 +494,25 @@ class App:
         if not self.usuario:
             return
 
-        selecao_indices = self.lista_usuarios.curselection()
-        selecao_nomes = [self.lista_usuarios.get(i) for i in selecao_indices]
-
-        self.lista_usuarios.delete(0, tk.END)
         try:
-            usuarios = self.usuario.listar_usuarios()
-            for user in sorted(usuarios):
-                if user != self.usuario.nome:
-                    self.lista_usuarios.insert(tk.END, user)
+            usuarios = set(self.usuario.listar_usuarios())
         except Exception as e:
             self.registrar(f"ERRO: Erro ao listar usuários: {e}")
-
-        for nome in selecao_nomes:
-            try:
-                idx = self.lista_usuarios.get(0, tk.END).index(nome)
-                self.lista_usuarios.selection_set(idx)
-            except ValueError:
-                pass
+            return
+        usuarios.discard(self.usuario.nome)
+
+        # A Listbox não é limpa: só os nomes que saíram ou entraram são removidos ou inseridos
+        # na posição ordenada, e a seleção dos que continuam é mantida pelo próprio widget
+        exibidos = self._usuarios_exibidos
+        removidos = set(exibidos) - usuarios
+        for nome in sorted(removidos, reverse=True):
+            posicao = bisect.bisect_left(exibidos, nome)
+            del exibidos[posicao]
+            self.lista_usuarios.delete(posicao)
+        for nome in sorted(usuarios - set(exibidos)):
+            posicao = bisect.bisect_left(exibidos, nome)
+            exibidos.insert(posicao, nome)
+            self.lista_usuarios.insert(posicao, nome)
 
     def selecionar_usuario(self, event):
         
@@ -389,16 +528,53 @@ class App:
 
     def _carregar_mensagens_privadas(self, usuario_para_carregar):
         
+        # Só as mensagens recentes (buffer em memória); as anteriores vêm do banco ao rolar para cima
+        try:
+            self.inicio_conversa, mensagens = self.conversas.recentes(usuario_para_carregar)
+        except Exception as e:
+            self.registrar(f"ERRO: Erro ao ler a conversa com '{usuario_para_carregar}': {e}")
+            self.inicio_conversa, mensagens = None, []
+
+        self._pendentes_ui["privadas"] = []
         self.caixa_mensagens_privadas.config(state='normal')
         self.caixa_mensagens_privadas.delete(1.0, tk.END)
-
-        mensagens = self.mensagens_privadas.get(usuario_para_carregar, [])
-        for msg in mensagens:
-            self.caixa_mensagens_privadas.insert(tk.END, msg + '\n')
-
+        self._mensagens_exibidas["privadas"].clear()
+        if mensagens:
+            self.caixa_mensagens_privadas.insert(tk.END, "\n".join(mensagens) + "\n")
+            self._mensagens_exibidas["privadas"].extend(self._contar_linhas(mensagens))
         self.caixa_mensagens_privadas.config(state='disabled')
         self.caixa_mensagens_privadas.yview(tk.END)
 
+    def _rolagem_mensagens_privadas(self, primeiro, ultimo):
+        
+        # Repassa a posição à barra de rolagem; ao chegar no topo, agenda a leitura da página anterior
+        self.caixa_mensagens_privadas.vbar.set(primeiro, ultimo)
+        if float(primeiro) <= 0.0 and self.inicio_conversa is not None and not self._carregando_conversa:
+            self._carregando_conversa = True
+            self.root.after_idle(self._carregar_conversa_anterior)
+
+    def _carregar_conversa_anterior(self):
+        
+        contato = self.conversa_privada_atual
+        try:
+            # A caixa pode ter sido recarregada ou rolada depois do agendamento
+            if not contato or self.inicio_conversa is None or self.caixa_mensagens_privadas.yview()[0] > 0.0:
+                return
+            inicio, linhas = self.conversas.anteriores(contato, self.inicio_conversa, self.linhas_conversa)
+            self.inicio_conversa = inicio
+            if linhas:
+                contagens = self._contar_linhas(linhas)
+                self.caixa_mensagens_privadas.config(state='normal')
+                self.caixa_mensagens_privadas.insert("1.0", "\n".join(linhas) + "\n")
+                self._mensagens_exibidas["privadas"].extendleft(reversed(contagens))
+                self.caixa_mensagens_privadas.config(state='disabled')
+                # Mantém no topo a linha que o usuário estava lendo
+                self.caixa_mensagens_privadas.yview(f"{sum(contagens) + 1}.0")
+        except Exception as e:
+            self.registrar(f"ERRO: Erro ao ler mensagens anteriores da conversa com '{contato}': {e}")
+        finally:
+            self._carregando_conversa = False
+
     def enviar_mensagem_privada(self):
         
         if not self.usuario:
@@ -420,9 +596,7 @@ class App:
             sucesso = self.usuario.enviar_para_usuario(destinatario, mensagem)
             if sucesso:
                 # Adiciona a mensagem formatada (com timestamp) ao histórico local
-                if destinatario not in self.mensagens_privadas:
-                    self.mensagens_privadas[destinatario] = []
-                self.mensagens_privadas[destinatario].append(mensagem_com_timestamp)
+                self.conversas.adicionar(destinatario, mensagem_com_timestamp)
 
                 # Se estiver conversando com o destinatário, atualiza a caixa de chat privada
                 if self.conversa_privada_atual == destinatario:
@@ -439,80 +613,150 @@ class App:
 
     def mostrar_mensagem(self, msg):
         
-        self.root.after(0, self._processar_e_exibir_mensagem_na_ui, msg)
+        # Chamado pela thread de consumo: só enfileira, o Tk processa no próximo quadro
+        self.fila_ui.put(("mensagem", msg))
 
-    def _processar_e_exibir_mensagem_na_ui(self, msg):
+    def _drenar_fila_ui(self):
+        
+        try:
+            self._processar_fila_ui()
+        finally:
+            self.root.after(self.intervalo_quadro_ms, self._drenar_fila_ui)
+
+    def _processar_fila_ui(self):
         
-        if msg.startswith("PRIVADO:"):
+        # No máximo max_itens_por_quadro itens por quadro; o resto fica para os próximos
+        for _ in range(self.max_itens_por_quadro):
             try:
-                _, remetente, mensagem_conteudo = msg.split(":", 2)
-                timestamp = time.strftime("[%H:%M]") # Adiciona timestamp para mensagens recebidas
-                mensagem_formatada = f"{timestamp} [{remetente}] {mensagem_conteudo}"
-
-                # Armazena a mensagem no histórico local
-                if remetente not in self.mensagens_privadas:
-                    self.mensagens_privadas[remetente] = []
-                self.mensagens_privadas[remetente].append(mensagem_formatada)
-
-                # Se o remetente for o usuário com quem estamos conversando, exibe na UI
-                if self.conversa_privada_atual == remetente:
-                    self._adicionar_mensagem_privada_ui(mensagem_formatada)
-
-                self.registrar(f"INFO: Mensagem privada de '{remetente}': {mensagem_conteudo}")
-            except ValueError:
-                self.registrar(f"ERRO: Formato de mensagem privada inválido: {msg}")
-        elif msg.startswith("[") and "]" in msg:
+                tipo, conteudo = self.fila_ui.get_nowait()
+            except queue.Empty:
+                break
+            if tipo == "log":
+                self._pendentes_ui["log"].append(conteudo)
+                continue
             try:
-                primeiro_colchete = msg.index("[")
-                segundo_colchete = msg.index("]")
-                nome_topico = msg[primeiro_colchete + 1 : segundo_colchete]
-
-                if nome_topico in self.topicos_assinados:
-                    try:
-                        with open(f"{nome_topico}.txt", "a", encoding="utf-8") as f:
-                            f.write(msg + '\n')
-                    except Exception as e:
-                        self.registrar(f"ERRO: Erro ao salvar mensagem no arquivo do tópico '{nome_topico}': {e}")
-                else:
-                    self.registrar(f"INFO: Mensagem recebida para tópico não assinado: '{nome_topico}' - {msg}")
+                self._processar_e_exibir_mensagem_na_ui(conteudo)
+            except Exception as e:
+                self.registrar(f"ERRO: Erro ao exibir mensagem recebida: {e}")
+        self._aplicar_pendentes_ui()
 
-                if self.topico_selecionado == nome_topico:
-                    self._adicionar_mensagem_mural(nome_topico, msg + '\n')
-                    self.registrar(f"INFO: Mensagem recebida em '{nome_topico}': {msg}")
-                else:
-                    pass
+    def _aplicar_pendentes_ui(self):
+        
+        for chave, caixa in (("mural", self.caixa_mural),
+                             ("privadas", self.caixa_mensagens_privadas),
+                             ("log", self.caixa_log)):
+            linhas = self._pendentes_ui[chave]
+            if not linhas:
+                continue
+            self._pendentes_ui[chave] = []
+            # Se o usuário rolou para cima (ex.: lendo mensagens anteriores), não corta nem rola:
+            # o corte fica para quando ele voltar ao fim da caixa
+            no_fim = caixa.yview()[1] >= 1.0
+            caixa.config(state='normal')
+            caixa.insert(tk.END, "".join(linhas))
+            # Cada item pendente é uma mensagem completa, terminada em '\n'
+            self._mensagens_exibidas[chave].extend(linha.count("\n") for linha in linhas)
+            removidas = self._aparar(chave, caixa) if no_fim else 0
+            caixa.config(state='disabled')
+            if no_fim:
+                caixa.yview(tk.END)
+            if removidas:
+                self._reposicionar_janela(chave)
+
+    @staticmethod
+    def _contar_linhas(mensagens):
+        
+        # Linhas do widget ocupadas por cada mensagem (sem o '\n' final, que é adicionado ao inserir)
+        return [mensagem.count("\n") + 1 for mensagem in mensagens]
 
-            except (ValueError, IndexError):
-                 self.registrar(f"ERRO: Formato de mensagem de tópico inválido: {msg}")
+    def _linhas_exibidas(self, caixa):
+        
+        # O texto sempre termina em '\n', então a última linha do widget é vazia
+        return int(caixa.index('end-1c').split('.')[0]) - 1
+
+    def _aparar(self, chave, caixa):
+        
+        # Com 10% de folga o corte acontece de tempos em tempos e não a cada quadro
+        limite = self.limites_rolagem.get(chave)
+        exibidas = self._mensagens_exibidas[chave]
+        if not limite:
+            return 0
+        excedente = len(exibidas) - limite
+        if excedente <= limite // 10:
+            return 0
+        # Linhas no topo que não são mensagens (ex.: o aviso de mural vazio) saem junto
+        avulsas = self._linhas_exibidas(caixa) - sum(exibidas)
+        linhas = avulsas + sum(exibidas.popleft() for _ in range(excedente))
+        caixa.delete("1.0", f"{linhas + 1}.0")
+        return excedente
+
+    def _reposicionar_janela(self, chave):
+        
+        # A caixa mostra o fim do histórico; o início da janela passa a ser a primeira mensagem que sobrou
+        try:
+            exibidas = len(self._mensagens_exibidas[chave])
+            if chave == "mural" and self.topico_selecionado:
+                historico = self.historico.obter(self.topico_selecionado)
+                self.inicio_mural = max(historico.primeira(), historico.total() - exibidas)
+                self._atualizar_botao_anteriores()
+            elif chave == "privadas" and self.conversa_privada_atual:
+                self.inicio_conversa = self.conversas.inicio_das_ultimas(self.conversa_privada_atual, exibidas)
+        except Exception as e:
+            self.registrar(f"ERRO: Erro ao reposicionar a janela do histórico: {e}")
+
+    def _processar_e_exibir_mensagem_na_ui(self, msg):
+        
+        # msg é um envelope.Envelope: os campos já vêm separados, sem split/index no texto
+        if msg.tipo == envelope.TIPO_PRIVADO:
+            remetente = msg.remetente
+            mensagem_conteudo = msg.texto
+            timestamp = time.strftime("[%H:%M]") # Adiciona timestamp para mensagens recebidas
+            mensagem_formatada = f"{timestamp} [{remetente}] {mensagem_conteudo}"
+
+            # Armazena a mensagem no histórico local
+            try:
+                self.conversas.adicionar(remetente, mensagem_formatada)
+            except Exception as e:
+                self.registrar(f"ERRO: Erro ao salvar mensagem privada de '{remetente}': {e}")
+
+            # Se o remetente for o usuário com quem estamos conversando, exibe na UI
+            if self.conversa_privada_atual == remetente:
+                self._adicionar_mensagem_privada_ui(mensagem_formatada)
+
+            self.registrar(f"INFO: Mensagem privada de '{remetente}': {mensagem_conteudo}")
+        elif msg.tipo == envelope.TIPO_TOPICO:
+            nome_topico = msg.topico
+            linha = msg.formatar()
+
+            if nome_topico in self.topicos_assinados:
+                try:
+                    # Vai para o buffer do histórico; o disco é atualizado em lotes
+                    self.historico.anexar(nome_topico, linha)
+                except Exception as e:
+                    self.registrar(f"ERRO: Erro ao salvar mensagem no arquivo do tópico '{nome_topico}': {e}")
+            else:
+                self.registrar(f"INFO: Mensagem recebida para tópico não assinado: '{nome_topico}' - {linha}")
+
+            if self.topico_selecionado == nome_topico:
+                self._adicionar_mensagem_mural(nome_topico, linha + '\n')
+                self.registrar(f"INFO: Mensagem recebida em '{nome_topico}': {linha}")
         else:
-            self.registrar(f"INFO: MENSAGEM GERAL RECEBIDA: {msg}")
+            self.registrar(f"INFO: MENSAGEM GERAL RECEBIDA: {msg.texto}")
 
     def _adicionar_mensagem_mural(self, topico, mensagem):
         
         if self.topico_selecionado == topico:
-            self.caixa_mural.config(state='normal')
-            self.caixa_mural.insert(tk.END, mensagem)
-            self.caixa_mural.config(state='disabled')
-            self.caixa_mural.yview(tk.END)
+            self._pendentes_ui["mural"].append(mensagem)
 
     def _adicionar_mensagem_privada_ui(self, mensagem):
         
-        self.caixa_mensagens_privadas.config(state='normal')
-        self.caixa_mensagens_privadas.insert(tk.END, mensagem + '\n')
-        self.caixa_mensagens_privadas.config(state='disabled')
-        self.caixa_mensagens_privadas.yview(tk.END)
+        self._pendentes_ui["privadas"].append(mensagem + '\n')
 
     def registrar(self, msg):
         
+        # Pode ser chamado de qualquer thread; a linha entra no lote do próximo quadro
         timestamp = time.strftime("[%Y-%m-%d %H:%M:%S]")
-        self.root.after(0, self._adicionar_log, f"{timestamp} {msg}\n")
-
-    def _adicionar_log(self, text):
-        
-        self.caixa_log.config(state='normal')
-        self.caixa_log.insert(tk.END, text)
-        self.caixa_log.config(state='disabled')
-        self.caixa_log.yview(tk.END)
+        self.fila_ui.put(("log", f"{timestamp} {msg}\n"))
 
 
 if __name__ == "__main__":
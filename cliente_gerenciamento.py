@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+from ganchos import Ganchos
+
+
+class ClienteGerenciamento:
+    """
+    Cliente HTTP da API de gerenciamento do RabbitMQ (porta 15672).
+    Usa uma requests.Session com pool de conexões keep-alive, timeout em todas as chamadas e
+    um número limitado de novas tentativas (com backoff) para erros de conexão e 502/503/504.
+
+    URL e credenciais vêm dos parâmetros ou das variáveis de ambiente RABBITMQ_API_URL,
+    RABBITMQ_USER e RABBITMQ_PASSWORD (padrão: http://localhost:15672/api, guest/guest).
+    Use ClienteGerenciamento.compartilhado() para reaproveitar as conexões em todo o processo.
+    """
+
+    _instancias = {}
+    _lock_instancias = threading.Lock()
+
+    def __init__(self, api_url=None, usuario=None, senha=None, timeout=10, tentativas=3,
+                 backoff=0.3, tamanho_pool=10):
+        self.api_url = (api_url or os.environ.get("RABBITMQ_API_URL", "http://localhost:15672/api")).rstrip('/')
+        self.auth = HTTPBasicAuth(
+            usuario or os.environ.get("RABBITMQ_USER", "guest"),
+            senha or os.environ.get("RABBITMQ_PASSWORD", "guest")
+        )
+        self.timeout = timeout
+        # Observadores das chamadas HTTP (ver ganchos)
+        self.ganchos = Ganchos("gerenciamento")
+
+        retry = Retry(
+            total=tentativas,
+            connect=tentativas,
+            read=tentativas,
+            status=tentativas,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(("GET", "HEAD", "PUT", "DELETE")), # Métodos idempotentes
+            raise_on_status=False,
+        )
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=tamanho_pool, max_retries=retry)
+        self.sessao = requests.Session()
+        self.sessao.auth = self.auth
+        self.sessao.headers.update({"content-type": "application/json"})
+        self.sessao.mount("http://", adaptador)
+        self.sessao.mount("https://", adaptador)
+
+    @classmethod
+    def compartilhado(cls, api_url=None, **kwargs):
+        chave = api_url or os.environ.get("RABBITMQ_API_URL", "http://localhost:15672/api")
+        with cls._lock_instancias:
+            if chave not in cls._instancias:
+                cls._instancias[chave] = cls(chave, **kwargs)
+            return cls._instancias[chave]
+
+    def requisitar(self, metodo, caminho, **kwargs):
+        """Faz a requisição em {api_url}/{caminho} e lança HTTPError para respostas 4xx/5xx."""
+        kwargs.setdefault("timeout", self.timeout)
+        if not self.ganchos:
+            resposta = self.sessao.request(metodo, f"{self.api_url}/{caminho.lstrip('/')}", **kwargs)
+            resposta.raise_for_status()
+            return resposta
+
+        inicio = time.perf_counter()
+        resposta = None
+        try:
+            resposta = self.sessao.request(metodo, f"{self.api_url}/{caminho.lstrip('/')}", **kwargs)
+            resposta.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            status = resposta.status_code if resposta is not None else None
+            self.ganchos.emitir("http", inicio, 0, e, metodo=metodo, caminho=caminho, status=status)
+            raise
+        self.ganchos.emitir("http", inicio, len(resposta.content), metodo=metodo, caminho=caminho,
+                            status=resposta.status_code)
+        return resposta
+
+    def get_json(self, caminho, params=None):
+        return self.requisitar("GET", caminho, params=params).json()
+
+    def fechar(self):
+        self.sessao.close()
@@ -0,0 +1,89 @@
+import bz2
+import lzma
+import threading
+import time
+import zlib
+
+# Algoritmos suportados, identificados pelo valor de content_encoding da mensagem AMQP.
+# A descompressão usa objetos incrementais para poder limitar o tamanho da saída.
+ALGORITMOS = {
+    "deflate": (lambda dados, nivel: zlib.compress(dados, nivel), zlib.decompressobj),
+    "bzip2": (lambda dados, nivel: bz2.compress(dados, max(1, nivel)), bz2.BZ2Decompressor),
+    "xz": (lambda dados, nivel: lzma.compress(dados, preset=nivel), lzma.LZMADecompressor),
+}
+
+# Tamanho máximo padrão de um corpo descomprimido (proteção contra "bombas" de descompressão)
+MAX_DESCOMPRIMIDO_PADRAO = 16 * 1024 * 1024
+
+
+class Compressor:
+    """
+    Compressão transparente de corpos de mensagem.
+    Corpos com pelo menos 'limite_bytes' bytes são comprimidos com 'algoritmo' e marcados via
+    content_encoding; abaixo do limite (ou se a compressão não reduzir o tamanho) vão sem alteração.
+    Com limite_bytes=None a compressão fica desligada, mas a descompressão continua funcionando.
+    Um corpo que descomprimido passe de 'max_descomprimido' bytes é rejeitado com ValueError
+    sem chegar a ser expandido por inteiro em memória.
+    O custo (bytes economizados e tempo gasto) fica disponível em estatisticas().
+    """
+
+    def __init__(self, algoritmo="deflate", nivel=6, limite_bytes=1024, max_descomprimido=MAX_DESCOMPRIMIDO_PADRAO):
+        if algoritmo not in ALGORITMOS:
+            raise ValueError(f"Algoritmo de compressão desconhecido: '{algoritmo}'. Use um de {sorted(ALGORITMOS)}.")
+        self.algoritmo = algoritmo
+        self.nivel = nivel
+        self.limite_bytes = limite_bytes
+        self.max_descomprimido = max_descomprimido
+        self._lock = threading.Lock()
+        self._estatisticas = {
+            "comprimidas": 0,
+            "descomprimidas": 0,
+            "bytes_originais": 0,
+            "bytes_comprimidos": 0,
+            "tempo_compressao_s": 0.0,
+            "tempo_descompressao_s": 0.0,
+        }
+
+    def _somar(self, **valores):
+        with self._lock:
+            for chave, valor in valores.items():
+                self._estatisticas[chave] += valor
+
+    def comprimir(self, corpo):
+        """Retorna (corpo, content_encoding). content_encoding é None se o corpo não foi comprimido."""
+        if self.limite_bytes is None or len(corpo) < self.limite_bytes:
+            return corpo, None
+        compressor, _ = ALGORITMOS[self.algoritmo]
+        inicio = time.perf_counter()
+        comprimido = compressor(corpo, self.nivel)
+        duracao = time.perf_counter() - inicio
+        if len(comprimido) >= len(corpo):
+            # Conteúdo incompressível (ex.: já comprimido): não vale o custo no consumidor
+            return corpo, None
+        self._somar(comprimidas=1, bytes_originais=len(corpo), bytes_comprimidos=len(comprimido),
+                    tempo_compressao_s=duracao)
+        return comprimido, self.algoritmo
+
+    def descomprimir(self, corpo, content_encoding):
+        if not content_encoding or content_encoding not in ALGORITMOS:
+            return corpo
+        _, criar_descompressor = ALGORITMOS[content_encoding]
+        inicio = time.perf_counter()
+        descompressor = criar_descompressor()
+        # Pede no máximo um byte além do limite: se ele vier, o corpo é grande demais
+        original = descompressor.decompress(corpo, self.max_descomprimido + 1)
+        if len(original) > self.max_descomprimido:
+            raise ValueError(f"Corpo descomprimido ({content_encoding}) maior que {self.max_descomprimido} bytes.")
+        if not descompressor.eof:
+            raise ValueError(f"Corpo comprimido ({content_encoding}) incompleto.")
+        self._somar(descomprimidas=1, tempo_descompressao_s=time.perf_counter() - inicio)
+        return original
+
+    def estatisticas(self):
+        with self._lock:
+            estatisticas = dict(self._estatisticas)
+        if estatisticas["bytes_originais"]:
+            estatisticas["taxa_compressao"] = estatisticas["bytes_comprimidos"] / estatisticas["bytes_originais"]
+        else:
+            estatisticas["taxa_compressao"] = 1.0
+        return estatisticas
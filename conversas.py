@@ -0,0 +1,114 @@
+"""
+Histórico das conversas privadas de um usuário em SQLite, com as mensagens recentes em memória.
+
+Para cada contato, só as últimas 'tamanho_recentes' mensagens ficam em um buffer circular
+(deque), e só os 'max_contatos' contatos usados mais recentemente ficam em memória. Páginas mais
+antigas são lidas do banco sob demanda (anteriores), pelo índice (contato, id). Assim a memória
+não cresce com a duração da sessão nem com o número de contatos, e o histórico sobrevive ao
+fechamento do cliente.
+
+As inserções acontecem numa transação aberta que é confirmada em flush() (chamado
+periodicamente pela interface) ou a cada 'max_pendentes' mensagens.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class ConversasPrivadas:
+    def __init__(self, caminho, tamanho_recentes=200, max_contatos=50, max_pendentes=500):
+        self.caminho = caminho
+        self.tamanho_recentes = tamanho_recentes
+        self.max_contatos = max_contatos
+        self.max_pendentes = max_pendentes
+        self._lock = threading.Lock()
+        self._recentes = OrderedDict()  # contato -> deque de (id, linha), em ordem de uso
+        self._pendentes = 0
+
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS mensagens ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " contato TEXT NOT NULL,"
+            " instante REAL NOT NULL,"
+            " linha TEXT NOT NULL)"
+        )
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS mensagens_contato ON mensagens (contato, id)")
+        self._conexao.commit()
+
+    #Buffer circular do contato, carregado do banco na primeira vez (ou depois de sair do cache)
+    def _buffer(self, contato):
+        buffer = self._recentes.get(contato)
+        if buffer is None:
+            linhas = self._conexao.execute(
+                "SELECT id, linha FROM mensagens WHERE contato = ? ORDER BY id DESC LIMIT ?",
+                (contato, self.tamanho_recentes)
+            ).fetchall()
+            buffer = self._recentes[contato] = deque(reversed(linhas), maxlen=self.tamanho_recentes)
+            while len(self._recentes) > self.max_contatos:
+                self._recentes.popitem(last=False)
+        else:
+            self._recentes.move_to_end(contato)
+        return buffer
+
+    def adicionar(self, contato, linha):
+        with self._lock:
+            cursor = self._conexao.execute(
+                "INSERT INTO mensagens (contato, instante, linha) VALUES (?, ?, ?)",
+                (contato, time.time(), linha)
+            )
+            # Só atualiza o buffer se ele já estiver em memória; senão será lido do banco quando preciso
+            if contato in self._recentes:
+                self._recentes[contato].append((cursor.lastrowid, linha))
+            self._pendentes += 1
+            if self._pendentes >= self.max_pendentes:
+                self._confirmar()
+
+    def recentes(self, contato):
+        """Retorna (id da primeira linha ou None, linhas) com as mensagens recentes do contato."""
+        with self._lock:
+            buffer = self._buffer(contato)
+            if not buffer:
+                return None, []
+            return buffer[0][0], [linha for _, linha in buffer]
+
+    def anteriores(self, contato, antes_de, quantidade=200):
+        """Página anterior ao id 'antes_de': retorna (id da primeira linha ou None, linhas)."""
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT id, linha FROM mensagens WHERE contato = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (contato, antes_de, quantidade)
+            ).fetchall()
+        if not linhas:
+            return None, []
+        linhas.reverse()
+        return linhas[0][0], [linha for _, linha in linhas]
+
+    def inicio_das_ultimas(self, contato, quantidade):
+        """id da mais antiga entre as últimas 'quantidade' mensagens do contato (None se não houver)."""
+        if quantidade < 1:
+            return None
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT id FROM mensagens WHERE contato = ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+                (contato, quantidade - 1)
+            ).fetchone()
+        return linha[0] if linha else None
+
+    def _confirmar(self):
+        self._conexao.commit()
+        self._pendentes = 0
+
+    def flush(self):
+        with self._lock:
+            if self._pendentes:
+                self._confirmar()
+
+    def fechar(self):
+        with self._lock:
+            self._confirmar()
+            self._conexao.close()
@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheDeduplicacao:
+    """
+    Conjunto limitado dos ids de mensagem já entregues, para descartar reentregas
+    (reconexões, retentativas do publicador). Os ids saem por ordem de chegada quando
+    a capacidade é atingida ou quando ficam mais velhos que ttl_s segundos.
+    Todas as operações são O(1) amortizado.
+    """
+
+    def __init__(self, capacidade=10000, ttl_s=600):
+        self.capacidade = capacidade
+        self.ttl_s = ttl_s
+        self._vistos = OrderedDict()  # message_id -> instante em que foi visto (monotonic)
+        self._lock = threading.Lock()
+        self.consultas = 0
+        self.acertos = 0
+        self.evicoes_tamanho = 0
+        self.evicoes_ttl = 0
+
+    #Remove do início (mais antigos) os ids cujo TTL expirou
+    def _expirar(self, agora):
+        limite = agora - self.ttl_s
+        while self._vistos:
+            message_id, visto_em = next(iter(self._vistos.items()))
+            if visto_em > limite:
+                break
+            self._vistos.popitem(last=False)
+            self.evicoes_ttl += 1
+
+    def ja_visto(self, message_id):
+        """Registra message_id e retorna True se ele já tinha sido visto (ou seja, é duplicata)."""
+        if not message_id:
+            # Mensagens do formato antigo não têm id e nunca são consideradas duplicatas
+            return False
+        agora = time.monotonic()
+        with self._lock:
+            self.consultas += 1
+            self._expirar(agora)
+            if message_id in self._vistos:
+                self.acertos += 1
+                return True
+            self._vistos[message_id] = agora
+            if len(self._vistos) > self.capacidade:
+                self._vistos.popitem(last=False)
+                self.evicoes_tamanho += 1
+            return False
+
+    #Esquece um id registrado, para que a reentrega de uma mensagem devolvida à fila não seja descartada
+    def esquecer(self, message_id):
+        if message_id:
+            with self._lock:
+                self._vistos.pop(message_id, None)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "tamanho": len(self._vistos),
+                "consultas": self.consultas,
+                "duplicatas": self.acertos,
+                "evicoes_tamanho": self.evicoes_tamanho,
+                "evicoes_ttl": self.evicoes_ttl,
+            }
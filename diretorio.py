@@ -0,0 +1,172 @@
+import threading
+import time
+from cliente_gerenciamento import ClienteGerenciamento
+
+VHOST_PADRAO = "%2F"  # %2F é o vhost padrão "/"
+
+
+class DiretorioBroker:
+    """
+    Camada de cache das listagens da API de gerenciamento do RabbitMQ (filas e exchanges).
+
+    - Pede só as colunas necessárias (parâmetro 'columns') e pagina as respostas,
+      em vez de baixar o JSON completo de /api/queues e /api/exchanges.
+    - Respostas ficam em cache por 'ttl_s' segundos. Entre ttl_s e ttl_s + stale_s o valor
+      antigo é devolvido na hora e uma atualização roda em segundo plano (stale-while-revalidate).
+    - estatisticas() expõe acertos, faltas, valores antigos servidos e o tempo das buscas.
+
+    Use DiretorioBroker.compartilhado(...) para que todos os clientes do processo dividam o cache.
+    As requisições passam pelo ClienteGerenciamento (sessão HTTP keep-alive compartilhada).
+    """
+
+    _instancias = {}
+    _lock_instancias = threading.Lock()
+
+    def __init__(self, cliente=None, ttl_s=5.0, stale_s=30.0, tamanho_pagina=500):
+        self.cliente = cliente or ClienteGerenciamento.compartilhado()
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+        self.tamanho_pagina = tamanho_pagina
+        self._cache = {}  # chave -> (instante da busca, dados)
+        # Geração de cada recurso, incrementada por invalidar(): uma busca iniciada antes da
+        # invalidação não grava o resultado (já desatualizado) de volta no cache
+        self._geracoes = {}
+        self._geracao_global = 0
+        self._atualizando = set()
+        self._lock = threading.Lock()
+        self._estatisticas = {
+            "acertos": 0,
+            "faltas": 0,
+            "antigos_servidos": 0,
+            "buscas": 0,
+            "falhas_atualizacao": 0,
+            "tempo_buscas_s": 0.0,
+            "tempo_ultima_busca_s": 0.0,
+            "tempo_maximo_busca_s": 0.0,
+        }
+
+    @classmethod
+    def compartilhado(cls, cliente=None, **kwargs):
+        cliente = cliente or ClienteGerenciamento.compartilhado()
+        with cls._lock_instancias:
+            if cliente.api_url not in cls._instancias:
+                cls._instancias[cliente.api_url] = cls(cliente, **kwargs)
+            return cls._instancias[cliente.api_url]
+
+    #Faz a requisição HTTP de uma página da listagem
+    def _get(self, caminho, parametros):
+        return self.cliente.get_json(caminho, params=parametros)
+
+    #Busca todas as páginas de um recurso, trazendo apenas as colunas pedidas
+    def _buscar_paginado(self, recurso, colunas, parametros_extras):
+        itens = []
+        pagina = 1
+        while True:
+            parametros = {
+                "columns": ",".join(colunas),
+                "page": pagina,
+                "page_size": self.tamanho_pagina,
+                "pagination": "true",
+            }
+            parametros.update(parametros_extras)
+            dados = self._get(f"{recurso}/{VHOST_PADRAO}", parametros)
+            if isinstance(dados, list):
+                # Versões antigas do plugin ignoram a paginação e devolvem a lista inteira
+                return dados
+            itens.extend(dados.get("items", []))
+            if pagina >= dados.get("page_count", 1):
+                return itens
+            pagina += 1
+
+    def _geracao(self, recurso):
+        return (self._geracao_global, self._geracoes.get(recurso, 0))
+
+    def _carregar(self, chave):
+        recurso, colunas, extras = chave
+        with self._lock:
+            geracao = self._geracao(recurso)
+        inicio = time.perf_counter()
+        try:
+            dados = self._buscar_paginado(recurso, colunas, dict(extras))
+        finally:
+            duracao = time.perf_counter() - inicio
+            with self._lock:
+                self._estatisticas["buscas"] += 1
+                self._estatisticas["tempo_buscas_s"] += duracao
+                self._estatisticas["tempo_ultima_busca_s"] = duracao
+                self._estatisticas["tempo_maximo_busca_s"] = max(self._estatisticas["tempo_maximo_busca_s"], duracao)
+        with self._lock:
+            if self._geracao(recurso) == geracao:
+                self._cache[chave] = (time.monotonic(), dados)
+        return dados
+
+    def _atualizar_em_segundo_plano(self, chave):
+        try:
+            self._carregar(chave)
+        except Exception as e:
+            # Mantém o valor antigo; a próxima consulta tenta de novo
+            with self._lock:
+                self._estatisticas["falhas_atualizacao"] += 1
+            print(f"[DiretorioBroker] Falha ao atualizar '{chave[0]}' em segundo plano: {e}")
+        finally:
+            with self._lock:
+                self._atualizando.discard(chave)
+
+    def consultar(self, recurso, colunas, fresco=False, **parametros_extras):
+        """
+        Retorna a lista de itens de 'recurso' ('queues' ou 'exchanges') com as colunas pedidas.
+        Com fresco=True ignora o cache e busca o estado atual (ex.: amostras de métricas).
+        """
+        chave = (recurso, tuple(colunas), tuple(sorted(parametros_extras.items())))
+        if fresco:
+            return self._carregar(chave)
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._cache.get(chave)
+            if entrada is not None:
+                idade = agora - entrada[0]
+                if idade <= self.ttl_s:
+                    self._estatisticas["acertos"] += 1
+                    return entrada[1]
+                if idade <= self.ttl_s + self.stale_s:
+                    self._estatisticas["antigos_servidos"] += 1
+                    if chave not in self._atualizando:
+                        self._atualizando.add(chave)
+                        threading.Thread(target=self._atualizar_em_segundo_plano, args=(chave,), daemon=True).start()
+                    return entrada[1]
+            self._estatisticas["faltas"] += 1
+        return self._carregar(chave)
+
+    def invalidar(self, recurso=None):
+        """Descarta o cache (de um recurso ou de todos), por exemplo após criar ou remover filas."""
+        with self._lock:
+            if recurso is None:
+                self._geracao_global += 1
+            else:
+                self._geracoes[recurso] = self._geracoes.get(recurso, 0) + 1
+            for chave in list(self._cache):
+                if recurso is None or chave[0] == recurso:
+                    del self._cache[chave]
+
+    def listar_usuarios(self):
+        # disable_stats: só os nomes interessam, o broker não precisa calcular as estatísticas
+        filas = self.consultar("queues", ("name",), disable_stats="true")
+        return [
+            q['name'] for q in filas
+            if not q['name'].startswith('amq.') and not q['name'].endswith('_topicos')
+        ]
+
+    def listar_topicos(self):
+        exchanges = self.consultar("exchanges", ("name", "type"), disable_stats="true")
+        # Apenas exchanges 'fanout' (usados para tópicos), sem os internos do RabbitMQ (amq.) e o padrão ('')
+        return [
+            ex['name'] for ex in exchanges
+            if ex['type'] == 'fanout' and not ex['name'].startswith('amq.') and ex['name'] != ''
+        ]
+
+    def estatisticas(self):
+        with self._lock:
+            estatisticas = dict(self._estatisticas)
+        if estatisticas["buscas"]:
+            estatisticas["tempo_medio_busca_s"] = estatisticas["tempo_buscas_s"] / estatisticas["buscas"]
+        return estatisticas
@@ -0,0 +1,184 @@
+"""
+Envelope binário versionado das mensagens do chat.
+
+Layout do corpo (big-endian):
+    byte    marcador (0xAD, nunca inicia um texto UTF-8 válido)
+    byte    versão do envelope
+    byte    tipo (0 = geral, 1 = privado, 2 = tópico)
+    uint64  timestamp em milissegundos
+    16s     id da mensagem (UUID)
+    uint16  tamanho do remetente
+    uint16  tamanho do tópico
+    ...     remetente (UTF-8), tópico (UTF-8), payload (bytes restantes)
+
+Os mesmos metadados também vão nas propriedades AMQP (message_id, timestamp, type, headers),
+para ferramentas de inspeção do broker. Mensagens no formato antigo ("PRIVADO:remetente:texto"
+e "[topico]remetente: texto") continuam sendo aceitas por decodificar().
+"""
+
+import struct
+import time
+import uuid
+import pika
+
+MARCADOR = 0xAD
+VERSAO = 1
+CONTENT_TYPE = "application/x-mom-envelope"
+
+TIPO_GERAL = "geral"
+TIPO_PRIVADO = "privado"
+TIPO_TOPICO = "topico"
+_CODIGOS_TIPO = {TIPO_GERAL: 0, TIPO_PRIVADO: 1, TIPO_TOPICO: 2}
+_TIPOS_POR_CODIGO = {codigo: tipo for tipo, codigo in _CODIGOS_TIPO.items()}
+
+_CABECALHO = struct.Struct("!BBBQ16sHH")
+
+
+def novo_id():
+    return uuid.uuid4().bytes
+
+
+def codificar(tipo, remetente, texto, topico="", message_id=None, timestamp_ms=None):
+    """Monta o corpo binário e as propriedades AMQP de uma mensagem. Retorna (corpo, propriedades)."""
+    if message_id is None:
+        message_id = novo_id()
+    if timestamp_ms is None:
+        timestamp_ms = int(time.time() * 1000)
+    remetente_b = remetente.encode('utf-8')
+    topico_b = topico.encode('utf-8')
+    payload = texto.encode('utf-8') if isinstance(texto, str) else bytes(texto)
+    corpo = b"".join((
+        _CABECALHO.pack(MARCADOR, VERSAO, _CODIGOS_TIPO[tipo], timestamp_ms, message_id,
+                        len(remetente_b), len(topico_b)),
+        remetente_b,
+        topico_b,
+        payload,
+    ))
+    propriedades = pika.BasicProperties(
+        content_type=CONTENT_TYPE,
+        message_id=message_id.hex(),
+        timestamp=timestamp_ms // 1000,
+        type=tipo,
+        headers={"x-mom-versao": VERSAO},
+    )
+    return corpo, propriedades
+
+
+class Envelope:
+    """
+    Mensagem decodificada sob demanda: o corpo é mantido como memoryview e cada campo
+    só é lido (e o texto só é decodificado) quando acessado.
+    """
+
+    __slots__ = ("_buf", "_cabecalho", "_campos", "_texto")
+
+    def __init__(self, buf):
+        self._buf = memoryview(buf)
+        self._cabecalho = None
+        self._campos = None
+        self._texto = None
+
+    @classmethod
+    def de_campos(cls, tipo, remetente, topico, texto, timestamp_ms=None, message_id=None):
+        # Usado pelo decodificador de compatibilidade: os campos já vêm separados
+        envelope = cls(b"")
+        envelope._cabecalho = (MARCADOR, 0, _CODIGOS_TIPO[tipo],
+                               timestamp_ms if timestamp_ms is not None else int(time.time() * 1000),
+                               message_id or b"", 0, 0)
+        envelope._campos = (remetente, topico, None)
+        envelope._texto = texto
+        return envelope
+
+    def _ler_cabecalho(self):
+        if self._cabecalho is None:
+            self._cabecalho = _CABECALHO.unpack_from(self._buf, 0)
+        return self._cabecalho
+
+    def _ler_campos(self):
+        if self._campos is None:
+            _, _, _, _, _, tam_remetente, tam_topico = self._ler_cabecalho()
+            inicio = _CABECALHO.size
+            fim_remetente = inicio + tam_remetente
+            fim_topico = fim_remetente + tam_topico
+            self._campos = (
+                str(self._buf[inicio:fim_remetente], 'utf-8'),
+                str(self._buf[fim_remetente:fim_topico], 'utf-8'),
+                self._buf[fim_topico:],
+            )
+        return self._campos
+
+    @property
+    def versao(self):
+        return self._ler_cabecalho()[1]
+
+    @property
+    def tipo(self):
+        return _TIPOS_POR_CODIGO.get(self._ler_cabecalho()[2], "desconhecido")
+
+    @property
+    def timestamp_ms(self):
+        return self._ler_cabecalho()[3]
+
+    @property
+    def message_id(self):
+        return bytes(self._ler_cabecalho()[4]).hex()
+
+    @property
+    def remetente(self):
+        return self._ler_campos()[0]
+
+    @property
+    def topico(self):
+        return self._ler_campos()[1]
+
+    @property
+    def payload(self):
+        """Payload bruto (memoryview, sem cópia). No formato antigo é o texto recodificado."""
+        payload = self._ler_campos()[2]
+        return payload if payload is not None else memoryview(self.texto.encode('utf-8'))
+
+    @property
+    def texto(self):
+        if self._texto is None:
+            self._texto = str(self._ler_campos()[2], 'utf-8')
+        return self._texto
+
+    def formatar(self):
+        """Linha de exibição no mesmo formato usado pelo mural e pelo log."""
+        if self.tipo == TIPO_TOPICO:
+            return f"[{self.topico}]{self.remetente}: {self.texto}"
+        if self.tipo == TIPO_PRIVADO:
+            return f"PRIVADO:{self.remetente}:{self.texto}"
+        return self.texto
+
+    def __str__(self):
+        return self.formatar()
+
+    def __repr__(self):
+        return f"Envelope(tipo={self.tipo!r}, remetente={self.remetente!r}, topico={self.topico!r})"
+
+
+def _decodificar_legado(texto):
+    # Formato antigo: "PRIVADO:remetente:texto" ou "[topico]remetente: texto"
+    if texto.startswith("PRIVADO:"):
+        partes = texto.split(":", 2)
+        if len(partes) == 3:
+            return Envelope.de_campos(TIPO_PRIVADO, partes[1], "", partes[2])
+    elif texto.startswith("[") and "]" in texto:
+        fim_topico = texto.index("]")
+        resto = texto[fim_topico + 1:]
+        remetente, separador, conteudo = resto.partition(": ")
+        if separador:
+            return Envelope.de_campos(TIPO_TOPICO, remetente, texto[1:fim_topico], conteudo)
+    # Texto livre (ex.: publicado pela interface de gerenciamento do RabbitMQ)
+    return Envelope.de_campos(TIPO_GERAL, "", "", texto)
+
+
+def decodificar(body):
+    """
+    Decodifica o corpo de uma entrega em um Envelope. Corpos que não são envelopes binários
+    passam pelo decodificador de compatibilidade do formato antigo; texto livre vira TIPO_GERAL.
+    """
+    if len(body) >= _CABECALHO.size and body[0] == MARCADOR:
+        return Envelope(body)
+    return _decodificar_legado(bytes(body).decode('utf-8', errors='replace'))
@@ -0,0 +1,105 @@
+"""
+Ganchos (observadores) das interações com o broker.
+
+Usuario, BrokerManager e ClienteGerenciamento têm um atributo 'ganchos'. Cada observador
+registrado com adicionar(observador) é chamado com um Evento ao fim de cada operação (conectar,
+publicar, declarar, ligar, remover, callback de mensagem, chamada HTTP). Sem observadores o custo
+é um teste de verdade (if self.ganchos) por operação: o Evento nem chega a ser criado.
+
+Os observadores rodam na thread da operação (inclusive a de consumo) e devem ser rápidos;
+exceções lançadas por eles são registradas e ignoradas.
+"""
+
+import random
+import threading
+import time
+
+
+class Evento:
+    __slots__ = ("origem", "operacao", "duracao_s", "tamanho_bytes", "resultado", "erro", "detalhes", "instante")
+
+    def __init__(self, origem, operacao, duracao_s, tamanho_bytes, erro, detalhes):
+        self.origem = origem
+        self.operacao = operacao
+        self.duracao_s = duracao_s
+        self.tamanho_bytes = tamanho_bytes
+        self.resultado = "ok" if erro is None else "erro"
+        self.erro = erro
+        self.detalhes = detalhes
+        self.instante = time.time()
+
+    def __repr__(self):
+        return (f"Evento({self.origem}:{self.operacao} {self.resultado} {self.duracao_s * 1000:.3f}ms "
+                f"{self.tamanho_bytes}B {self.detalhes})")
+
+
+class Ganchos:
+    """Conjunto de observadores de uma origem. É falso (bool) enquanto não houver observadores."""
+
+    def __init__(self, origem):
+        self.origem = origem
+        # Tupla imutável: emitir() itera sem lock enquanto outra thread adiciona ou remove
+        self._observadores = ()
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self._observadores)
+
+    def adicionar(self, observador):
+        with self._lock:
+            self._observadores = self._observadores + (observador,)
+
+    def remover(self, observador):
+        with self._lock:
+            self._observadores = tuple(o for o in self._observadores if o is not observador)
+
+    def emitir(self, operacao, inicio, tamanho_bytes=0, erro=None, **detalhes):
+        """'inicio' é o time.perf_counter() do começo da operação."""
+        evento = Evento(self.origem, operacao, time.perf_counter() - inicio, tamanho_bytes, erro, detalhes)
+        for observador in self._observadores:
+            try:
+                observador(evento)
+            except Exception as e:
+                print(f"[Ganchos] Erro no observador {observador!r} ({self.origem}:{operacao}): {e}")
+
+    def observar(self, operacao, func, tamanho_bytes=0, **detalhes):
+        """Executa func() e emite o evento (com a exceção, se houver). Sem observadores, só chama func()."""
+        if not self._observadores:
+            return func()
+        inicio = time.perf_counter()
+        try:
+            resultado = func()
+        except Exception as e:
+            self.emitir(operacao, inicio, tamanho_bytes, e, **detalhes)
+            raise
+        self.emitir(operacao, inicio, tamanho_bytes, **detalhes)
+        return resultado
+
+
+def registrar_em_log(evento):
+    """Observador simples que imprime cada evento."""
+    print(f"[Ganchos] {evento!r}")
+
+
+class Amostrador:
+    """Repassa ao observador só uma fração 'taxa' dos eventos (e sempre os de erro)."""
+
+    def __init__(self, observador, taxa=0.01):
+        self.observador = observador
+        self.taxa = taxa
+
+    def __call__(self, evento):
+        if evento.erro is not None or random.random() < self.taxa:
+            self.observador(evento)
+
+
+class OperacoesLentas:
+    """Repassa ao observador só os eventos que levaram mais que 'limite_s' segundos."""
+
+    def __init__(self, observador, limite_s=0.1):
+        self.observador = observador
+        self.limite_s = limite_s
+
+    def __call__(self, evento):
+        if evento.duracao_s >= self.limite_s:
+            self.observador(evento)
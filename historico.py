@@ -0,0 +1,301 @@
+"""
+Histórico de mensagens dos tópicos em log segmentado, só de acréscimo, com índice.
+
+Cada tópico tem um diretório (historico/<topico>/) com segmentos numerados pela sequência
+da primeira mensagem:
+
+    00000000000000000000.log      linhas do mural, uma por registro (texto legível)
+    00000000000000000000.idx      entradas fixas (deslocamento, tamanho) de cada registro
+    00000000000000012345.log.gz   segmentos antigos, comprimidos após a rotação
+
+As escritas ficam em um buffer em memória e vão para o disco a cada 'max_buffer' mensagens,
+a cada 'intervalo_flush_s' segundos ou em flush(). Ler as últimas N mensagens (ou uma página
+anterior) custa uma busca binária nos segmentos e uma leitura direta pelo índice, não importa
+o tamanho do histórico. Se o processo morrer no meio de uma escrita, o fim do segmento ativo
+é reparado na abertura (registros sem entrada no índice são descartados).
+"""
+
+import bisect
+import gzip
+import os
+import shutil
+import struct
+import threading
+import time
+from urllib.parse import quote
+
+ENTRADA_INDICE = struct.Struct("!QI")  # deslocamento no segmento, tamanho do registro
+SEGMENTO_PADRAO = 4 * 1024 * 1024
+
+
+class _Segmento:
+    def __init__(self, diretorio, base):
+        self.base = base
+        prefixo = os.path.join(diretorio, f"{base:020d}")
+        self.caminho_log = prefixo + ".log"
+        self.caminho_gz = prefixo + ".log.gz"
+        self.caminho_indice = prefixo + ".idx"
+        self.quantidade = 0
+        self.tamanho = 0
+
+    def comprimido(self):
+        return not os.path.exists(self.caminho_log) and os.path.exists(self.caminho_gz)
+
+    def carregar(self):
+        # Só o tamanho do índice é necessário: a quantidade de registros sai dele sem ler o arquivo
+        tamanho_indice = os.path.getsize(self.caminho_indice) if os.path.exists(self.caminho_indice) else 0
+        self.quantidade = tamanho_indice // ENTRADA_INDICE.size
+        if self.quantidade:
+            deslocamento, tamanho = self.entradas(self.quantidade - 1, self.quantidade)[0]
+            self.tamanho = deslocamento + tamanho
+
+    def entradas(self, inicio, fim):
+        with open(self.caminho_indice, "rb") as f:
+            f.seek(inicio * ENTRADA_INDICE.size)
+            dados = f.read((fim - inicio) * ENTRADA_INDICE.size)
+        return list(ENTRADA_INDICE.iter_unpack(dados))
+
+    #Acerta índice e log do segmento ativo após uma queda no meio de uma escrita
+    def reparar(self):
+        if not os.path.exists(self.caminho_log):
+            open(self.caminho_log, "ab").close()
+        tamanho_indice = os.path.getsize(self.caminho_indice) if os.path.exists(self.caminho_indice) else 0
+        if tamanho_indice % ENTRADA_INDICE.size:
+            with open(self.caminho_indice, "r+b") as f:
+                f.truncate(tamanho_indice - tamanho_indice % ENTRADA_INDICE.size)
+        self.carregar()
+        tamanho_log = os.path.getsize(self.caminho_log)
+        # Índice à frente do log: descarta as entradas cujo registro não chegou inteiro ao disco
+        while self.quantidade and self.tamanho > tamanho_log:
+            self.quantidade -= 1
+            with open(self.caminho_indice, "r+b") as f:
+                f.truncate(self.quantidade * ENTRADA_INDICE.size)
+            self.tamanho = 0
+            if self.quantidade:
+                deslocamento, tamanho = self.entradas(self.quantidade - 1, self.quantidade)[0]
+                self.tamanho = deslocamento + tamanho
+        # Log à frente do índice: registros sem entrada são descartados
+        if tamanho_log > self.tamanho:
+            with open(self.caminho_log, "r+b") as f:
+                f.truncate(self.tamanho)
+
+    def anexar(self, registros):
+        indice = bytearray()
+        deslocamento = self.tamanho
+        for registro in registros:
+            indice += ENTRADA_INDICE.pack(deslocamento, len(registro))
+            deslocamento += len(registro)
+        # Log antes do índice: uma queda entre as duas escritas é reparada na próxima abertura
+        with open(self.caminho_log, "ab") as f:
+            f.write(b"".join(registros))
+        with open(self.caminho_indice, "ab") as f:
+            f.write(indice)
+        self.quantidade += len(registros)
+        self.tamanho = deslocamento
+
+    def remover(self):
+        for caminho in (self.caminho_log, self.caminho_gz, self.caminho_indice):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+
+class HistoricoTopico:
+    """Log de um tópico. As posições são números de sequência globais (0 = primeira mensagem gravada)."""
+
+    def __init__(self, diretorio, tamanho_segmento=SEGMENTO_PADRAO, comprimir=True, max_buffer=200,
+                 intervalo_flush_s=1.0, max_segmentos=None):
+        self.diretorio = diretorio
+        self.tamanho_segmento = tamanho_segmento
+        self.comprimir = comprimir
+        self.max_buffer = max_buffer
+        self.intervalo_flush_s = intervalo_flush_s
+        self.max_segmentos = max_segmentos
+        self._lock = threading.RLock()
+        self._buffer = []
+        self._ultimo_flush = time.monotonic()
+        self._descomprimido = (None, b"")  # (base, conteúdo) do último segmento comprimido lido
+
+        os.makedirs(diretorio, exist_ok=True)
+        bases = set()
+        for arquivo in os.listdir(diretorio):
+            if arquivo.endswith(".tmp"):
+                os.remove(os.path.join(diretorio, arquivo)) # Compressão interrompida
+            elif arquivo.endswith(".idx"):
+                bases.add(int(arquivo[:-len(".idx")]))
+        self._segmentos = []
+        for base in sorted(bases) or [0]:
+            segmento = _Segmento(diretorio, base)
+            if os.path.exists(segmento.caminho_gz) and os.path.exists(segmento.caminho_log):
+                os.remove(segmento.caminho_log) # A compressão terminou mas o original não foi apagado
+            segmento.carregar()
+            self._segmentos.append(segmento)
+        self._segmentos[-1].reparar()
+        self._bases = [segmento.base for segmento in self._segmentos]
+        if self.comprimir:
+            for segmento in self._segmentos[:-1]:
+                if not segmento.comprimido():
+                    self._comprimir_em_segundo_plano(segmento)
+
+    def primeira(self):
+        return self._segmentos[0].base
+
+    def total(self):
+        """Sequência da próxima mensagem (mensagens já removidas pela retenção contam)."""
+        with self._lock:
+            ativo = self._segmentos[-1]
+            return ativo.base + ativo.quantidade + len(self._buffer)
+
+    def anexar(self, linha):
+        with self._lock:
+            self._buffer.append(linha.encode("utf-8") + b"\n")
+            if len(self._buffer) >= self.max_buffer or time.monotonic() - self._ultimo_flush >= self.intervalo_flush_s:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            pendentes, self._buffer = self._buffer, []
+            self._ultimo_flush = time.monotonic()
+            i = 0
+            while i < len(pendentes):
+                segmento = self._segmentos[-1]
+                if segmento.quantidade and segmento.tamanho >= self.tamanho_segmento:
+                    segmento = self._rotacionar()
+                # Preenche o segmento até o limite (pelo menos um registro por segmento)
+                fim = i + 1
+                tamanho = segmento.tamanho + len(pendentes[i])
+                while fim < len(pendentes) and tamanho + len(pendentes[fim]) <= self.tamanho_segmento:
+                    tamanho += len(pendentes[fim])
+                    fim += 1
+                segmento.anexar(pendentes[i:fim])
+                i = fim
+
+    def _rotacionar(self):
+        anterior = self._segmentos[-1]
+        novo = _Segmento(self.diretorio, anterior.base + anterior.quantidade)
+        novo.reparar()
+        self._segmentos.append(novo)
+        self._bases.append(novo.base)
+        if self.max_segmentos and len(self._segmentos) > self.max_segmentos:
+            antigo = self._segmentos.pop(0)
+            self._bases.pop(0)
+            antigo.remover()
+        if self.comprimir:
+            self._comprimir_em_segundo_plano(anterior)
+        return novo
+
+    def _comprimir_em_segundo_plano(self, segmento):
+        threading.Thread(target=self._comprimir, args=(segmento,), daemon=True).start()
+
+    def _comprimir(self, segmento):
+        temporario = segmento.caminho_gz + ".tmp"
+        try:
+            with open(segmento.caminho_log, "rb") as origem, gzip.open(temporario, "wb") as destino:
+                shutil.copyfileobj(origem, destino)
+            with self._lock:
+                if segmento not in self._segmentos:
+                    os.remove(temporario) # Removido pela retenção enquanto comprimia
+                    return
+                os.replace(temporario, segmento.caminho_gz)
+                os.remove(segmento.caminho_log)
+        except OSError as e:
+            print(f"[Historico] Falha ao comprimir '{segmento.caminho_log}': {e}")
+
+    def _ler_segmento(self, segmento, inicio, fim):
+        entradas = segmento.entradas(inicio, fim)
+        primeiro = entradas[0][0]
+        ultimo = entradas[-1][0] + entradas[-1][1]
+        if segmento.comprimido():
+            if self._descomprimido[0] != segmento.base:
+                with gzip.open(segmento.caminho_gz, "rb") as f:
+                    self._descomprimido = (segmento.base, f.read())
+            dados = memoryview(self._descomprimido[1])[primeiro:ultimo]
+        else:
+            with open(segmento.caminho_log, "rb") as f:
+                f.seek(primeiro)
+                dados = memoryview(f.read(ultimo - primeiro))
+        return [
+            bytes(dados[deslocamento - primeiro:deslocamento - primeiro + tamanho - 1]).decode("utf-8")
+            for deslocamento, tamanho in entradas
+        ]
+
+    def ler(self, inicio, fim):
+        """Linhas com sequência em [inicio, fim), sem o '\\n' final."""
+        with self._lock:
+            inicio = max(inicio, self.primeira())
+            ativo = self._segmentos[-1]
+            em_disco = ativo.base + ativo.quantidade
+            linhas = []
+            posicao = max(0, bisect.bisect_right(self._bases, inicio) - 1)
+            while inicio < min(fim, em_disco) and posicao < len(self._segmentos):
+                segmento = self._segmentos[posicao]
+                ate = min(fim, segmento.base + segmento.quantidade)
+                if ate > inicio:
+                    linhas.extend(self._ler_segmento(segmento, inicio - segmento.base, ate - segmento.base))
+                    inicio = ate
+                posicao += 1
+            if fim > em_disco:
+                inicio_buffer = max(0, inicio - em_disco)
+                linhas.extend(r[:-1].decode("utf-8") for r in self._buffer[inicio_buffer:fim - em_disco])
+            return linhas
+
+    def ultimas(self, quantidade):
+        """Retorna (sequência da primeira linha, linhas) das últimas 'quantidade' mensagens."""
+        with self._lock:
+            fim = self.total()
+            inicio = max(self.primeira(), fim - quantidade)
+            return inicio, self.ler(inicio, fim)
+
+    def anteriores(self, antes_de, quantidade):
+        """Página anterior a 'antes_de': retorna (sequência da primeira linha, linhas)."""
+        with self._lock:
+            inicio = max(self.primeira(), antes_de - quantidade)
+            return inicio, self.ler(inicio, antes_de)
+
+
+class HistoricoTopicos:
+    """Históricos de todos os tópicos em 'diretorio', abertos sob demanda."""
+
+    def __init__(self, diretorio="historico", **opcoes):
+        self.diretorio = diretorio
+        self.opcoes = opcoes
+        self._topicos = {}
+        self._lock = threading.Lock()
+
+    def obter(self, topico):
+        with self._lock:
+            historico = self._topicos.get(topico)
+            if historico is None:
+                caminho = os.path.join(self.diretorio, quote(topico, safe=""))
+                novo = not os.path.exists(caminho)
+                historico = self._topicos[topico] = HistoricoTopico(caminho, **self.opcoes)
+                if novo:
+                    self._importar_legado(topico, historico)
+            return historico
+
+    #Importa uma única vez o arquivo {topico}.txt do formato antigo (o arquivo é mantido)
+    def _importar_legado(self, topico, historico):
+        legado = f"{topico}.txt"
+        if not os.path.exists(legado):
+            return
+        with open(legado, "r", encoding="utf-8") as f:
+            for linha in f:
+                historico._buffer.append(linha.rstrip("\n").encode("utf-8") + b"\n")
+                if len(historico._buffer) >= 10000:
+                    historico.flush()
+        historico.flush()
+        print(f"[Historico] '{legado}' importado ({historico.total()} mensagens).")
+
+    def anexar(self, topico, linha):
+        self.obter(topico).anexar(linha)
+
+    def ultimas(self, topico, quantidade):
+        return self.obter(topico).ultimas(quantidade)
+
+    def anteriores(self, topico, antes_de, quantidade):
+        return self.obter(topico).anteriores(antes_de, quantidade)
+
+    def flush(self):
+        with self._lock:
+            historicos = list(self._topicos.values())
+        for historico in historicos:
+            historico.flush()
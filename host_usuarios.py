@@ -0,0 +1,160 @@
+import asyncio
+import random
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+from async_user_client import AsyncUsuario
+
+
+class HostUsuarios:
+    """
+    Hospeda muitas identidades de chat sobre uma única conexão AMQP.
+    Cada identidade é um AsyncUsuario com seus próprios canais, consumer tags e callback,
+    então adicionar ou remover uma identidade (ou um erro de canal em uma delas)
+    não afeta as demais. Um único socket e um único heartbeat atendem todas.
+
+    Se o consumo de uma identidade falhar, ele é refeito com backoff exponencial e jitter
+    enquanto a conexão compartilhada estiver aberta. Depois de 'max_tentativas' falhas seguidas,
+    ou se a conexão cair, a identidade é removida e on_estado(nome, "desistiu", detalhes) avisa.
+
+    Uso:
+        host = HostUsuarios()
+        await host.conectar()
+        ana = await host.adicionar("ana", lambda nome, msg: print(nome, msg))
+        await ana.publicar_em_topico("geral", "oi")
+        await host.remover("ana")
+    """
+
+    def __init__(self, host='localhost', prefetch=100, compressor=None, perfil_filas="padrao",
+                 backoff_inicial=1.0, backoff_maximo=30.0, max_tentativas=5):
+        self.parametros = pika.ConnectionParameters(host, heartbeat=60)
+        self.prefetch = prefetch
+        self.compressor = compressor
+        self.perfil_filas = perfil_filas
+        self.backoff_inicial = backoff_inicial
+        self.backoff_maximo = backoff_maximo
+        self.max_tentativas = max_tentativas
+        self.connection = None
+        self.identidades = {}  # nome -> AsyncUsuario
+        self._consumidores = {}  # nome -> asyncio.Task que entrega as mensagens ao callback
+        self._loop = None
+
+    async def conectar(self):
+        self._loop = asyncio.get_running_loop()
+        aberta = self._loop.create_future()
+
+        def on_open(connection):
+            if not aberta.done():
+                aberta.set_result(connection)
+
+        def on_open_error(connection, erro):
+            if not aberta.done():
+                aberta.set_exception(pika.exceptions.AMQPConnectionError(erro))
+
+        print("[HostUsuarios] Conectando ao RabbitMQ...")
+        self.connection = AsyncioConnection(
+            self.parametros,
+            on_open_callback=on_open,
+            on_open_error_callback=on_open_error,
+            on_close_callback=self._on_conexao_fechada,
+            custom_ioloop=self._loop
+        )
+        await aberta
+        print("[HostUsuarios] Conectado.")
+
+    def _on_conexao_fechada(self, connection, motivo):
+        print(f"[HostUsuarios] Conexão compartilhada fechada: {motivo}")
+        # Todas as identidades perdem o canal junto com a conexão
+        for usuario in list(self.identidades.values()):
+            usuario._on_conexao_fechada(connection, motivo)
+
+    async def adicionar(self, nome, callback=None, on_estado=None):
+        """
+        Abre os canais da identidade 'nome' e, se 'callback' for informado, passa a
+        entregar suas mensagens como callback(nome, envelope). on_estado(nome, estado, detalhes),
+        se informado, recebe "reconectando" e "desistiu" (identidade removida). Retorna o AsyncUsuario.
+        """
+        if nome in self.identidades:
+            return self.identidades[nome]
+        if self.connection is None or not self.connection.is_open:
+            raise pika.exceptions.AMQPConnectionError("Conexão compartilhada não está aberta.")
+
+        usuario = AsyncUsuario(nome, prefetch=self.prefetch, compressor=self.compressor,
+                               perfil_filas=self.perfil_filas)
+        await usuario.conectar(conexao=self.connection)
+        self.identidades[nome] = usuario
+        if callback is not None:
+            self._consumidores[nome] = self._loop.create_task(self._consumir(usuario, callback, on_estado))
+        print(f"[HostUsuarios] Identidade '{nome}' adicionada ({len(self.identidades)} ativas).")
+        return usuario
+
+    async def _consumir(self, usuario, callback, on_estado=None):
+        def notificar(estado, detalhes=""):
+            if on_estado:
+                try:
+                    on_estado(usuario.nome, estado, detalhes)
+                except Exception as e:
+                    print(f"[HostUsuarios] Erro no callback de estado de '{usuario.nome}': {e}")
+
+        tentativas = 0
+        while True:
+            try:
+                async for mensagem in usuario.mensagens():
+                    # Consumo funcionando de novo: zera o contador de falhas seguidas
+                    tentativas = 0
+                    try:
+                        callback(usuario.nome, mensagem)
+                    except Exception as e:
+                        print(f"[HostUsuarios] Erro no callback de '{usuario.nome}': {e}")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Falha isolada no canal desta identidade; as outras continuam consumindo
+                tentativas += 1
+                if self.connection is None or not self.connection.is_open or tentativas > self.max_tentativas:
+                    print(f"[HostUsuarios] Consumo de '{usuario.nome}' abandonado: {e}")
+                    await self._descartar(usuario)
+                    notificar("desistiu", str(e))
+                    return
+                espera = random.uniform(0, min(self.backoff_maximo, self.backoff_inicial * 2 ** (tentativas - 1)))
+                print(f"[HostUsuarios] Consumo de '{usuario.nome}' interrompido: {e!r}. "
+                      f"Nova tentativa {tentativas} em {espera:.1f}s...")
+                notificar("reconectando", f"tentativa {tentativas} em {espera:.1f}s")
+                await asyncio.sleep(espera)
+
+    #Remove uma identidade cujo consumo não pôde ser refeito, para que não pareça ativa
+    async def _descartar(self, usuario):
+        if self.identidades.get(usuario.nome) is not usuario:
+            return
+        del self.identidades[usuario.nome]
+        self._consumidores.pop(usuario.nome, None)
+        try:
+            await usuario.fechar()
+        except Exception as e:
+            print(f"[HostUsuarios] Erro ao fechar os canais de '{usuario.nome}': {e}")
+        print(f"[HostUsuarios] Identidade '{usuario.nome}' removida após falha ({len(self.identidades)} ativas).")
+
+    async def remover(self, nome):
+        """Cancela os consumidores e fecha o canal de 'nome' sem tocar nas outras identidades."""
+        usuario = self.identidades.pop(nome, None)
+        if usuario is None:
+            return False
+        tarefa = self._consumidores.pop(nome, None)
+        if tarefa is not None:
+            tarefa.cancel()
+            try:
+                await tarefa
+            except asyncio.CancelledError:
+                pass
+        await usuario.fechar()
+        print(f"[HostUsuarios] Identidade '{nome}' removida ({len(self.identidades)} ativas).")
+        return True
+
+    async def fechar(self):
+        for nome in list(self.identidades):
+            await self.remover(nome)
+        if self.connection is not None and self.connection.is_open:
+            fechada = self._loop.create_future()
+            self.connection.add_on_close_callback(lambda _c, _m: fechada.done() or fechada.set_result(None))
+            self.connection.close()
+            await fechada
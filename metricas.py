@@ -0,0 +1,208 @@
+"""
+Métricas em memória (contadores, gauges e histogramas com labels) e um endpoint HTTP local
+no formato texto do Prometheus. Nada é coletado a menos que um RegistroMetricas seja passado
+ao Usuario / BrokerManager, e nada é exposto a menos que iniciar_servidor_metricas seja chamado.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites (em segundos) adequados para latências de publicação, entrega e callbacks
+BUCKETS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _chave_labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_labels(chave, extra=None):
+    pares = list(chave) + (list(extra) if extra else [])
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares) + "}"
+
+
+class _Metrica:
+    # Base de Contador, Gauge e Histograma: cada uma define 'tipo' e _linhas() (as amostras no formato texto)
+    tipo = None
+
+    def __init__(self, nome, ajuda):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def exportar(self):
+        with self._lock:
+            linhas = self._linhas()
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"] + linhas
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, valor=1, **labels):
+        chave = _chave_labels(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def _linhas(self):
+        return [f"{self.nome}{_formatar_labels(chave)} {valor}" for chave, valor in self._valores.items()]
+
+
+class Gauge(_Metrica):
+    tipo = "gauge"
+
+    def set(self, valor, **labels):
+        with self._lock:
+            self._valores[_chave_labels(labels)] = valor
+
+    def substituir(self, valores):
+        """Troca todas as séries de uma vez: valores = [(valor, {labels}), ...]. Séries ausentes somem."""
+        novos = {_chave_labels(labels): valor for valor, labels in valores}
+        with self._lock:
+            self._valores = novos
+
+    def _linhas(self):
+        return [f"{self.nome}{_formatar_labels(chave)} {valor}" for chave, valor in self._valores.items()]
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, buckets=BUCKETS_LATENCIA):
+        super().__init__(nome, ajuda)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor, **labels):
+        chave = _chave_labels(labels)
+        with self._lock:
+            serie = self._valores.get(chave)
+            if serie is None:
+                # [contagem por bucket..., contagem total, soma]
+                serie = self._valores[chave] = [0] * len(self.buckets) + [0, 0.0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+                    break
+            serie[-2] += 1
+            serie[-1] += valor
+
+    def _linhas(self):
+        linhas = []
+        for chave, serie in self._valores.items():
+            acumulado = 0
+            for limite, quantidade in zip(self.buckets, serie):
+                acumulado += quantidade
+                linhas.append(f"{self.nome}_bucket{_formatar_labels(chave, [('le', limite)])} {acumulado}")
+            linhas.append(f"{self.nome}_bucket{_formatar_labels(chave, [('le', '+Inf')])} {serie[-2]}")
+            linhas.append(f"{self.nome}_sum{_formatar_labels(chave)} {serie[-1]}")
+            linhas.append(f"{self.nome}_count{_formatar_labels(chave)} {serie[-2]}")
+        return linhas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas nomeadas. Pedir a mesma métrica duas vezes devolve a mesma instância."""
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _obter(self, classe, nome, ajuda, **kwargs):
+        with self._lock:
+            metrica = self._metricas.get(nome)
+            if metrica is None:
+                metrica = self._metricas[nome] = classe(nome, ajuda, **kwargs)
+            elif not isinstance(metrica, classe):
+                raise ValueError(f"Métrica '{nome}' já registrada como {metrica.tipo}.")
+            return metrica
+
+    def contador(self, nome, ajuda):
+        return self._obter(Contador, nome, ajuda)
+
+    def gauge(self, nome, ajuda):
+        return self._obter(Gauge, nome, ajuda)
+
+    def histograma(self, nome, ajuda, buckets=BUCKETS_LATENCIA):
+        return self._obter(Histograma, nome, ajuda, buckets=buckets)
+
+    def exportar_texto(self):
+        with self._lock:
+            metricas = list(self._metricas.values())
+        linhas = []
+        for metrica in metricas:
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+
+class MetricasCliente:
+    """Instrumentos usados pelo Usuario: publicações, confirmações, entregas e tempo de callback."""
+
+    def __init__(self, registro):
+        self.publicacoes = registro.contador(
+            "mom_cliente_publicacoes_total", "Mensagens publicadas pelo cliente, por tipo e resultado.")
+        self.duracao_publicacao = registro.histograma(
+            "mom_cliente_publicacao_segundos", "Tempo de uma publicação individual (inclui declarações).")
+        self.confirmacoes = registro.contador(
+            "mom_cliente_confirmacoes_total", "Confirmações do broker em publicações em lote (ack/nack).")
+        self.duracao_lote = registro.histograma(
+            "mom_cliente_lote_segundos", "Tempo de uma publicação em lote até a última confirmação.")
+        self.entregas = registro.contador(
+            "mom_cliente_entregas_total", "Mensagens entregues ao cliente, por tipo.")
+        self.duplicatas = registro.contador(
+            "mom_cliente_duplicatas_total", "Reentregas descartadas pelo cache de deduplicação.")
+        self.duracao_callback = registro.histograma(
+            "mom_cliente_callback_segundos", "Tempo gasto no callback de cada mensagem recebida.")
+        self.latencia_entrega = registro.histograma(
+            "mom_cliente_latencia_entrega_segundos", "Tempo entre a publicação (timestamp do envelope) e a entrega.")
+
+
+class MetricasBroker:
+    """Gauges amostrados pelo BrokerManager a partir da API de gerenciamento."""
+
+    def __init__(self, registro):
+        self.mensagens_fila = registro.gauge(
+            "mom_broker_fila_mensagens", "Mensagens na fila (prontas + não confirmadas).")
+        self.consumidores_fila = registro.gauge(
+            "mom_broker_fila_consumidores", "Consumidores ativos na fila.")
+        self.taxa_entrada_fila = registro.gauge(
+            "mom_broker_fila_entrada_por_segundo", "Taxa de publicação na fila (msg/s).")
+        self.taxa_saida_fila = registro.gauge(
+            "mom_broker_fila_saida_por_segundo", "Taxa de entrega da fila (msg/s).")
+        self.taxa_publicacao = registro.gauge(
+            "mom_broker_publicacao_por_segundo", "Taxa global de publicação no broker (msg/s).")
+        self.taxa_entrega = registro.gauge(
+            "mom_broker_entrega_por_segundo", "Taxa global de entrega do broker (msg/s).")
+        self.conexoes = registro.gauge(
+            "mom_broker_conexoes", "Conexões AMQP abertas no broker.")
+        self.amostragens = registro.contador(
+            "mom_broker_amostragens_total", "Amostragens feitas pelo BrokerManager, por resultado.")
+
+
+def iniciar_servidor_metricas(registro, porta=9464, endereco="127.0.0.1"):
+    """Serve registro.exportar_texto() em http://endereco:porta/metrics numa thread daemon. Retorna o servidor."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            corpo = registro.exportar_texto().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, formato, *args):
+            pass # Não polui o console a cada coleta
+
+    servidor = ThreadingHTTPServer((endereco, porta), Handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="servidor-metricas", daemon=True).start()
+    print(f"[Metricas] Endpoint disponível em http://{endereco}:{servidor.server_address[1]}/metrics")
+    return servidor
@@ -0,0 +1,57 @@
+"""
+Perfis de declaração das filas de usuário.
+
+Cada usuário tem duas filas: a principal ('nome', mensagens privadas) e a de tópicos
+('nome_topicos', cópias do fanout). Os perfis definem os argumentos x-* dessas filas para
+limitar a memória do broker com usuários offline. BrokerManager e Usuario devem usar o
+mesmo perfil: declarar uma fila existente com argumentos diferentes gera PRECONDITION_FAILED.
+"""
+
+UM_DIA_MS = 24 * 60 * 60 * 1000
+
+FILA_PRINCIPAL = "principal"
+FILA_TOPICOS = "topicos"
+
+_LIMITES = {
+    # Mensagens privadas: recusa novas quando cheia, para o remetente saber (nack com confirms)
+    FILA_PRINCIPAL: {"x-message-ttl": 7 * UM_DIA_MS, "x-max-length": 10000, "x-overflow": "reject-publish"},
+    # Cópias de tópicos: descarta as mais antigas, o mural só precisa do histórico recente
+    FILA_TOPICOS: {"x-message-ttl": UM_DIA_MS, "x-max-length": 1000, "x-overflow": "drop-head"},
+}
+
+PERFIS = {
+    # Filas duráveis sem argumentos (comportamento original)
+    "padrao": {FILA_PRINCIPAL: {}, FILA_TOPICOS: {}},
+    # TTL e tamanho máximo, mensagens em memória
+    "limitado": {tipo: dict(args) for tipo, args in _LIMITES.items()},
+    # Como 'limitado', mas mantendo as mensagens em disco (RabbitMQ < 3.12)
+    "lazy": {tipo: dict(args, **{"x-queue-mode": "lazy"}) for tipo, args in _LIMITES.items()},
+    # Filas quorum replicadas (exigem durable=True)
+    "quorum": {tipo: dict(args, **{"x-queue-type": "quorum"}) for tipo, args in _LIMITES.items()},
+}
+
+# Ajustes por usuário aplicados sobre o perfil: {nome: {FILA_PRINCIPAL: {...}, FILA_TOPICOS: {...}}}
+SOBRESCRITAS_POR_USUARIO = {}
+
+
+def tipo_da_fila(nome_fila):
+    return FILA_TOPICOS if nome_fila.endswith("_topicos") else FILA_PRINCIPAL
+
+
+def argumentos_fila(nome_fila, perfil="padrao", sobrescritas=None):
+    """
+    Retorna o dicionário 'arguments' para queue_declare da fila 'nome_fila' (ou None se vazio).
+    'sobrescritas' tem o mesmo formato das entradas de SOBRESCRITAS_POR_USUARIO e tem prioridade
+    sobre elas; um valor None remove o argumento do perfil.
+    """
+    if perfil not in PERFIS:
+        raise ValueError(f"Perfil de fila desconhecido: '{perfil}'. Use um de {sorted(PERFIS)}.")
+    tipo = tipo_da_fila(nome_fila)
+    nome_usuario = nome_fila[:-len("_topicos")] if tipo == FILA_TOPICOS else nome_fila
+
+    argumentos = dict(PERFIS[perfil][tipo])
+    for ajustes in (SOBRESCRITAS_POR_USUARIO.get(nome_usuario), sobrescritas):
+        if ajustes:
+            argumentos.update(ajustes.get(tipo, {}))
+    argumentos = {chave: valor for chave, valor in argumentos.items() if valor is not None}
+    return argumentos or None
@@ -0,0 +1,174 @@
+import pika
+import queue
+import threading
+from contextlib import contextmanager
+
+# Erros que indicam que a conexão (e não apenas o canal) foi perdida
+ERROS_DE_CONEXAO = (
+    pika.exceptions.AMQPConnectionError,
+    pika.exceptions.StreamLostError,
+    pika.exceptions.ConnectionClosed,
+    pika.exceptions.ConnectionWrongStateError,
+)
+
+
+class _Slot:
+    # Par conexão/canal emprestado com exclusividade a uma thread por vez
+    def __init__(self):
+        self.connection = None
+        self.channel = None
+        # Motivo do fechamento do canal atual, se o broker o fechou sem que ninguém visse o erro
+        self.motivo_fechamento = None
+
+    def conexao_aberta(self):
+        return self.connection is not None and self.connection.is_open
+
+    def canal_aberto(self):
+        return self.conexao_aberta() and self.channel is not None and self.channel.is_open
+
+    #Processa o I/O pendente (heartbeats) da conexão ociosa; se ela tiver morrido, descarta o slot
+    def manter_viva(self):
+        if not self.conexao_aberta():
+            return
+        try:
+            self.connection.process_data_events(0)
+        except ERROS_DE_CONEXAO:
+            self.fechar()
+
+    #Abre um novo canal e passa a registrar o motivo de um fechamento pelo broker
+    def abrir_canal(self):
+        canal = self.channel = self.connection.channel()
+        self.motivo_fechamento = None
+
+        def on_fechado(_canal, motivo):
+            if canal is self.channel and isinstance(motivo, pika.exceptions.ChannelClosedByBroker):
+                self.motivo_fechamento = motivo
+
+        # O BlockingChannel não expõe o motivo do fechamento; o canal assíncrono por baixo dele sim
+        canal._impl.add_on_close_callback(on_fechado)
+
+    def fechar(self):
+        try:
+            if self.conexao_aberta():
+                self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
+        self.channel = None
+
+
+class PoolCanais:
+    """
+    Pool de conexões/canais de longa duração.
+    Cada empréstimo entrega um canal exclusivo, então o pool pode ser usado com segurança
+    pela thread do Tk e por threads em segundo plano. As conexões são abertas sob demanda
+    e recriadas automaticamente quando o broker as fecha.
+
+    Uma BlockingConnection só faz I/O enquanto está emprestada, então o pool atende os
+    heartbeats ao emprestar e ao devolver cada slot e, a cada meio intervalo de heartbeat,
+    também nos slots ociosos (thread de manutenção).
+
+    Um erro assíncrono do broker (ex.: basic_publish em um exchange apagado, que fecha o canal
+    com 404 sem que a publicação falhe) só é percebido depois que o canal foi devolvido.
+    on_canal_fechado(erro), se informado, recebe esse ChannelClosedByBroker antes de o canal
+    ser reaberto, para que o chamador invalide o que sabia sobre o broker.
+    """
+
+    def __init__(self, parametros, tamanho=2, nome="Pool", on_canal_fechado=None):
+        self.parametros = parametros
+        self.tamanho = tamanho
+        self.nome = nome
+        self.on_canal_fechado = on_canal_fechado
+        self._livres = queue.LifoQueue()
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self._lock = threading.Lock()
+        self._slots = []
+        self._fechado = False
+        for _ in range(tamanho):
+            slot = _Slot()
+            self._slots.append(slot)
+            self._livres.put(slot)
+
+        self._parar_manutencao = threading.Event()
+        heartbeat = getattr(parametros, "heartbeat", None)
+        if heartbeat:
+            threading.Thread(target=self._laco_manutencao, args=(heartbeat / 2,), daemon=True).start()
+
+    def _laco_manutencao(self, intervalo):
+        while not self._parar_manutencao.wait(intervalo):
+            # Retira de uma vez todos os slots ociosos (quem pedir um canal espera só o tempo do I/O)
+            ociosos = []
+            while True:
+                try:
+                    ociosos.append(self._livres.get_nowait())
+                except queue.Empty:
+                    break
+            for slot in ociosos:
+                if self._fechado:
+                    slot.fechar() # fechar() não viu este slot na fila livre
+                else:
+                    slot.manter_viva()
+            for slot in reversed(ociosos):
+                self._livres.put(slot)
+
+    #Garante que o slot tenha conexão e canal abertos, reconectando se necessário
+    def _preparar_slot(self, slot):
+        # Atende o I/O acumulado enquanto o slot estava ocioso; uma conexão morta é descartada aqui
+        slot.manter_viva()
+        if not slot.conexao_aberta():
+            slot.fechar()
+            print(f"[{self.nome}] Abrindo conexão com o RabbitMQ...")
+            slot.connection = pika.BlockingConnection(self.parametros)
+        if not slot.canal_aberto():
+            motivo, slot.motivo_fechamento = slot.motivo_fechamento, None
+            if motivo is not None and self.on_canal_fechado is not None:
+                print(f"[{self.nome}] Canal fechado pelo broker: {motivo!r}")
+                self.on_canal_fechado(motivo)
+            slot.abrir_canal()
+        return slot
+
+    @contextmanager
+    def canal(self):
+        """Empresta um canal exclusivo do pool e o devolve ao final do bloco 'with'."""
+        if self._fechado:
+            raise RuntimeError(f"[{self.nome}] Pool de canais já foi fechado.")
+        self._vagas.acquire()
+        slot = self._livres.get()
+        try:
+            self._preparar_slot(slot)
+            yield slot.channel
+        except pika.exceptions.ChannelClosedByBroker:
+            # O erro chegou a quem usava o canal: não precisa ser avisado de novo ao reabrir
+            slot.motivo_fechamento = None
+            raise
+        except ERROS_DE_CONEXAO:
+            # A conexão morreu no meio da operação: descarta para reabrir no próximo uso
+            slot.fechar()
+            raise
+        finally:
+            if self._fechado:
+                slot.fechar()
+            else:
+                slot.manter_viva()
+            self._livres.put(slot)
+            self._vagas.release()
+
+    #Executa func(canal) reconectando uma vez caso a conexão emprestada esteja morta
+    def executar(self, func):
+        try:
+            with self.canal() as canal:
+                return func(canal)
+        except ERROS_DE_CONEXAO as e:
+            print(f"[{self.nome}] Conexão perdida ({e!r}). Reconectando...")
+            with self.canal() as canal:
+                return func(canal)
+
+    def fechar(self):
+        """Fecha todas as conexões ociosas do pool. Conexões em uso são fechadas ao serem devolvidas."""
+        with self._lock:
+            self._fechado = True
+            self._parar_manutencao.set()
+            for slot in self._slots:
+                # Slots emprestados são fechados pela própria thread ao serem devolvidos
+                if slot in list(self._livres.queue):
+                    slot.fechar()
@@ -1,23 +1,99 @@
 import pika
 import requests
-from requests.auth import HTTPBasicAuth
 import json
 import threading
 import time 
+import random
+from pool_canais import PoolCanais
+from cache_declaracoes import CacheDeclaracoes
+import envelope
+from compressao import Compressor
+from deduplicacao import CacheDeduplicacao
+from perfis_filas import argumentos_fila
+from diretorio import DiretorioBroker
+from metricas import MetricasCliente
+from ganchos import Ganchos
+
+class _ConfirmacoesAssincronas:
+    """
+    Único ponto do cliente que usa a API interna do pika. O BlockingChannel só oferece
+    confirmações síncronas (uma espera a cada publicação), então o lote publica e recebe os
+    Basic.Ack/Basic.Nack pelo canal assíncrono que existe por baixo dele (canal._impl). Se o pika
+    mudar essa estrutura, só esta classe precisa mudar.
+    """
+
+    def __init__(self, canal):
+        self._canal = canal._impl
+
+    def ativar(self, on_confirmacao, on_ativado):
+        self._canal.confirm_delivery(ack_nack_callback=on_confirmacao, callback=on_ativado)
+
+    def publicar(self, exchange, routing_key, corpo, propriedades):
+        self._canal.basic_publish(exchange, routing_key, corpo, propriedades)
+
 
 class Usuario:
-    def __init__(self, nome):
+    def __init__(self, nome, tamanho_pool_publicacao=2, compressor=None, deduplicacao=None,
+                 perfil_filas="padrao", sobrescritas_filas=None, cliente_gerenciamento=None, metricas=None):
         self.nome = nome
+        # Métricas opcionais (metricas.RegistroMetricas); sem registro nada é medido
+        self.metricas = MetricasCliente(metricas) if metricas is not None else None
+        # Observadores das interações com o broker (ver ganchos e adicionar_gancho)
+        self.ganchos = Ganchos(nome)
+        # Perfil de declaração das filas (TTL, tamanho máximo, lazy/quorum); ver perfis_filas
+        self.perfil_filas = perfil_filas
+        self.sobrescritas_filas = sobrescritas_filas
         self.consume_connection = None
         self.consume_channel = None
+        # Tópicos assinados nesta sessão, refeitos automaticamente após uma reconexão
+        self.topicos_assinados = set()
+
+        # Pool de conexões de publicação de longa duração, aberto sob demanda.
+        # Evita um handshake TCP/AMQP completo a cada mensagem enviada.
+        self.pool_publicacao = PoolCanais(
+            pika.ConnectionParameters('localhost', heartbeat=60),
+            tamanho=tamanho_pool_publicacao,
+            nome=f"{nome}/publicacao",
+            on_canal_fechado=self._on_canal_publicacao_fechado
+        )
+        # Exchanges, filas e bindings já declarados com sucesso (evita redeclarar a cada publicação)
+        self.declaracoes = CacheDeclaracoes()
+        # Compressão opcional das mensagens grandes. Sem compressor informado, apenas descomprime
+        # o que chegar comprimido de outros clientes.
+        self.compressor = compressor if compressor is not None else Compressor(limite_bytes=None)
+        # Ids das mensagens já entregues, para não exibir duas vezes uma reentrega
+        self.deduplicacao = deduplicacao if deduplicacao is not None else CacheDeduplicacao()
+        # Listagens da API de gerenciamento, em cache compartilhado por todos os clientes do processo
+        self.diretorio = DiretorioBroker.compartilhado(cliente_gerenciamento)
         
         # Inicializa a conexão do consumidor imediatamente
         self._conectar_consumidor()
 
         # Declara as filas para este usuário no canal do consumidor
-        # Filas duráveis para persistir mensagens e configurações após reinícios do RabbitMQ
-        self.consume_channel.queue_declare(queue=nome, durable=True)
-        self.consume_channel.queue_declare(queue=f"{nome}_topicos", durable=True) 
+        self._declarar_filas()
+
+    #Declara as filas do usuário com os argumentos do perfil configurado
+    def _declarar_filas(self):
+        
+        for fila in (self.nome, f"{self.nome}_topicos"):
+            try:
+                # Filas duráveis para persistir mensagens e configurações após reinícios do RabbitMQ
+                argumentos = argumentos_fila(fila, self.perfil_filas, self.sobrescritas_filas)
+                self.ganchos.observar(
+                    "declarar_fila",
+                    lambda: self.consume_channel.queue_declare(queue=fila, durable=True, arguments=argumentos),
+                    fila=fila
+                )
+            except pika.exceptions.ChannelClosedByBroker as e:
+                if e.reply_code != 406:
+                    raise
+                # A fila já existe com outros argumentos (ex.: criada pelo BrokerManager com outro
+                # perfil). Ainda dá para consumir dela: apenas confirma que existe.
+                print(f"[{self.nome}][AVISO] Fila '{fila}' existe com argumentos diferentes do perfil "
+                      f"'{self.perfil_filas}'. Usando a fila existente.")
+                self.consume_channel = self.consume_connection.channel()
+                self.consume_channel.queue_declare(queue=fila, passive=True)
+            self.declaracoes.adicionar(CacheDeclaracoes.chave_fila(fila))
 
     #Estabelece a conexão para consumo de mensagens
     def _conectar_consumidor(self):
@@ -27,164 +103,452 @@ class Usuario:
             # Usa ConnectionParameters com heartbeat para detecção de conexão perdida
             # Um heartbeat de 60 segundos ajuda a manter a conexão viva e detectar desconexões
             params = pika.ConnectionParameters('localhost', heartbeat=60) 
-            self.consume_connection = pika.BlockingConnection(params)
+            self.consume_connection = self.ganchos.observar("conectar", lambda: pika.BlockingConnection(params))
             self.consume_channel = self.consume_connection.channel()
             print(f"[{self.nome}] Consumidor conectado.")
 
-    #Consome mensagens das filas
-    def receber_mensagens(self, callback):
-      
+    #Descarta a conexão de consumo atual (possivelmente meio-morta) e abre uma nova
+    def _reconectar_consumidor(self):
+        
+        try:
+            if self.consume_connection and self.consume_connection.is_open:
+                self.consume_connection.close()
+        except Exception:
+            pass
+        self.consume_connection = None
+        self.consume_channel = None
+        self._conectar_consumidor()
+        # O broker pode ter sido reiniciado: redeclara as filas e refaz os bindings conhecidos
+        self.declaracoes.invalidar()
+        self._declarar_filas()
+        for topico in list(self.topicos_assinados):
+            if not self.assinar_topico(topico):
+                print(f"[{self.nome}] Falha ao restaurar a assinatura do tópico '{topico}'.")
+
+    #Consome mensagens das filas, reconectando com backoff exponencial e jitter quando a conexão cai
+    def receber_mensagens(self, callback, ack_manual=False, prefetch=100, ack_a_cada=50, ack_intervalo_ms=200,
+                          on_estado=None, backoff_inicial=1.0, backoff_maximo=60.0, max_tentativas=None):
+        """
+        callback recebe cada mensagem como um envelope.Envelope (tipo, remetente, topico, texto...).
+        Com ack_manual=False (padrão) as mensagens são confirmadas pelo broker na entrega (auto_ack).
+        Com ack_manual=True a entrega é at-least-once: até 'prefetch' mensagens ficam em trânsito e os
+        acks são agrupados com multiple=True a cada 'ack_a_cada' mensagens ou 'ack_intervalo_ms' ms,
+        em vez de um frame de ack por mensagem.
+
+        Quando a conexão cai, a reconexão é feita em laço (sem recursão), esperando um tempo
+        aleatório entre 0 e min(backoff_maximo, backoff_inicial * 2^tentativa) para que vários
+        clientes não reconectem ao mesmo tempo. Após 'max_tentativas' falhas seguidas (None = sem
+        limite) o consumo é abandonado. on_estado(estado, detalhes), se informado, recebe
+        "conectado", "reconectando", "desistiu" e "encerrado".
+        """
+        def notificar(estado, detalhes=""):
+            if on_estado:
+                try:
+                    on_estado(estado, detalhes)
+                except Exception as e:
+                    print(f"[{self.nome}] Erro no callback de estado: {e}")
+
+        tentativas = 0
+        while True:
+            try:
+                if tentativas:
+                    self._reconectar_consumidor()
+                else:
+                    self._conectar_consumidor()
+
+                def ao_conectar():
+                    # Conexão restabelecida: zera o contador de falhas seguidas
+                    nonlocal tentativas
+                    tentativas = 0
+                    notificar("conectado")
+
+                self._consumir(callback, ack_manual, prefetch, ack_a_cada, ack_intervalo_ms, ao_conectar)
+                notificar("encerrado")
+                return
+            except KeyboardInterrupt:
+                print(f"[{self.nome}] Consumo interrompido por KeyboardInterrupt.")
+                notificar("encerrado")
+                return
+            except Exception as e:
+                tentativas += 1
+                if max_tentativas is not None and tentativas > max_tentativas:
+                    print(f"[{self.nome}] Desistindo de reconectar após {max_tentativas} tentativas: {e}")
+                    notificar("desistiu", str(e))
+                    return
+                espera = random.uniform(0, min(backoff_maximo, backoff_inicial * 2 ** (tentativas - 1)))
+                print(f"[{self.nome}] Erro no consumo: {e!r}. Nova tentativa {tentativas} em {espera:.1f}s...")
+                notificar("reconectando", f"tentativa {tentativas} em {espera:.1f}s")
+                time.sleep(espera)
+
+    #Registra os consumidores no canal atual e bloqueia consumindo até stop_consuming ou erro
+    def _consumir(self, callback, ack_manual, prefetch, ack_a_cada, ack_intervalo_ms, ao_conectar):
+        
+        if ack_manual and prefetch:
+            # Com mais acks pendentes que o prefetch o broker pararia de entregar até o timer disparar
+            ack_a_cada = max(1, min(ack_a_cada, prefetch))
+        acks = {"ultima_tag": 0, "pendentes": 0, "timer": None}
+
+        def confirmar_pendentes():
+            acks["timer"] = None
+            if acks["pendentes"] and self.consume_channel.is_open:
+                # Um único frame confirma todas as entregas até ultima_tag (das duas filas do canal)
+                self.consume_channel.basic_ack(delivery_tag=acks["ultima_tag"], multiple=True)
+                acks["pendentes"] = 0
+
+        def registrar_ack(delivery_tag):
+            acks["ultima_tag"] = delivery_tag
+            acks["pendentes"] += 1
+            if acks["pendentes"] >= ack_a_cada:
+                if acks["timer"] is not None:
+                    self.consume_connection.remove_timeout(acks["timer"])
+                confirmar_pendentes()
+            elif acks["timer"] is None:
+                acks["timer"] = self.consume_connection.call_later(ack_intervalo_ms / 1000.0, confirmar_pendentes)
+
         def on_message(ch, method, properties, body):
+            if self.deduplicacao.ja_visto(properties.message_id):
+                # Reentrega de uma mensagem já processada (reconexão ou retentativa do publicador)
+                if self.metricas is not None:
+                    self.metricas.duplicatas.inc(usuario=self.nome)
+                if ack_manual:
+                    registrar_ack(method.delivery_tag)
+                return
             try:
-                mensagem = body.decode('utf-8')
+                # O envelope é decodificado sob demanda: só os campos usados pelo callback são lidos
+                corpo = self.compressor.descomprimir(body, properties.content_encoding)
+                mensagem = envelope.decodificar(corpo)
+                if self.metricas is not None:
+                    self._medir_entrega(mensagem)
+                    inicio = time.perf_counter()
                 # O callback (mostrar_mensagem na UI) agora será chamado
                 # para processar e exibir a mensagem na thread principal da UI.
-                callback(mensagem) 
-                # Se auto_ack=False, você faria o ack aqui: ch.basic_ack(method.delivery_tag)
+                if self.ganchos:
+                    self.ganchos.observar("callback", lambda: callback(mensagem), len(body), tipo=mensagem.tipo)
+                else:
+                    callback(mensagem)
+                if self.metricas is not None:
+                    self.metricas.duracao_callback.observar(time.perf_counter() - inicio, usuario=self.nome)
             except Exception as e:
                 print(f"[{self.nome}] Erro ao processar mensagem no callback: {e}")
+            if ack_manual:
+                # Mensagens com erro no callback também são confirmadas para não voltarem em loop
+                registrar_ack(method.delivery_tag)
 
-        self.consume_channel.basic_qos(prefetch_count=1)
+        self.consume_channel.basic_qos(prefetch_count=prefetch if ack_manual else 1)
 
         # Configura o consumo de mensagens privadas
         self.consume_channel.basic_consume(
             queue=self.nome,
             on_message_callback=on_message,
-            auto_ack=True # Para simplicidade, auto_ack é True. Considere ack manual em produção.
+            auto_ack=not ack_manual
         )
 
         # Configura o consumo de mensagens de tópicos
         self.consume_channel.basic_consume(
             queue=f"{self.nome}_topicos",
             on_message_callback=on_message,
-            auto_ack=True
+            auto_ack=not ack_manual
         )
 
         print(f"[{self.nome}] Iniciando consumo de mensagens...")
+        ao_conectar()
         try:
             self.consume_channel.start_consuming()
         except KeyboardInterrupt:
-            print(f"[{self.nome}] Consumo interrompido por KeyboardInterrupt.")
+            confirmar_pendentes()
             self.consume_channel.stop_consuming()
-        except pika.exceptions.StreamClosedError as e:
-            # Erro comum quando a conexão é perdida. Tenta reconectar e reiniciar o consumo.
-            print(f"[{self.nome}] StreamClosedError: O stream de conexão foi fechado. Tentando reconectar... {e}")
-            time.sleep(5) # Pequena pausa antes de tentar reconectar
-            self._conectar_consumidor() # Tenta reconectar
-            self.receber_mensagens(callback) # Tenta reiniciar o consumo
-        except Exception as e:
-            # Outros erros inesperados no consumo. Tenta reconectar.
-            print(f"[{self.nome}] Erro inesperado no consumo: {e}. Tentando reconectar...")
-            time.sleep(5) # Pequena pausa
-            self._conectar_consumidor()
-            self.receber_mensagens(callback)
+            raise
+        # Encerramento normal (stop_consuming): confirma o que já foi processado
+        confirmar_pendentes()
 
-    #Cria e retorna uma nova conexão e canal para operações de publicação
+    #Empresta um canal do pool de publicação (conexão persistente, reconexão sob demanda)
     def _obter_canal_publicacao(self):
         
-        # heartbeat de 60 segundos para as conexões de publicação também.
-        connection = pika.BlockingConnection(pika.ConnectionParameters('localhost', heartbeat=60))
-        return connection, connection.channel()
+        return self.pool_publicacao.canal()
+
+    #Registra a entrega e, para envelopes binários (com timestamp de publicação), a latência ponta a ponta
+    def _medir_entrega(self, mensagem):
+        
+        self.metricas.entregas.inc(usuario=self.nome, tipo=mensagem.tipo)
+        if mensagem.versao:
+            latencia = time.time() - mensagem.timestamp_ms / 1000.0
+            self.metricas.latencia_entrega.observar(max(latencia, 0.0), usuario=self.nome, tipo=mensagem.tipo)
+
+    def _medir_publicacao(self, tipo, inicio, resultado):
+        
+        if self.metricas is not None:
+            self.metricas.publicacoes.inc(usuario=self.nome, tipo=tipo, resultado=resultado)
+            self.metricas.duracao_publicacao.observar(time.perf_counter() - inicio, usuario=self.nome, tipo=tipo)
+
+    #Monta o envelope da mensagem e comprime o corpo se estiver acima do limite configurado
+    def _codificar(self, tipo, mensagem, topico=""):
+        
+        corpo, propriedades = envelope.codificar(tipo, self.nome, mensagem, topico=topico)
+        corpo, propriedades.content_encoding = self.compressor.comprimir(corpo)
+        return corpo, propriedades
+
+    #Uma publicação anterior fechou o canal (ex.: 404 de um exchange apagado): o cache não é mais confiável
+    def _on_canal_publicacao_fechado(self, erro):
+        
+        if self.declaracoes.invalidar_por_erro(erro):
+            print(f"[{self.nome}] Canal de publicação fechado pelo broker ({erro.reply_code}). Cache de declarações invalidado.")
+
+    #Executa func(canal) no pool; se o broker fechou o canal com 404/406, invalida o cache e tenta de novo
+    def _executar_publicacao(self, func, exchange=None):
+        
+        try:
+            return self.pool_publicacao.executar(func)
+        except pika.exceptions.ChannelClosedByBroker as e:
+            if exchange is not None and e.reply_code == 404:
+                # O exchange em cache foi apagado (ex.: BrokerManager.remover_topico): esquece ele
+                # e os bindings dele, para que a nova tentativa o declare de novo
+                self.declaracoes.remover_entidade("exchange", exchange)
+            elif not self.declaracoes.invalidar_por_erro(e):
+                raise
+            print(f"[{self.nome}] Canal fechado pelo broker ({e.reply_code}). Cache de declarações invalidado.")
+            return self.pool_publicacao.executar(func)
+
+    #Declara o exchange fanout do tópico apenas se ainda não for conhecido
+    def _garantir_exchange(self, publish_channel, nome_topico):
+        
+        chave = CacheDeclaracoes.chave_exchange(nome_topico)
+        if self.declaracoes.contem(chave):
+            return
+        self.ganchos.observar(
+            "declarar_exchange",
+            lambda: publish_channel.exchange_declare(exchange=nome_topico, exchange_type='fanout', durable=True),
+            topico=nome_topico
+        )
+        self.declaracoes.adicionar(chave)
+        # Pode ser um tópico novo: a próxima listagem deve buscá-lo no broker
+        self.diretorio.invalidar("exchanges")
 
     def enviar_para_usuario(self, destino, mensagem):
        
-        publish_connection = None
-        publish_channel = None
-        try:
-            publish_connection, publish_channel = self._obter_canal_publicacao()
-            mensagem_formatada = f"PRIVADO:{self.nome}:{mensagem}"
+        corpo, propriedades = self._codificar(envelope.TIPO_PRIVADO, mensagem)
+
+        def publicar(publish_channel):
             publish_channel.basic_publish(
                 exchange='',          # Exchange padrão para envio direto para filas
                 routing_key=destino,  # A fila de destino é o nome do usuário
-                body=mensagem_formatada.encode('utf-8') # Codifica a mensagem para bytes
+                body=corpo,
+                properties=propriedades
             )
+
+        inicio = time.perf_counter()
+        try:
+            self.ganchos.observar("publicar", lambda: self._executar_publicacao(publicar), len(corpo), destino=destino)
+            self._medir_publicacao(envelope.TIPO_PRIVADO, inicio, "ok")
             print(f"[{self.nome}] Enviada mensagem para '{destino}': {mensagem}")
             return True
         except Exception as e:
+            self._medir_publicacao(envelope.TIPO_PRIVADO, inicio, "erro")
             print(f"Erro ao enviar mensagem privada: {e}")
             return False
-        finally:
-            # Garante que o canal e a conexão de publicação sejam fechados.
-            if publish_channel and publish_channel.is_open:
-                publish_channel.close()
-            if publish_connection and publish_connection.is_open:
-                publish_connection.close()
 
     def assinar_topico(self, nome_topico):
         
-        publish_connection = None
-        publish_channel = None
-        try:
-            publish_connection, publish_channel = self._obter_canal_publicacao()
+        chave_binding = CacheDeclaracoes.chave_binding(nome_topico, f"{self.nome}_topicos")
+
+        def assinar(publish_channel):
+            # Assinar é uma ação explícita e rara: não confia no cache, que pode estar desatualizado
+            # se o tópico foi apagado por outro processo (declarar e ligar de novo é idempotente)
+            self.declaracoes.remover_entidade("exchange", nome_topico)
             # Declara o exchange como 'fanout' e durável. Fanout envia para todas as filas ligadas.
-            publish_channel.exchange_declare(
-                exchange=nome_topico,
-                exchange_type='fanout',
-                durable=True 
-            )
+            self._garantir_exchange(publish_channel, nome_topico)
             # Vincula a fila de tópicos do usuário ao exchange
-            publish_channel.queue_bind(
-                exchange=nome_topico,
-                queue=f"{self.nome}_topicos"
+            self.ganchos.observar(
+                "ligar",
+                lambda: publish_channel.queue_bind(exchange=nome_topico, queue=f"{self.nome}_topicos"),
+                topico=nome_topico
             )
+            self.declaracoes.adicionar(chave_binding)
+
+        try:
+            self._executar_publicacao(assinar, exchange=nome_topico)
+            self.topicos_assinados.add(nome_topico)
             print(f"[{self.nome}] Assinou o tópico '{nome_topico}'.")
             return True
         except Exception as e:
             print(f"Erro ao assinar tópico: {e}")
             return False
-        finally:
-            if publish_channel and publish_channel.is_open:
-                publish_channel.close()
-            if publish_connection and publish_connection.is_open:
-                publish_connection.close()
 
     def publicar_em_topico(self, nome_topico, mensagem):
     
-        publish_connection = None
-        publish_channel = None
-        try:
-            publish_connection, publish_channel = self._obter_canal_publicacao()
-            # Garante que o exchange exista antes de publicar.
-            publish_channel.exchange_declare(
-                exchange=nome_topico,
-                exchange_type='fanout',
-                durable=True
-            )
-            mensagem_formatada = f"[{nome_topico}]{self.nome}: {mensagem}"
+        corpo, propriedades = self._codificar(envelope.TIPO_TOPICO, mensagem, topico=nome_topico)
+
+        def publicar(publish_channel):
+            # Garante que o exchange exista antes de publicar (só no primeiro uso, depois fica em cache).
+            self._garantir_exchange(publish_channel, nome_topico)
             publish_channel.basic_publish(
                 exchange=nome_topico, # Publica no exchange do tópico
                 routing_key='',      # Routing key vazia para exchanges fanout
-                body=mensagem_formatada.encode('utf-8')
+                body=corpo,
+                properties=propriedades
             )
+
+        inicio = time.perf_counter()
+        try:
+            self.ganchos.observar(
+                "publicar", lambda: self._executar_publicacao(publicar, exchange=nome_topico), len(corpo), topico=nome_topico
+            )
+            self._medir_publicacao(envelope.TIPO_TOPICO, inicio, "ok")
             print(f"[{self.nome}] Publicada mensagem no tópico '{nome_topico}': {mensagem}")
             return True
         except Exception as e:
+            # O estado do exchange no cache não é mais confiável
+            self.declaracoes.remover_entidade("exchange", nome_topico)
+            self._medir_publicacao(envelope.TIPO_TOPICO, inicio, "erro")
             print(f"Erro ao publicar no tópico: {e}")
             return False
-        finally:
-            if publish_channel and publish_channel.is_open:
-                publish_channel.close()
-            if publish_connection and publish_connection.is_open:
-                publish_connection.close()
+
+    #Publica vários pares (corpo, propriedades) em um canal com confirmação do broker, mantendo no máximo 'janela' mensagens sem confirmação
+    def _publicar_lote_confirmado(self, exchange, routing_key, corpos, janela=500, timeout=30):
+        """
+        Usa o modo de confirmação (publisher confirms) de forma assíncrona: as mensagens são publicadas
+        sem esperar pela confirmação de cada uma, e os Basic.Ack/Basic.Nack (inclusive os de
+        multiple=True) são contabilizados em lote. Retorna um dicionário com o total enviado,
+        o total confirmado e os índices das mensagens rejeitadas ou sem confirmação.
+
+        'timeout' vale por espera, não para o lote inteiro: o lote só é interrompido quando
+        nenhuma confirmação chega durante 'timeout' segundos.
+        """
+        pendentes = {} # delivery_tag -> índice da mensagem, em ordem crescente de delivery_tag
+        rejeitadas = []
+        confirmadas = [0]
+        ultimo_progresso = [time.monotonic()]
+        selecionado = []
+        publicadas = 0
+        inicio = time.perf_counter()
+
+        def on_confirmacao(frame):
+            ultimo_progresso[0] = time.monotonic()
+            metodo = frame.method
+            if metodo.multiple:
+                # Com multiple=True o broker confirma todas as tags até delivery_tag de uma vez
+                tags = []
+                for tag in pendentes:
+                    if tag > metodo.delivery_tag:
+                        break
+                    tags.append(tag)
+            else:
+                tags = [metodo.delivery_tag]
+            for tag in tags:
+                indice = pendentes.pop(tag, None)
+                if indice is None:
+                    continue
+                if isinstance(metodo, pika.spec.Basic.Nack):
+                    rejeitadas.append(indice)
+                else:
+                    confirmadas[0] += 1
+
+        def aguardar(limite):
+            # O prazo recomeça a cada espera e a cada confirmação recebida
+            ultimo_progresso[0] = time.monotonic()
+            while len(pendentes) > limite:
+                if canal.is_closed:
+                    # Ex.: exchange inexistente (404) fecha o canal e as confirmações nunca chegam
+                    raise pika.exceptions.ChannelClosed(0, "Canal de confirmação fechado pelo broker.")
+                if time.monotonic() - ultimo_progresso[0] > timeout:
+                    raise TimeoutError(f"{len(pendentes)} mensagens sem confirmação do broker há {timeout}s.")
+                connection.process_data_events(time_limit=0.05)
+
+        with self.pool_publicacao.canal() as canal_pool:
+            connection = canal_pool.connection
+            # Canal dedicado: o modo de confirmação é permanente e não deve vazar para o pool
+            canal = connection.channel()
+            try:
+                confirmacoes = _ConfirmacoesAssincronas(canal)
+                confirmacoes.ativar(on_confirmacao, lambda _frame: selecionado.append(True))
+                prazo = time.monotonic() + timeout
+                while not selecionado:
+                    if time.monotonic() > prazo:
+                        raise TimeoutError("Broker não ativou o modo de confirmação.")
+                    connection.process_data_events(time_limit=0.05)
+
+                for indice, (corpo, propriedades) in enumerate(corpos):
+                    confirmacoes.publicar(exchange, routing_key, corpo, propriedades)
+                    pendentes[indice + 1] = indice # delivery_tag começa em 1 no canal novo
+                    publicadas += 1
+                    if len(pendentes) >= janela:
+                        # Janela cheia: drena confirmações até liberar metade dela
+                        aguardar(janela // 2)
+                aguardar(0)
+            except (TimeoutError, pika.exceptions.ChannelClosed) as e:
+                print(f"[{self.nome}] Lote interrompido antes de todas as confirmações: {e}")
+                if isinstance(e, pika.exceptions.ChannelClosed):
+                    self.declaracoes.invalidar()
+                rejeitadas.extend(pendentes.values())
+                rejeitadas.extend(range(publicadas, len(corpos)))
+            finally:
+                if canal.is_open:
+                    canal.close()
+
+        if self.metricas is not None:
+            self.metricas.confirmacoes.inc(confirmadas[0], usuario=self.nome, resultado="ack")
+            self.metricas.confirmacoes.inc(len(rejeitadas), usuario=self.nome, resultado="nack")
+            self.metricas.duracao_lote.observar(time.perf_counter() - inicio, usuario=self.nome)
+
+        return {"enviadas": publicadas, "confirmadas": confirmadas[0], "rejeitadas": sorted(rejeitadas)}
+
+    def enviar_lote(self, destino, mensagens, janela=500):
+        """Envia várias mensagens privadas para 'destino' com confirmação do broker em janelas."""
+        corpos = [self._codificar(envelope.TIPO_PRIVADO, mensagem) for mensagem in mensagens]
+        try:
+            resultado = self.ganchos.observar(
+                "publicar_lote",
+                lambda: self._publicar_lote_confirmado('', destino, corpos, janela),
+                sum(len(corpo) for corpo, _ in corpos) if self.ganchos else 0,
+                destino=destino, mensagens=len(corpos)
+            )
+            print(f"[{self.nome}] Lote para '{destino}': {resultado['confirmadas']}/{len(corpos)} confirmadas.")
+            return resultado
+        except Exception as e:
+            print(f"Erro ao enviar lote de mensagens privadas: {e}")
+            return {"enviadas": 0, "confirmadas": 0, "rejeitadas": list(range(len(corpos)))}
+
+    def publicar_lote(self, nome_topico, mensagens, janela=500):
+        """Publica várias mensagens no tópico com confirmação do broker em janelas."""
+        corpos = [
+            self._codificar(envelope.TIPO_TOPICO, mensagem, topico=nome_topico)
+            for mensagem in mensagens
+        ]
+        try:
+            self._executar_publicacao(lambda canal: self._garantir_exchange(canal, nome_topico), exchange=nome_topico)
+            resultado = self.ganchos.observar(
+                "publicar_lote",
+                lambda: self._publicar_lote_confirmado(nome_topico, '', corpos, janela),
+                sum(len(corpo) for corpo, _ in corpos) if self.ganchos else 0,
+                topico=nome_topico, mensagens=len(corpos)
+            )
+            print(f"[{self.nome}] Lote no tópico '{nome_topico}': {resultado['confirmadas']}/{len(corpos)} confirmadas.")
+            return resultado
+        except Exception as e:
+            print(f"Erro ao publicar lote no tópico: {e}")
+            return {"enviadas": 0, "confirmadas": 0, "rejeitadas": list(range(len(corpos)))}
+
+    def adicionar_gancho(self, observador, http=False):
+        """
+        Registra observador(evento) para conectar, declarar_fila, declarar_exchange, ligar, publicar,
+        publicar_lote e callback (ver ganchos.Evento). Com http=True também observa as chamadas
+        à API de gerenciamento (o cliente HTTP é compartilhado pelo processo).
+        """
+        self.ganchos.adicionar(observador)
+        if http:
+            self.diretorio.cliente.ganchos.adicionar(observador)
+
+    def remover_gancho(self, observador):
+        self.ganchos.remover(observador)
+        self.diretorio.cliente.ganchos.remover(observador)
 
     def listar_topicos(self):
         
-        url = 'http://localhost:15672/api/exchanges/%2F'  # %2F é o vhost padrão "/"
-        auth = HTTPBasicAuth('guest', 'guest') # Credenciais padrão do RabbitMQ
         try:
-            response = requests.get(url, auth=auth)
-            if response.status_code == 200:
-                exchanges = response.json()
-                # Filtra apenas os exchanges do tipo 'fanout' (usados para tópicos)
-                # e que não são os exchanges internos do RabbitMQ (amq.)
-                topicos = [
-                    ex['name'] for ex in exchanges
-                    if ex['type'] == 'fanout' and not ex['name'].startswith('amq.')
-                ]
-                return topicos
-            else:
-                print(f"Erro ao listar tópicos: Status {response.status_code} - {response.text}")
-                return []
+            # Consulta projetada (só name/type) e em cache compartilhado com os outros clientes do processo
+            return self.diretorio.listar_topicos()
+        except requests.exceptions.HTTPError as e:
+            print(f"Erro ao listar tópicos: Status {e.response.status_code} - {e.response.text}")
+            return []
         except requests.exceptions.ConnectionError:
             print("Erro de conexão ao tentar listar tópicos. O servidor RabbitMQ Management pode não estar rodando ou acessível.")
             return []
@@ -194,21 +558,11 @@ class Usuario:
 
     def listar_usuarios(self):
         
-        url = 'http://localhost:15672/api/queues/%2F'
-        auth = HTTPBasicAuth('guest', 'guest')
         try:
-            response = requests.get(url, auth=auth)
-            if response.status_code == 200:
-                queues = response.json()
-                # Filtra filas que não são internas (amq.) e que não são filas de tópicos (terminam com _topicos)
-                usuarios = [
-                    q['name'] for q in queues
-                    if not q['name'].startswith('amq.') and not q['name'].endswith('_topicos')
-                ]
-                return usuarios
-            else:
-                print(f"Erro ao listar usuários: Status {response.status_code} - {response.text}")
-                return []
+            return self.diretorio.listar_usuarios()
+        except requests.exceptions.HTTPError as e:
+            print(f"Erro ao listar usuários: Status {e.response.status_code} - {e.response.text}")
+            return []
         except requests.exceptions.ConnectionError:
             print("Erro de conexão ao tentar listar usuários. O servidor RabbitMQ Management pode não estar rodando ou acessível.")
             return []
@@ -218,6 +572,11 @@ class Usuario:
 
     def __del__(self):
        
+        if hasattr(self, 'pool_publicacao'):
+            try:
+                self.pool_publicacao.fechar()
+            except Exception as e:
+                print(f"Erro ao fechar pool de publicação em __del__: {e}")
         if hasattr(self, 'consume_connection') and self.consume_connection:
             try:
                 if not self.consume_connection.is_closed: